@@ -0,0 +1,271 @@
+"""
+End-to-end throughput benchmark against the local mock server
+
+Generates synthetic exam images, starts MockOpenRouter in-process and
+drives ImageTextExtractor.batch_extract_from_folder and
+extract_images.process_images_folder over every combination of folder
+size and concurrency. Reports images/sec, p50/p95 latency, p95 time spent
+waiting for the adaptive rate limiter (so a sweep that is limited by the
+limiter rather than by concurrency shows up as such) and retries, and can save results as JSON and compare a later run against them to
+catch throughput regressions offline.
+
+Usage:
+    python bench_extraction.py --sizes 20 100 --concurrency 1 4 16
+    python bench_extraction.py --save baseline.json
+    python bench_extraction.py --baseline baseline.json --tolerance 0.2
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from extract_images import process_images_folder
+from image_text_extractor import ImageTextExtractor
+from mock_openrouter import MockOpenRouter
+from rate_limiter import AdaptiveRateLimiter
+from request_metrics import MetricsRecorder
+
+API_KEY = "sk-or-benchmark"
+
+
+def write_png(path: Path, width: int, height: int):
+    """
+    Write a noise PNG without Pillow (incompressible, like a photo)
+
+    Args:
+        path: Output file
+        width: Width in pixels
+        height: Height in pixels
+    """
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    rows = b''.join(b'\x00' + os.urandom(width) for _ in range(height))
+    path.write_bytes(
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+        + chunk(b'IDAT', zlib.compress(rows, 1))
+        + chunk(b'IEND', b'')
+    )
+
+
+def make_images(folder: Path, count: int, size_kb: int):
+    """Create `count` grayscale noise PNGs of roughly size_kb each"""
+    side = max(16, int((size_kb * 1024) ** 0.5))
+    for index in range(1, count + 1):
+        write_png(folder / f"q{index}.png", side, side)
+
+
+def run_extractor(
+    image_folder: Path,
+    output: Path,
+    server: MockOpenRouter,
+    concurrency: int,
+    initial_rpm: Optional[float] = None
+) -> Dict[str, Any]:
+    """One ImageTextExtractor batch; returns wall time and metrics summary"""
+    metrics = MetricsRecorder()
+    extractor = ImageTextExtractor(
+        api_key=API_KEY,
+        rate_limiter=AdaptiveRateLimiter(initial_rpm=initial_rpm) if initial_rpm else None,
+        pool_size=max(10, concurrency),
+        metrics=metrics,
+        api_url=server.url
+    )
+    start = time.perf_counter()
+    extractor.batch_extract_from_folder(
+        folder_path=str(image_folder),
+        output_folder=str(output),
+        file_pattern="*.png",
+        delay_seconds=0,
+        concurrency=concurrency,
+        resume=False
+    )
+    extractor.close()
+    return {"seconds": time.perf_counter() - start, "metrics": metrics.summary()}
+
+
+def run_folder_script(
+    image_folder: Path,
+    output: Path,
+    server: MockOpenRouter,
+    concurrency: int,
+    initial_rpm: Optional[float] = None
+) -> Dict[str, Any]:
+    """One extract_images.process_images_folder run (always sequential)"""
+    metrics = MetricsRecorder()
+    start = time.perf_counter()
+    process_images_folder(
+        str(image_folder),
+        str(output),
+        API_KEY,
+        max_retries=3,
+        resume=False,
+        api_url=server.url,
+        metrics=metrics
+    )
+    return {"seconds": time.perf_counter() - start, "metrics": metrics.summary()}
+
+
+TARGETS = {
+    "image_text_extractor": run_extractor,
+    "extract_images": run_folder_script,
+}
+
+
+def run_benchmark(args) -> List[Dict[str, Any]]:
+    """
+    Run every (target, size, concurrency) scenario
+
+    Returns:
+        List of result rows
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp, MockOpenRouter(
+        latency=args.latency,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+        retry_after=args.retry_after,
+        seed=args.seed
+    ) as server:
+        for size in args.sizes:
+            image_folder = Path(tmp) / f"images_{size}"
+            image_folder.mkdir()
+            make_images(image_folder, size, args.image_kb)
+
+            for target in args.targets:
+                # The folder script has no concurrency option
+                levels = [1] if target == "extract_images" else args.concurrency
+                for concurrency in levels:
+                    output = Path(tmp) / f"out_{target}_{size}_{concurrency}"
+                    before = server.stats()
+
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        outcome = TARGETS[target](image_folder, output, server, concurrency, args.initial_rpm)
+
+                    after = server.stats()
+                    summary = outcome["metrics"]
+                    rows.append({
+                        "target": target,
+                        "images": size,
+                        "concurrency": concurrency,
+                        "seconds": round(outcome["seconds"], 2),
+                        "images_per_second": round(size / outcome["seconds"], 2),
+                        "p50": (summary.get("latency") or {}).get("p50"),
+                        "p95": (summary.get("latency") or {}).get("p95"),
+                        "wait_p95": (summary.get("rate_wait") or {}).get("p95"),
+                        "ok": summary.get("success", 0),
+                        "retries": (after["requests"] - before["requests"]) - (after["ok"] - before["ok"]),
+                    })
+                    print_row(rows[-1])
+    return rows
+
+
+def print_header():
+    print(f"{'target':<22}{'images':>8}{'conc':>6}{'seconds':>10}{'img/s':>9}{'p50 s':>8}{'p95 s':>8}"
+          f"{'wait95':>8}{'ok':>6}{'retries':>9}")
+    print("-" * 94)
+
+
+def print_row(row: Dict[str, Any]):
+    print(
+        f"{row['target']:<22}{row['images']:>8}{row['concurrency']:>6}{row['seconds']:>10}"
+        f"{row['images_per_second']:>9}{str(row['p50']):>8}{str(row['p95']):>8}"
+        f"{str(row.get('wait_p95')):>8}{row['ok']:>6}{row['retries']:>9}"
+    )
+
+
+def compare(rows: List[Dict[str, Any]], baseline_file: str, tolerance: float) -> bool:
+    """
+    Compare throughput with a saved run
+
+    Args:
+        rows: Current results
+        baseline_file: JSON written by --save
+        tolerance: Allowed relative drop in images/sec (0.2 = 20%)
+
+    Returns:
+        True if no scenario regressed
+    """
+    baseline = {
+        (row["target"], row["images"], row["concurrency"]): row
+        for row in json.loads(Path(baseline_file).read_text(encoding='utf-8'))["results"]
+    }
+
+    ok = True
+    print(f"\n Compared with {baseline_file} (tolerance {tolerance * 100:.0f}%)")
+    for row in rows:
+        old = baseline.get((row["target"], row["images"], row["concurrency"]))
+        if old is None:
+            continue
+        change = row["images_per_second"] / old["images_per_second"] - 1 if old["images_per_second"] else 0.0
+        regressed = change < -tolerance
+        ok = ok and not regressed
+        print(f"  {'❌' if regressed else '✅'} {row['target']} n={row['images']} c={row['concurrency']}: "
+              f"{old['images_per_second']} -> {row['images_per_second']} img/s ({change * 100:+.0f}%)")
+    return ok
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Offline end-to-end throughput benchmark using the mock OpenRouter server",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Default scenarios
+  python bench_extraction.py
+
+  # Larger folders, more concurrency, noisy provider
+  python bench_extraction.py --sizes 50 200 --concurrency 1 8 32 --rate-429 0.05 --rate-5xx 0.01
+
+  # Catch regressions
+  python bench_extraction.py --save baseline.json
+  python bench_extraction.py --baseline baseline.json
+        """
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20, 60], help='Folder sizes (default: 20 60)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16],
+                        help='Concurrency levels for image_text_extractor (default: 1 4 16)')
+    parser.add_argument('--targets', nargs='+', choices=sorted(TARGETS), default=sorted(TARGETS),
+                        help='Entry points to benchmark (default: both)')
+    parser.add_argument('--image-kb', type=int, default=200, help='Synthetic image size in KB (default: 200)')
+    parser.add_argument('--latency', default='lognormal:0.3:0.4', help='Mock latency spec (default: lognormal:0.3:0.4)')
+    parser.add_argument('--rate-429', type=float, default=0.02, help='Mock 429 probability (default: 0.02)')
+    parser.add_argument('--rate-5xx', type=float, default=0.0, help='Mock 5xx probability (default: 0)')
+    parser.add_argument('--retry-after', type=float, default=0.5, help='Mock Retry-After seconds (default: 0.5)')
+    parser.add_argument('--seed', type=int, default=1, help='Mock random seed (default: 1)')
+    parser.add_argument('--initial-rpm', type=float, default=None,
+                        help='Starting rate limit for image_text_extractor (default: limiter default)')
+    parser.add_argument('--save', help='Write results to this JSON file')
+    parser.add_argument('--baseline', help='Compare images/sec with a JSON file from --save')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed throughput drop (default: 0.2)')
+
+    args = parser.parse_args()
+
+    print(f"\n Mock latency {args.latency}, 429 rate {args.rate_429}, 5xx rate {args.rate_5xx}, "
+          f"{args.image_kb} KB images")
+    print("=" * 94)
+    print_header()
+    rows = run_benchmark(args)
+    print("=" * 94)
+
+    if args.save:
+        Path(args.save).write_text(json.dumps({"args": vars(args), "results": rows}, indent=2), encoding='utf-8')
+        print(f"\n Saved: {args.save}")
+
+    if args.baseline and not compare(rows, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
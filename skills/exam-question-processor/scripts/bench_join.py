@@ -0,0 +1,234 @@
+"""
+Benchmarks for join_questions.py
+
+scan: builds a synthetic folder of `_extracted.txt` files and compares
+writing the joined file plus the per-question clean files in two separate
+passes (join_extracted_files, then create_separate_clean_files) with one
+shared scan (export_extracted_files). Reports wall time, source bytes read
+and, on Linux, the bytes the process actually read (rchar from /proc/self/io).
+
+strip: metadata stripping of one multi-MB extracted file, line splitting
+(legacy_extract_text_content) vs str.find slicing (extract_text_content)
+vs mmap + memoryview streaming (copy_text_content). Reports time and peak
+Python memory.
+
+Usage:
+    python bench_join.py --files 2000 --kb 8
+    python bench_join.py --benchmark strip --size-mb 16
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, Optional
+
+from join_questions import (
+    copy_text_content,
+    create_separate_clean_files,
+    export_extracted_files,
+    extract_text_content,
+    join_extracted_files,
+    legacy_extract_text_content
+)
+
+
+def _read_chars() -> Optional[int]:
+    """Bytes read by this process so far (Linux only)"""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def make_folder(folder: Path, files: int, kb: float, seed: int = 1):
+    """
+    Write `files` extracted-text files of about `kb` KB each
+
+    Args:
+        folder: Target folder
+        files: Number of files
+        kb: Approximate size per file in KB
+        seed: Random seed
+    """
+    rng = random.Random(seed)
+    folder.mkdir(parents=True, exist_ok=True)
+    lines = max(1, int(kb * 1024 / 80))
+    for number in range(1, files + 1):
+        body = "\n".join(
+            f"Câu {number}.{line}: " + "".join(rng.choice("abcdefghij ") for _ in range(70))
+            for line in range(lines)
+        )
+        (folder / f"q{number}_extracted.txt").write_text(
+            f"Image: q{number}.jpeg\nModel: bench\nRetry Round: 1\n" + "=" * 80 + "\n\n"
+            + body + "\n\n" + "=" * 80 + "\nTokens used: 0\n",
+            encoding='utf-8'
+        )
+
+
+def _measure(run) -> Dict[str, Optional[float]]:
+    """Run quietly and return seconds and bytes read"""
+    before = _read_chars()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        source_bytes = run()
+    seconds = time.perf_counter() - start
+    after = _read_chars()
+    return {
+        "seconds": seconds,
+        "source_bytes": source_bytes,
+        "rchar": after - before if before is not None and after is not None else None,
+    }
+
+
+def run_benchmark(files: int, kb: float, workers: int):
+    """
+    Compare separate passes with one shared scan and print a table
+
+    Args:
+        files: Number of synthetic files
+        kb: Approximate size per file in KB
+        workers: Reader threads
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "extracted"
+        make_folder(source, files, kb)
+        total = sum(path.stat().st_size for path in source.iterdir())
+
+        def separate_passes():
+            join_extracted_files(str(source), str(Path(tmp) / "separate"), workers=workers)
+            create_separate_clean_files(str(source), str(Path(tmp) / "separate"), workers=workers)
+            return 2 * total
+
+        def single_pass():
+            stats = export_extracted_files(str(source), str(Path(tmp) / "single"), clean_files=True, workers=workers)
+            return stats["bytes"]
+
+        # Warm the page cache so both modes read from memory
+        _measure(single_pass)
+        results = {"separate passes": _measure(separate_passes), "single pass": _measure(single_pass)}
+
+        print(f"\n Folder: {files} files, {total / 1024 / 1024:.1f} MB, {workers} reader threads")
+        print("=" * 80)
+        print(f"{'mode':<18}{'seconds':>10}{'source MB':>12}{'rchar MB':>12}")
+        print("-" * 80)
+        for mode, result in results.items():
+            rchar = f"{result['rchar'] / 1024 / 1024:.1f}" if result["rchar"] is not None else "n/a"
+            print(
+                f"{mode:<18}"
+                f"{result['seconds']:>10.2f}"
+                f"{result['source_bytes'] / 1024 / 1024:>12.1f}"
+                f"{rchar:>12}"
+            )
+        print("=" * 80)
+
+        separate, single = results["separate passes"], results["single pass"]
+        print(f" Speedup: {separate['seconds'] / single['seconds']:.2f}x, "
+              f"source bytes read: {single['source_bytes'] / separate['source_bytes']:.0%} of separate passes")
+
+        # Same outputs either way
+        for name in ["all_questions_joined.txt", "Q1_clean.txt", f"Q{files}_clean.txt"]:
+            if (Path(tmp) / "separate" / name).read_bytes() != (Path(tmp) / "single" / name).read_bytes():
+                print(f" ⚠️  {name} differs between modes")
+
+
+def _strip_legacy(path: Path, out_path: str):
+    with open(path, 'r', encoding='utf-8') as in_f, open(out_path, 'w', encoding='utf-8') as out_f:
+        out_f.write(legacy_extract_text_content(in_f.read()))
+
+
+def _strip_find(path: Path, out_path: str):
+    with open(path, 'r', encoding='utf-8') as in_f, open(out_path, 'w', encoding='utf-8') as out_f:
+        out_f.write(extract_text_content(in_f.read()))
+
+
+def _strip_mmap(path: Path, out_path: str):
+    with open(out_path, 'wb') as out_f:
+        copy_text_content(path, out_f)
+
+
+STRIP_MODES = {
+    "split/join": _strip_legacy,
+    "str.find": _strip_find,
+    "mmap stream": _strip_mmap,
+}
+
+
+def run_strip_benchmark(size_mb: float, repeats: int):
+    """
+    Time metadata stripping of one large extracted file
+
+    Args:
+        size_mb: Size of the synthetic file in MB
+        repeats: Runs per mode (best time is reported)
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "big_extracted.txt"
+        rng = random.Random(1)
+        line = "".join(rng.choice("abcdefghij ") for _ in range(70))
+        lines = int(size_mb * 1024 * 1024 / 82)
+        with open(source, 'w', encoding='utf-8') as f:
+            # extract_images.py layout: metadata block, then the text to the end
+            f.write("=" * 80 + "\nEXTRACTED TEXT METADATA\n" + "=" * 80 + "\n")
+            f.write("Image: big.jpeg\nModel: bench\n" + "=" * 80 + "\n\n")
+            for number in range(lines):
+                f.write(f"Câu {number % 100}: {line}\n")
+        size = source.stat().st_size
+        out_path = str(Path(tmp) / "stripped.txt")
+
+        print(f"\n File: {size / 1024 / 1024:.1f} MB, best of {repeats}")
+        print("=" * 80)
+        print(f"{'mode':<14}{'seconds':>10}{'MB/s':>10}{'peak MB':>10}{'x file':>10}")
+        print("-" * 80)
+        for mode, strip in STRIP_MODES.items():
+            best = None
+            for _ in range(repeats):
+                start = time.perf_counter()
+                strip(source, out_path)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+
+            tracemalloc.start()
+            strip(source, out_path)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            print(
+                f"{mode:<14}"
+                f"{best:>10.3f}"
+                f"{size / 1024 / 1024 / best:>10.0f}"
+                f"{peak / 1024 / 1024:>10.1f}"
+                f"{peak / size:>10.2f}"
+            )
+        print("=" * 80)
+        print(" Peak = Python allocations (tracemalloc); mmap pages are not counted")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark join_questions.py scanning and metadata stripping")
+    parser.add_argument('--benchmark', choices=['scan', 'strip', 'all'], default='all',
+                        help='scan: separate vs single-pass outputs, strip: header stripping (default: all)')
+    parser.add_argument('--files', type=int, default=2000, help='Synthetic extracted files (default: 2000)')
+    parser.add_argument('--kb', type=float, default=8.0, help='Approximate KB per file (default: 8)')
+    parser.add_argument('--workers', type=int, default=8, help='Reader threads (default: 8)')
+    parser.add_argument('--size-mb', type=float, default=16.0, help='File size for the strip benchmark (default: 16)')
+    parser.add_argument('--repeats', type=int, default=5, help='Runs per strip mode (default: 5)')
+
+    args = parser.parse_args()
+    if args.benchmark in ('scan', 'all'):
+        run_benchmark(args.files, args.kb, args.workers)
+    if args.benchmark in ('strip', 'all'):
+        run_strip_benchmark(args.size_mb, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
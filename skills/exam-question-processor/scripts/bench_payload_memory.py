@@ -0,0 +1,130 @@
+"""
+Memory benchmark for vision request bodies
+
+Compares peak memory of the old request body path (read -> base64 str ->
+dict -> json.dumps -> bytes) with payload_builder.build_vision_payload.
+Each mode runs in a fresh subprocess that holds `--in-flight` bodies at
+once, like concurrent workers would, and reports peak RSS per image.
+
+Usage:
+    python bench_payload_memory.py --size-mb 8 --in-flight 4
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from payload_builder import build_vision_payload, legacy_vision_payload
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MODES = {
+    "legacy": legacy_vision_payload,
+    "streaming": build_vision_payload,
+}
+
+
+def _peak_rss_bytes() -> int:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_child(mode: str, image_path: str, in_flight: int):
+    """
+    Build `in_flight` bodies and print peak memory as JSON
+
+    Args:
+        mode: Key of MODES
+        image_path: Image file to embed
+        in_flight: Number of bodies held at the same time
+    """
+    builder = MODES[mode]
+    images = [(image_path, 'image/jpeg')]
+
+    if resource is not None:
+        baseline = _peak_rss_bytes()
+        bodies = [builder("model", "Extract all text.", images, max_tokens=4000) for _ in range(in_flight)]
+        peak = _peak_rss_bytes()
+        source = "ru_maxrss"
+    else:
+        tracemalloc.start()
+        baseline = 0
+        bodies = [builder("model", "Extract all text.", images, max_tokens=4000) for _ in range(in_flight)]
+        peak = tracemalloc.get_traced_memory()[1]
+        source = "tracemalloc"
+
+    print(json.dumps({
+        "mode": mode,
+        "body_bytes": len(bodies[0]),
+        "peak_bytes": peak - baseline,
+        "source": source,
+    }))
+
+
+def run_benchmark(size_mb: float, in_flight: int):
+    """
+    Run every mode in its own subprocess and print a comparison table
+
+    Args:
+        size_mb: Synthetic image size in MB
+        in_flight: Number of bodies held at the same time
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        image_path = Path(tmp) / "bench.jpg"
+        image_path.write_bytes(os.urandom(int(size_mb * 1024 * 1024)))
+        image_size = image_path.stat().st_size
+
+        print(f"\n Image: {image_size / 1024 / 1024:.1f} MB, in-flight bodies: {in_flight}")
+        print("=" * 80)
+        print(f"{'mode':<12}{'body MB':>10}{'peak MB':>12}{'MB/image':>12}{'x image':>10}")
+        print("-" * 80)
+
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", mode,
+                 "--image", str(image_path), "--in-flight", str(in_flight)],
+                capture_output=True, text=True, check=True,
+                cwd=str(Path(__file__).parent)
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            per_image = result["peak_bytes"] / in_flight
+            print(
+                f"{mode:<12}"
+                f"{result['body_bytes'] / 1024 / 1024:>10.1f}"
+                f"{result['peak_bytes'] / 1024 / 1024:>12.1f}"
+                f"{per_image / 1024 / 1024:>12.1f}"
+                f"{per_image / image_size:>10.2f}"
+            )
+
+        print("=" * 80)
+        print(f" Measured with: {result['source']}")
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark peak memory of vision request bodies")
+    parser.add_argument('--size-mb', type=float, default=8.0, help='Synthetic image size in MB (default: 8)')
+    parser.add_argument('--in-flight', type=int, default=4, help='Bodies held at once (default: 4)')
+    parser.add_argument('--child', choices=sorted(MODES), help=argparse.SUPPRESS)
+    parser.add_argument('--image', help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.image, args.in_flight)
+    else:
+        run_benchmark(args.size_mb, args.in_flight)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Circuit breaker for failing models and endpoints
+
+When a model (or the whole endpoint) is down, every image would otherwise
+spend its full retry budget and backoff on it, round after round. The
+breaker counts consecutive failures per key; after `failure_threshold` it
+opens and requests to that key fail fast (or are rerouted to another
+model) for a cool-down period. Then it half-opens and lets one probe
+through: success closes it, failure re-opens it with a longer cool-down.
+
+Features:
+- Independent breakers per key (model name, endpoint URL, ...)
+- closed -> open -> half-open -> closed state machine
+- Exponential cool-down on repeated trips (capped)
+- Only outage-like failures count (5xx, 404, timeouts, connection errors);
+  rate limits and bad requests do not
+- Trip / rejection counters for summary reports
+- Thread-safe
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitOpenError(Exception):
+    """Raised (or reported) when a request is refused by an open breaker"""
+
+    def __init__(self, key: str, retry_in: float):
+        super().__init__(f"Circuit open for {key} (retry in {retry_in:.0f}s)")
+        self.key = key
+        self.retry_in = retry_in
+
+
+def failure_scope(error: BaseException) -> Optional[str]:
+    """
+    Decide whether an error should count against a breaker
+
+    Args:
+        error: Exception raised by a request
+
+    Returns:
+        "model" for model-level outages (5xx, 404), "endpoint" for timeouts
+        and connection errors, None for errors that say nothing about
+        availability (429, 400, 401, parsing errors, ...)
+    """
+    if isinstance(error, requests.exceptions.HTTPError):
+        status = getattr(error.response, 'status_code', None)
+        if status is not None and (status >= 500 or status == 404):
+            return "model"
+        return None
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return "endpoint"
+    return None
+
+
+class _Circuit:
+    """State of one key"""
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.cooldown = 0.0
+        self.probe_started: Optional[float] = None
+        self.trips = 0
+        self.rejected = 0
+
+
+class CircuitBreaker:
+    """
+    Per-key circuit breakers sharing one configuration
+
+    Usage:
+        breaker = CircuitBreaker(failure_threshold=5, cooldown_seconds=30)
+        if not breaker.allow(model):
+            raise CircuitOpenError(model, breaker.retry_in(model))
+        try:
+            response = send(...)
+            breaker.record_success(model)
+        except Exception:
+            breaker.record_failure(model)
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        cooldown_seconds: float = 30.0,
+        max_cooldown_seconds: float = 300.0
+    ):
+        """
+        Initialize the breaker
+
+        Args:
+            failure_threshold: Consecutive failures that open a circuit
+            cooldown_seconds: First open period before a probe is allowed
+            max_cooldown_seconds: Cap for the doubled cool-down after failed probes
+        """
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be >= 1")
+
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+
+        self._lock = threading.Lock()
+        self._circuits: Dict[str, _Circuit] = {}
+
+    def _circuit(self, key: str) -> _Circuit:
+        if key not in self._circuits:
+            self._circuits[key] = _Circuit()
+        return self._circuits[key]
+
+    def allow(self, key: str) -> bool:
+        """
+        Check whether a request to `key` may be sent now
+
+        In half-open state only one probe is admitted at a time; a probe
+        that never reports back is replaced after one cool-down.
+
+        Args:
+            key: Model name, endpoint URL, ...
+
+        Returns:
+            True if the request may go ahead
+        """
+        now = time.monotonic()
+        with self._lock:
+            circuit = self._circuit(key)
+
+            if circuit.state == OPEN and now - circuit.opened_at >= circuit.cooldown:
+                circuit.state = HALF_OPEN
+                circuit.probe_started = None
+
+            if circuit.state == CLOSED:
+                return True
+
+            if circuit.state == HALF_OPEN and (
+                circuit.probe_started is None or now - circuit.probe_started >= circuit.cooldown
+            ):
+                circuit.probe_started = now
+                return True
+
+            circuit.rejected += 1
+            return False
+
+    def retry_in(self, key: str) -> float:
+        """
+        Seconds until `key` admits a probe again
+
+        Args:
+            key: Breaker key
+
+        Returns:
+            Seconds (0 if requests are allowed)
+        """
+        with self._lock:
+            circuit = self._circuit(key)
+            if circuit.state == CLOSED:
+                return 0.0
+            if circuit.state == HALF_OPEN:
+                if circuit.probe_started is None:
+                    return 0.0
+                return max(0.0, circuit.probe_started + circuit.cooldown - time.monotonic())
+            return max(0.0, circuit.opened_at + circuit.cooldown - time.monotonic())
+
+    def record_success(self, key: str):
+        """A request to `key` succeeded: close the circuit"""
+        with self._lock:
+            circuit = self._circuit(key)
+            circuit.state = CLOSED
+            circuit.failures = 0
+            circuit.cooldown = 0.0
+            circuit.probe_started = None
+
+    def record_failure(self, key: str) -> bool:
+        """
+        A request to `key` failed with an outage-like error
+
+        Args:
+            key: Breaker key
+
+        Returns:
+            True if this failure opened the circuit
+        """
+        with self._lock:
+            circuit = self._circuit(key)
+            circuit.failures += 1
+
+            if circuit.state == HALF_OPEN:
+                # Failed probe: back off longer before the next one
+                cooldown = min(self.max_cooldown_seconds, max(self.cooldown_seconds, circuit.cooldown * 2))
+            elif circuit.state == CLOSED and circuit.failures >= self.failure_threshold:
+                cooldown = self.cooldown_seconds
+            else:
+                return False
+
+            circuit.state = OPEN
+            circuit.opened_at = time.monotonic()
+            circuit.cooldown = cooldown
+            circuit.probe_started = None
+            circuit.trips += 1
+            return True
+
+    def state(self, key: str) -> str:
+        """Current state of `key`: closed, open or half-open"""
+        with self._lock:
+            circuit = self._circuit(key)
+            if circuit.state == OPEN and time.monotonic() - circuit.opened_at >= circuit.cooldown:
+                return HALF_OPEN
+            return circuit.state
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-key statistics for keys that ever failed
+
+        Returns:
+            Dict key -> state, consecutive_failures, trips, rejected
+        """
+        with self._lock:
+            keys = [key for key, circuit in self._circuits.items() if circuit.trips or circuit.failures]
+        return {
+            key: {
+                "state": self.state(key),
+                "consecutive_failures": self._circuits[key].failures,
+                "trips": self._circuits[key].trips,
+                "rejected": self._circuits[key].rejected,
+            }
+            for key in keys
+        }
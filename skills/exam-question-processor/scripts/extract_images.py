@@ -4,25 +4,62 @@ Extract text from exam question images using OpenRouter Vision API
 This script processes images containing exam questions and extracts the text
 using vision language models via OpenRouter API.
 
+Requests, retries, caching and metrics go through the shared
+ExtractionEngine (extraction_engine.py); this script only walks the folder
+and writes the results.
+
 Features:
 - Automatic retry with exponential backoff
+- OpenRouter, local mock or Gemini CLI backend
 - Progress tracking
+- Optional streaming into the output file as text arrives
+- Optional perceptual-hash dedup of re-shot pages (one request per page)
+- Optional page segmentation (one request per question instead of per page)
 - Error handling and logging
-- Support for multiple image formats
+- Support for multiple image formats, and PDFs (pages rendered one at a
+  time, right before they are sent)
 - UTF-8 encoding for Vietnamese text
 """
 
 import argparse
-import base64
 import io
-import json
+import os
 import re
 import sys
 import time
 from pathlib import Path
-from typing import Optional, Tuple
-
-import requests
+from typing import Any, Dict, List, Optional, Tuple
+
+from circuit_breaker import CircuitBreaker
+from extraction_engine import (
+    BACKENDS,
+    DEFAULT_MODEL,
+    DEFAULT_TIMEOUT,
+    OPENROUTER_URL,
+    TRUNCATED,
+    ExtractionEngine,
+    OpenRouterBackend,
+    create_backend
+)
+from folder_scan import scan_files, unique_stems
+from http_transport import create_transport, format_timing_summary
+from image_dedup import HASHES, ImageDeduplicator, format_image_dedup_stats
+from image_preprocess import FORMATS, ImagePreprocessor, format_preprocess_stats
+from job_journal import JOURNAL_FILE, JobJournal, format_journal_summary, result_fields
+from page_segment import DEFAULT_GAP_FACTOR, PageSegmenter, format_segment_stats
+from pdf_pages import DEFAULT_DPI, expand_pdfs
+from rate_limiter import AdaptiveRateLimiter
+from request_metrics import MetricsRecorder, format_metrics_summary
+from result_cache import DEFAULT_CACHE_FILE, ResultCache
+from stream_writer import StreamingTextFile
+
+API_URL = OPENROUTER_URL
+
+EXTRACTION_PROMPT = (
+    "Extract all text from this exam question image. Include question numbers, "
+    "question text, and all answer options (A, B, C, D, etc.). "
+    "Preserve the exact formatting and structure."
+)
 
 # Fix Windows encoding issues
 if sys.platform == 'win32':
@@ -44,147 +81,96 @@ def natural_sort_key(filename):
     return [int(part) if part.isdigit() else part for part in parts]
 
 
-def encode_image_to_base64(image_path: Path) -> str:
+def extract_text_from_image(
+    image_path: Path,
+    api_key: Optional[str] = None,
+    model: str = DEFAULT_MODEL,
+    max_retries: int = 3,
+    timeout: int = DEFAULT_TIMEOUT,
+    rate_limiter: Optional[AdaptiveRateLimiter] = None,
+    transport=None,
+    cache: Optional[ResultCache] = None,
+    preprocessor: Optional[ImagePreprocessor] = None,
+    api_url: str = API_URL,
+    breaker: Optional[CircuitBreaker] = None,
+    engine: Optional[ExtractionEngine] = None,
+    sink: Optional[StreamingTextFile] = None
+) -> Dict[str, Any]:
     """
-    Encode image file to base64 string
+    Extract text from one image through the shared extraction engine
 
     Args:
         image_path: Path to image file
+        api_key: OpenRouter API key
+        model: Model identifier (default: Gemini 2.0 Flash)
+        max_retries: Maximum retry attempts (default: 3)
+        timeout: Request timeout in seconds (default: 120)
+        rate_limiter: Shared adaptive rate limiter (default: a private one)
+        transport: Shared pooled HTTP transport (default: a private one)
+        cache: Content-addressed result cache (default: no cache)
+        preprocessor: Resize/recompress stage applied before encoding
+        api_url: Chat completions endpoint (default: OpenRouter)
+        breaker: Shared circuit breaker; fails fast while the model/endpoint is down
+        engine: Engine to use; the other arguments only build a private
+            OpenRouter engine when this is None
+        sink: Output file the text is streamed into (engine in stream mode)
 
     Returns:
-        Base64 encoded string
+        Engine result dict: success, extracted_text or error/error_type,
+        model, attempts, usage, cached
     """
-    with open(image_path, 'rb') as f:
-        return base64.b64encode(f.read()).decode('utf-8')
+    private_engine = engine is None
+    if private_engine:
+        try:
+            backend = OpenRouterBackend(
+                api_key,
+                api_url,
+                transport=transport or create_transport(pool_size=1),
+                timeout=timeout
+            )
+        except ValueError as e:
+            return {"success": False, "error": str(e), "error_type": type(e).__name__, "attempts": 0}
+        engine = ExtractionEngine(
+            backend,
+            rate_limiter=rate_limiter,
+            cache=cache,
+            preprocessor=preprocessor,
+            breaker=breaker,
+            models=[model]
+        )
+
+    try:
+        result = engine.extract_text_from_image(
+            str(image_path),
+            prompt=EXTRACTION_PROMPT,
+            model=model,
+            retry_with_other_models=False,
+            max_retries=max_retries,
+            sink=sink
+        )
+    finally:
+        # A private engine (and its private transport) lives for this call only;
+        # a transport passed in by the caller is left open for its next image
+        if private_engine and transport is None:
+            engine.close()
+    if result.get("finish_reason") in TRUNCATED:
+        print(f"  ⚠️  Output cut short ({result['finish_reason']})")
+    return result
 
 
-def extract_text_from_image(
-    image_path: Path,
-    api_key: str,
-    model: str = "google/gemini-2.0-flash-exp:free",
-    max_retries: int = 3,
-    timeout: int = 30
-) -> Tuple[Optional[str], Optional[str]]:
+def format_metadata_header(metadata: dict) -> str:
     """
-    Extract text from image using OpenRouter Vision API with retry logic
+    Metadata block written above the extracted text
 
     Args:
-        image_path: Path to image file
-        api_key: OpenRouter API key
-        model: Model identifier (default: Gemini 2.0 Flash)
-        max_retries: Maximum retry attempts (default: 3)
-        timeout: Request timeout in seconds (default: 30)
+        metadata: Metadata dictionary (image path, model, timestamp)
 
     Returns:
-        Tuple of (extracted_text, error_message)
-        Returns (text, None) on success
-        Returns (None, error) on failure
+        Header text
     """
-    # Encode image
-    try:
-        base64_image = encode_image_to_base64(image_path)
-    except Exception as e:
-        return None, f"Failed to encode image: {str(e)}"
-
-    # Determine MIME type
-    extension = image_path.suffix.lower()
-    mime_types = {
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.png': 'image/png',
-        '.gif': 'image/gif',
-        '.webp': 'image/webp'
-    }
-    mime_type = mime_types.get(extension, 'image/jpeg')
-
-    # Prepare API request
-    url = "https://openrouter.ai/api/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-
-    payload = {
-        "model": model,
-        "messages": [
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": "Extract all text from this exam question image. Include question numbers, question text, and all answer options (A, B, C, D, etc.). Preserve the exact formatting and structure."
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:{mime_type};base64,{base64_image}"
-                        }
-                    }
-                ]
-            }
-        ]
-    }
-
-    # Retry loop
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=timeout)
-
-            # Handle rate limiting
-            if response.status_code == 429:
-                wait_time = 60  # Wait 60 seconds for rate limit
-                if attempt < max_retries - 1:
-                    print(f"  ⏳ Rate limit hit. Waiting {wait_time}s before retry...")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    return None, "Rate limit exceeded after all retries"
-
-            # Handle server errors with exponential backoff
-            if response.status_code >= 500:
-                wait_time = 2 ** attempt  # Exponential backoff: 1s, 2s, 4s
-                if attempt < max_retries - 1:
-                    print(f"  ⚠️  Server error {response.status_code}. Retrying in {wait_time}s...")
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    return None, f"Server error {response.status_code} after all retries"
-
-            # Check for success
-            response.raise_for_status()
-
-            # Parse response
-            result = response.json()
-
-            # Extract text from response
-            if 'choices' in result and len(result['choices']) > 0:
-                content = result['choices'][0]['message']['content']
-                return content, None
-            else:
-                return None, "No content in API response"
-
-        except requests.exceptions.Timeout:
-            wait_time = 2 ** attempt
-            if attempt < max_retries - 1:
-                print(f"  ⏱️  Timeout. Retrying in {wait_time}s...")
-                time.sleep(wait_time)
-                continue
-            else:
-                return None, "Request timeout after all retries"
-
-        except requests.exceptions.RequestException as e:
-            wait_time = 2 ** attempt
-            if attempt < max_retries - 1:
-                print(f"  ⚠️  Network error. Retrying in {wait_time}s...")
-                time.sleep(wait_time)
-                continue
-            else:
-                return None, f"Network error after all retries: {str(e)}"
-
-        except Exception as e:
-            return None, f"Unexpected error: {str(e)}"
-
-    return None, "Failed after all retries"
+    lines = ["=" * 80, "EXTRACTED TEXT METADATA", "=" * 80]
+    lines += [f"{key}: {value}" for key, value in metadata.items()]
+    return "\n".join(lines) + "\n" + "=" * 80 + "\n\n"
 
 
 def save_extracted_text(text: str, output_path: Path, metadata: dict = None):
@@ -201,12 +187,7 @@ def save_extracted_text(text: str, output_path: Path, metadata: dict = None):
     with open(output_path, 'w', encoding='utf-8') as f:
         # Write metadata header if provided
         if metadata:
-            f.write("=" * 80 + "\n")
-            f.write("EXTRACTED TEXT METADATA\n")
-            f.write("=" * 80 + "\n")
-            for key, value in metadata.items():
-                f.write(f"{key}: {value}\n")
-            f.write("=" * 80 + "\n\n")
+            f.write(format_metadata_header(metadata))
 
         # Write extracted text
         f.write(text)
@@ -215,10 +196,25 @@ def save_extracted_text(text: str, output_path: Path, metadata: dict = None):
 def process_images_folder(
     input_folder: str,
     output_folder: str,
-    api_key: str,
-    model: str = "google/gemini-2.0-flash-exp:free",
+    api_key: Optional[str] = None,
+    model: Optional[str] = None,
     max_retries: int = 3,
-    image_extensions: Tuple[str, ...] = ('.png', '.jpg', '.jpeg', '.webp', '.gif')
+    image_extensions: Tuple[str, ...] = ('.png', '.jpg', '.jpeg', '.webp', '.gif', '.pdf'),
+    http2: bool = False,
+    cache: Optional[ResultCache] = None,
+    preprocessor: Optional[ImagePreprocessor] = None,
+    resume: bool = True,
+    api_url: str = API_URL,
+    metrics: Optional[MetricsRecorder] = None,
+    breaker: Optional[CircuitBreaker] = None,
+    backend: str = "openrouter",
+    timeout: float = DEFAULT_TIMEOUT,
+    stream: bool = False,
+    deduplicator: Optional[ImageDeduplicator] = None,
+    pdf_dpi: int = DEFAULT_DPI,
+    segmenter: Optional[PageSegmenter] = None,
+    recursive: bool = False,
+    ordered: bool = True
 ):
     """
     Process all images in a folder
@@ -226,10 +222,32 @@ def process_images_folder(
     Args:
         input_folder: Path to folder containing images
         output_folder: Path to save extracted text files
-        api_key: OpenRouter API key
-        model: Vision model to use
+        api_key: OpenRouter API key (openrouter backend only)
+        model: Vision model to use (default: the backend's default model)
         max_retries: Maximum retry attempts per image
-        image_extensions: Tuple of valid image extensions
+        image_extensions: Tuple of valid image extensions (.pdf files are
+            split into pages, see pdf_pages.py)
+        http2: Use HTTP/2 via httpx instead of requests
+        cache: Content-addressed result cache shared across runs
+        preprocessor: Resize/recompress stage applied before encoding
+        resume: Keep a job journal in the output folder and skip images a
+            previous run already finished
+        api_url: Chat completions endpoint (default: OpenRouter)
+        metrics: Per-image latency recorder (summary printed at the end)
+        breaker: Circuit breaker shared by all images (default: a new one)
+        backend: "openrouter", "mock" or "gemini-cli" (see extraction_engine.py)
+        timeout: Request timeout in seconds
+        stream: Stream responses into the output files as they arrive
+            (published under the final name only when complete)
+        deduplicator: Cluster near-identical images and extract only the first
+            of each cluster; its text is copied to the others
+        pdf_dpi: Resolution PDF pages are rendered at
+        segmenter: Cut pages into one image per question before extraction
+        recursive: Also process images in subfolders (outputs stay flat, so
+            a name seen twice is only processed once)
+        ordered: List the whole folder and process in natural order; False
+            starts on the first image found while listing continues
+            (directory order, no dedup)
     """
     input_path = Path(input_folder)
     output_path = Path(output_folder)
@@ -243,20 +261,101 @@ def process_images_folder(
         print(f"❌ Error: Input path is not a directory: {input_folder}")
         return
 
-    # Get all image files
-    image_files = []
-    for ext in image_extensions:
-        image_files.extend(input_path.glob(f"*{ext}"))
-
-    # Natural sort
-    image_files = sorted(image_files, key=natural_sort_key)
-
-    if not image_files:
-        print(f"⚠️  No images found in {input_folder}")
+    if deduplicator is not None and not ordered:
+        print("⚠️  Image dedup needs the whole folder: listing it before extracting")
+        ordered = True
+
+    # One scandir pass, all extensions at once
+    discovered = scan_files(input_path, image_extensions, recursive=recursive)
+    if recursive:
+        discovered = unique_stems(discovered)
+
+    all_names: List[str] = []
+    skipped = 0
+    if ordered:
+        # Natural sort; each PDF becomes its pages, in place (nothing rendered yet)
+        image_files = expand_pdfs(sorted(discovered, key=natural_sort_key))
+
+        if not image_files:
+            print(f"⚠️  No images found in {input_folder}")
+            return
+
+        # Whole pages -> one crop per question (crop names keep the natural order)
+        if segmenter is not None:
+            pages = len(image_files)
+            image_files = segmenter.split_all(image_files)
+            if len(image_files) > pages:
+                print(f"\n Cut {pages} pages into {len(image_files)} question images")
+
+        all_names = [image_file.name for image_file in image_files]
+    else:
+        def pending_images():
+            """Images as the folder is listed, finished ones skipped"""
+            nonlocal skipped
+            for found in discovered:
+                for page in expand_pdfs([found]):
+                    for image_file in (segmenter.split(page) if segmenter is not None else [page]):
+                        all_names.append(image_file.name)
+                        if journal is not None and journal.is_done(image_file.name):
+                            skipped += 1
+                            continue
+                        yield image_file
+
+        image_files = pending_images()
+
+    # One engine (backend, limiter, connection pool, breaker) for the whole folder
+    try:
+        engine = ExtractionEngine(
+            create_backend(
+                backend,
+                api_key=api_key,
+                api_url=api_url,
+                transport=create_transport(pool_size=1, http2=http2),
+                timeout=timeout
+            ),
+            cache=cache,
+            preprocessor=preprocessor,
+            metrics=metrics,
+            breaker=breaker,
+            models=[model] if model else None,
+            stream=stream,
+            pdf_dpi=pdf_dpi
+        )
+    except (ValueError, ImportError) as e:
+        print(f"❌ Error: {e}")
         return
-
-    print(f"\n Found {len(image_files)} images in {input_folder}")
-    print(f" Using model: {model}")
+    model = engine.model
+
+    # Resume from the journal of an earlier (possibly crashed) run
+    journal = None
+    if resume:
+        output_path.mkdir(parents=True, exist_ok=True)
+        journal = JobJournal(output_path / JOURNAL_FILE)
+        if ordered:
+            finished = [image_file for image_file in image_files if journal.is_done(image_file.name)]
+            if finished:
+                print(f"\n Skipping {len(finished)} images finished in an earlier run")
+                image_files = [image_file for image_file in image_files if not journal.is_done(image_file.name)]
+            journal.start_run([image_file.name for image_file in image_files], folder=str(input_folder), model=model)
+        else:
+            journal.start_run([], folder=str(input_folder), model=model, streamed=True)
+
+    # Re-shot photos of one page: extract the first, copy its text to the others
+    duplicates = {}
+    if deduplicator is not None and len(image_files) > 1:
+        total = len(image_files)
+        image_files, duplicates = deduplicator.cluster(image_files)
+        if duplicates:
+            print(f"\n {total - len(image_files)} near-duplicate images will reuse the text of "
+                  f"{len(duplicates)} others")
+    if ordered:
+        total = len(image_files) + sum(len(members) for members in duplicates.values())
+        planned = str(len(image_files))
+        print(f"\n Found {len(image_files)} images in {input_folder}")
+    else:
+        planned = "?"
+        print(f"\n Extracting images from {input_folder} while it is listed")
+    print(f" Using model: {model} ({backend})")
     print(f" Output folder: {output_folder}")
     print("=" * 80)
 
@@ -266,48 +365,111 @@ def process_images_folder(
     failed_files = []
 
     for idx, image_file in enumerate(image_files, 1):
-        print(f"\n[{idx}/{len(image_files)}] Processing: {image_file.name}")
-
-        # Extract text
-        text, error = extract_text_from_image(
-            image_file,
-            api_key,
-            model,
-            max_retries
-        )
-
-        if error:
-            print(f"  ❌ Failed: {error}")
-            failed += 1
-            failed_files.append((image_file.name, error))
-            continue
+        print(f"\n[{idx}/{planned}] Processing: {image_file.name}")
 
-        # Save extracted text
         output_filename = f"{image_file.stem}_extracted.txt"
         output_file = output_path / output_filename
-
         metadata = {
             "Image": image_file.name,
             "Model": model,
             "Timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
         }
 
-        save_extracted_text(text, output_file, metadata)
+        sink = None
+        if stream:
+            sink = StreamingTextFile(
+                output_file,
+                header=lambda answered_by: format_metadata_header(dict(metadata, Model=answered_by))
+            )
+
+        # Extract text
+        result = extract_text_from_image(
+            image_file, model=model, max_retries=max_retries, engine=engine, sink=sink
+        )
+
+        if not result["success"]:
+            error = result["error"]
+            if sink is not None:
+                sink.abort()
+            print(f"  ❌ Failed: {error}")
+            for failed_image in [image_file] + duplicates.get(image_file, []):
+                failed += 1
+                failed_files.append((failed_image.name, error))
+                if journal is not None:
+                    journal.record(
+                        failed_image.name, "failed",
+                        attempts=result.get("attempts", 0) if failed_image == image_file else 0,
+                        error=error,
+                        error_type=result.get("error_type")
+                    )
+            continue
+
+        # Save extracted text (a streamed file only needs to be published)
+        text = result["extracted_text"]
+        if sink is not None and sink.started:
+            sink.finish()
+        else:
+            save_extracted_text(text, output_file, metadata)
         print(f"  ✅ Saved: {output_filename}")
         successful += 1
+        if journal is not None:
+            journal.record(image_file.name, "done", output=output_filename, **result_fields(result))
+
+        for member in duplicates.get(image_file, []):
+            member_filename = f"{member.stem}_extracted.txt"
+            save_extracted_text(
+                text,
+                output_path / member_filename,
+                dict(metadata, Image=member.name, **{"Duplicate Of": image_file.name})
+            )
+            print(f"  ✅ Saved: {member_filename} (duplicate of {image_file.name})")
+            successful += 1
+            if journal is not None:
+                journal.record(member.name, "done", model=model, output=member_filename)
+
+    if not ordered:
+        if skipped:
+            print(f"\n Skipped {skipped} images finished in an earlier run")
+        if not all_names:
+            print(f"⚠️  No images found in {input_folder}")
+        total = successful + failed
 
     # Summary
     print("\n" + "=" * 80)
     print(" EXTRACTION SUMMARY")
     print("=" * 80)
-    print(f"✅ Successful: {successful}/{len(image_files)}")
-    print(f"❌ Failed: {failed}/{len(image_files)}")
+    print(f"✅ Successful: {successful}/{total}")
+    print(f"❌ Failed: {failed}/{total}")
 
     if failed_files:
         print("\n⚠️  Failed files:")
         for filename, error in failed_files:
             print(f"  - {filename}: {error}")
 
+    print()
+    transport = getattr(engine.backend, 'transport', None)
+    if transport is not None:
+        print(f" HTTP: {format_timing_summary(transport.timing_summary())}")
+    for key, stats in engine.breaker.stats().items():
+        print(f" Circuit {key}: {stats['state']}, tripped {stats['trips']}x, "
+              f"rejected {stats['rejected']} requests")
+    for line in format_metrics_summary(engine.metrics.summary()).splitlines():
+        print(f" {line}")
+    if preprocessor is not None:
+        print(f" Preprocess: {format_preprocess_stats(preprocessor.stats())}")
+    if segmenter is not None:
+        print(f" Segmentation: {format_segment_stats(segmenter.stats())}")
+    if deduplicator is not None:
+        print(f" Image dedup: {format_image_dedup_stats(deduplicator.stats())}")
+    if cache is not None:
+        cache_stats = cache.stats()
+        print(f" Cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+              f"({cache_stats['entries']} entries, {cache_stats['bytes']:,} bytes)")
+    if journal is not None:
+        print(f" Journal: {format_journal_summary(journal.summary(all_names))}")
+        journal.close()
+    engine.close()
+
     print(f"\n Output saved to: {output_folder}")
 
 
@@ -333,6 +495,21 @@ Examples:
     --input-folder images \\
     --api-key sk-or-xxx \\
     --max-retries 5
+
+  # Use the local Gemini CLI instead of OpenRouter
+  python extract_images.py --input-folder images --backend gemini-cli
+
+  # Send re-shot photos of the same page only once
+  python extract_images.py --input-folder images --api-key sk-or-xxx --dedup-images
+
+  # Whole-page photos: one request per question instead of per page
+  python extract_images.py --input-folder images --api-key sk-or-xxx --segment
+
+  # Large nested folder: start extracting while it is still being listed
+  python extract_images.py --input-folder exams --api-key sk-or-xxx --recursive --unordered
+
+  # Folder of scanned exam PDFs (each page rendered right before it is sent)
+  python extract_images.py --input-folder scans --api-key sk-or-xxx --pdf-dpi 200
         """
     )
 
@@ -350,14 +527,23 @@ Examples:
 
     parser.add_argument(
         '--api-key',
-        required=True,
-        help='OpenRouter API key (get from https://openrouter.ai/keys)'
+        default=None,
+        help='OpenRouter API key (get from https://openrouter.ai/keys; '
+             'can also use OPENROUTER_API_KEY environment variable)'
+    )
+
+    parser.add_argument(
+        '--backend',
+        choices=list(BACKENDS),
+        default='openrouter',
+        help='Where requests go: OpenRouter, an in-process mock server, or the gemini CLI '
+             '(default: openrouter)'
     )
 
     parser.add_argument(
         '--model',
-        default='google/gemini-2.0-flash-exp:free',
-        help='Vision model to use (default: google/gemini-2.0-flash-exp:free)'
+        default=None,
+        help=f'Vision model to use (default: {DEFAULT_MODEL}; gemini-cli: $GEMINI_MODEL or gemini-2.5-flash)'
     )
 
     parser.add_argument(
@@ -367,20 +553,209 @@ Examples:
         help='Maximum retry attempts per image (default: 3)'
     )
 
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help=f'Request timeout in seconds (default: {DEFAULT_TIMEOUT})'
+    )
+
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Stream responses (SSE) into the output files as they are generated'
+    )
+
+    parser.add_argument(
+        '--dedup-images',
+        action='store_true',
+        help='Cluster near-identical images by perceptual hash, extract one per cluster and '
+             'copy its text to the others (requires Pillow)'
+    )
+
+    parser.add_argument(
+        '--dedup-method',
+        choices=list(HASHES),
+        default='phash',
+        help='Perceptual hash for --dedup-images (default: phash)'
+    )
+
+    parser.add_argument(
+        '--dedup-distance',
+        type=int,
+        default=None,
+        help='Max Hamming distance (bits of a 256-bit hash) between duplicates '
+             '(default: 56 for phash, 38 for dhash, 8 for ahash)'
+    )
+
+    parser.add_argument(
+        '--recursive',
+        action='store_true',
+        help='Also process images in subfolders (outputs stay in one folder, so names must differ)'
+    )
+
+    parser.add_argument(
+        '--unordered',
+        action='store_true',
+        help='Start extracting as soon as the first image is found instead of listing and '
+             'natural-sorting the whole folder first (directory order; not with --dedup-images)'
+    )
+
+    parser.add_argument(
+        '--segment',
+        action='store_true',
+        help='Cut each page at the whitespace between questions and extract every question '
+             'as its own image (crops cached in <output>/.segments; requires Pillow)'
+    )
+
+    parser.add_argument(
+        '--segment-gap',
+        type=float,
+        default=DEFAULT_GAP_FACTOR,
+        help='A blank gap this many times the typical line gap separates two questions '
+             f'(default: {DEFAULT_GAP_FACTOR})'
+    )
+
+    parser.add_argument(
+        '--pdf-dpi',
+        type=int,
+        default=DEFAULT_DPI,
+        help=f'Resolution PDF pages are rendered at (requires PyMuPDF; default: {DEFAULT_DPI})'
+    )
+
+    parser.add_argument(
+        '--http2',
+        action='store_true',
+        help='Use HTTP/2 via httpx (requires: pip install "httpx[http2]")'
+    )
+
+    parser.add_argument(
+        '--preprocess',
+        action='store_true',
+        help='Resize and recompress images before upload (requires Pillow)'
+    )
+
+    parser.add_argument(
+        '--max-edge',
+        type=int,
+        default=2000,
+        help='Longest image side in pixels when preprocessing (default: 2000)'
+    )
+
+    parser.add_argument(
+        '--image-format',
+        choices=sorted(FORMATS),
+        default='jpeg',
+        help='Format of preprocessed images (default: jpeg)'
+    )
+
+    parser.add_argument(
+        '--quality',
+        type=int,
+        default=85,
+        help='JPEG/WebP quality of preprocessed images (default: 85)'
+    )
+
+    parser.add_argument(
+        '--grayscale',
+        action='store_true',
+        help='Convert preprocessed images to grayscale'
+    )
+
+    parser.add_argument(
+        '--cache-file',
+        default=str(DEFAULT_CACHE_FILE),
+        help=f'SQLite result cache shared across runs (default: {DEFAULT_CACHE_FILE})'
+    )
+
+    parser.add_argument(
+        '--cache-max-mb',
+        type=int,
+        default=512,
+        help='Max cache size in MB before LRU eviction (default: 512)'
+    )
+
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Disable the result cache'
+    )
+
+    parser.add_argument(
+        '--api-url',
+        default=API_URL,
+        help='Chat completions endpoint (default: OpenRouter; see mock_openrouter.py for offline runs)'
+    )
+
+    parser.add_argument(
+        '--no-resume',
+        action='store_true',
+        help='Do not read or write the job journal (.journal.jsonl in the output folder)'
+    )
+
     args = parser.parse_args()
 
+    api_key = args.api_key or os.getenv('OPENROUTER_API_KEY')
+
     # Validate API key format
-    if not args.api_key.startswith('sk-or-'):
+    if args.backend == 'openrouter' and not (api_key or '').startswith('sk-or-'):
         print("⚠️  Warning: API key should start with 'sk-or-'")
         print("Get your key at: https://openrouter.ai/keys")
 
+    cache = None
+    if not args.no_cache:
+        cache = ResultCache(args.cache_file, max_bytes=args.cache_max_mb * 1024 * 1024)
+
+    preprocessor = None
+    if args.preprocess:
+        preprocessor = ImagePreprocessor(
+            max_edge=args.max_edge,
+            image_format=args.image_format,
+            quality=args.quality,
+            grayscale=args.grayscale,
+            cache_dir=Path(args.output_folder) / ".preprocessed"
+        )
+
+    deduplicator = None
+    if args.dedup_images:
+        try:
+            deduplicator = ImageDeduplicator(method=args.dedup_method, max_distance=args.dedup_distance)
+        except ImportError as e:
+            print(f"❌ Error: {e}")
+            return
+
+    segmenter = None
+    if args.segment:
+        try:
+            segmenter = PageSegmenter(
+                cache_dir=Path(args.output_folder) / ".segments",
+                gap_factor=args.segment_gap,
+                pdf_dpi=args.pdf_dpi
+            )
+        except (ValueError, ImportError) as e:
+            print(f"❌ Error: {e}")
+            return
+
     # Process images
     process_images_folder(
         args.input_folder,
         args.output_folder,
-        args.api_key,
+        api_key,
         args.model,
-        args.max_retries
+        args.max_retries,
+        http2=args.http2,
+        cache=cache,
+        preprocessor=preprocessor,
+        resume=not args.no_resume,
+        api_url=args.api_url,
+        backend=args.backend,
+        timeout=args.timeout,
+        stream=args.stream,
+        deduplicator=deduplicator,
+        pdf_dpi=args.pdf_dpi,
+        segmenter=segmenter,
+        recursive=args.recursive,
+        ordered=not args.unordered
     )
 
 
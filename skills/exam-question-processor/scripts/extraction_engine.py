@@ -0,0 +1,1464 @@
+"""
+Shared extraction engine for both extractor CLIs
+
+image_text_extractor.py and extract_images.py used to carry their own copy
+of encoding, MIME detection, request building and retry logic. Everything
+between "here is an image" and "here is its text" now lives here, behind a
+small backend interface, so a performance fix lands once and both entry
+points get it.
+
+Features:
+- Pluggable backends: OpenRouter (HTTP), local mock server, Gemini CLI
+- One retry policy: 429 honours the rate limiter, 5xx/404 switch model or
+  back off, timeouts back off, open circuits fail fast or reroute
+- Content-addressed result cache, optional preprocessing and prefetch pipeline
+- Multi-image requests with per-image response splitting
+- Latency-aware model routing, hedged requests, circuit breaker
+- Per-image metrics for every request, cached or not
+- Optional SSE streaming: deltas mirrored to a sink as they arrive,
+  time-to-first-token, early cancellation of looping output
+
+Usage:
+    engine = ExtractionEngine(OpenRouterBackend(api_key="sk-or-..."))
+    result = engine.extract_text_from_image("q1.png")
+
+    engine = ExtractionEngine(create_backend("gemini-cli"), models=["gemini-2.5-flash"])
+"""
+
+import json
+import mimetypes
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import requests
+
+from circuit_breaker import OPEN, CircuitBreaker, CircuitOpenError, failure_scope
+from http_transport import create_transport
+from image_pipeline import ImagePipeline, prepare_image_file
+from image_preprocess import ImagePreprocessor
+from model_router import ModelRouter
+from payload_builder import build_vision_payload
+from pdf_pages import DEFAULT_DPI
+from rate_limiter import AdaptiveRateLimiter
+from request_metrics import MetricsRecorder
+from result_cache import ResultCache, make_cache_key
+from stream_writer import StreamingTextFile
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+DEFAULT_MODEL = "google/gemini-2.0-flash-001"
+DEFAULT_PROMPT = "Extract all text from this image."
+DEFAULT_TIMEOUT = 120
+
+# A streamed tail repeating this many times in a row is a runaway loop
+RUNAWAY_REPEATS = 8
+RUNAWAY_MIN_PERIOD = 16
+RUNAWAY_MAX_PERIOD = 400
+# Streamed characters between two loop checks
+RUNAWAY_CHECK_CHARS = 512
+# finish_reason values of an incomplete extraction
+TRUNCATED = ("length", "runaway")
+
+# Requests in flight the hedge pool is sized for until set_concurrency() is called
+HEDGE_CONCURRENCY = 8
+
+# Output tokens one packed request may ask for; larger packs are split
+DEFAULT_MAX_REQUEST_TOKENS = 8192
+
+# First line of each result block when several images share one request
+_BATCH_SEPARATOR_RE = re.compile(r'^\s*=+\s*IMAGE\s+(\d+)\s*=+\s*$', re.MULTILINE | re.IGNORECASE)
+
+
+def batched_prompt(prompt: str, image_count: int) -> str:
+    """
+    Add output-format instructions for a request carrying several images
+
+    Args:
+        prompt: Original prompt (applies to each image)
+        image_count: Number of images in the request
+
+    Returns:
+        Prompt for the batched request
+    """
+    return (
+        f"{prompt}\n\n"
+        f"You are given {image_count} images. Apply the instructions above to each image separately. "
+        f"Output one block per image, in the order the images were given. Start each block with a line "
+        f"exactly like \"===== IMAGE <n> =====\", where <n> is the image number from 1 to {image_count}. "
+        "Do not write anything outside these blocks."
+    )
+
+
+def split_batched_response(content: str, image_count: int) -> List[Optional[str]]:
+    """
+    Split a batched response into the text of each image
+
+    Args:
+        content: Response content
+        image_count: Number of images in the request
+
+    Returns:
+        Text per image in request order; None where no block was found
+    """
+    sections: List[Optional[str]] = [None] * image_count
+    matches = list(_BATCH_SEPARATOR_RE.finditer(content))
+
+    for i, match in enumerate(matches):
+        number = int(match.group(1))
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(content)
+        if 1 <= number <= image_count and sections[number - 1] is None:
+            sections[number - 1] = content[match.end():end].strip() or None
+
+    return sections
+
+
+def request_share(response: Dict[str, Any], owner: bool) -> Dict[str, Any]:
+    """
+    Response of a packed request as seen by one of its images
+
+    The request was sent (and retried) once for all its images, so its
+    upload bytes, encode time, rate-limit wait, attempts and retry reasons
+    are kept on one image (the owner) and zeroed on the others; summing the
+    rows then gives the request's real figures.
+
+    Args:
+        response: Output of _send_vision_request for the packed request
+        owner: This image carries the request-level figures
+
+    Returns:
+        The response itself for the owner, otherwise a copy with those figures at 0
+    """
+    if owner:
+        return response
+    metrics = dict(
+        response.get("metrics") or {},
+        encode_seconds=0.0,
+        upload_bytes=0,
+        rate_wait_seconds=0.0,
+        attempts=0,
+        retry_reasons=[]
+    )
+    return dict(response, attempts=0, metrics=metrics)
+
+
+def iter_sse_data(lines: Iterable) -> Iterator[Dict[str, Any]]:
+    """
+    Parse the data events of a chat-completions SSE stream
+
+    Args:
+        lines: Response lines (bytes or str), e.g. response.iter_lines()
+
+    Yields:
+        Decoded JSON chunks, until "data: [DONE]"
+    """
+    for raw in lines:
+        line = raw.decode('utf-8') if isinstance(raw, bytes) else raw
+        # Blank separators, ": OPENROUTER PROCESSING" keep-alives, event:/id: fields
+        if not line.startswith('data:'):
+            continue
+        data = line[5:].strip()
+        if data == '[DONE]':
+            return
+        if data:
+            yield json.loads(data)
+
+
+def repeating_tail(
+    text: str,
+    repeats: int = RUNAWAY_REPEATS,
+    min_period: int = RUNAWAY_MIN_PERIOD,
+    max_period: int = RUNAWAY_MAX_PERIOD
+) -> int:
+    """
+    Detect a model stuck repeating the same passage
+
+    Args:
+        text: Output so far
+        repeats: Back-to-back copies that count as a loop
+        min_period: Shortest repeated passage (shorter ones are dashes/blanks)
+        max_period: Longest repeated passage checked
+
+    Returns:
+        Characters to cut so one copy of the passage remains (0 = no loop)
+    """
+    for period in range(min_period, max_period + 1):
+        span = period * repeats
+        if span > len(text):
+            break
+        tail = text[-span:]
+        # Periodic iff the tail equals itself shifted by one period
+        if tail[period:] == tail[:-period] and len(set(tail[:period])) > 2:
+            # Walk back to where the loop started, keep its first copy
+            start = len(text) - span
+            while start > 0 and text[start - 1] == text[start - 1 + period]:
+                start -= 1
+            return len(text) - start - period
+    return 0
+
+
+class _StreamCollector:
+    """
+    Deltas of one streamed request: mirrored to a sink, checked for loops
+    """
+
+    def __init__(self, sink: Optional[StreamingTextFile] = None):
+        self.sink = sink
+        self.parts: List[str] = []
+        self.runaway = 0
+        self._unchecked = 0
+
+    def begin(self, model: str):
+        """A new attempt starts (a retry discards the previous output)"""
+        self.parts = []
+        self.runaway = 0
+        self._unchecked = 0
+        if self.sink is not None:
+            self.sink.begin(model)
+
+    def __call__(self, delta: str) -> bool:
+        """
+        Take one delta
+
+        Returns:
+            True to cancel the stream (runaway loop)
+        """
+        self.parts.append(delta)
+        if self.sink is not None:
+            self.sink.write(delta)
+
+        self._unchecked += len(delta)
+        if self._unchecked >= RUNAWAY_CHECK_CHARS:
+            self._unchecked = 0
+            self.runaway = repeating_tail("".join(self.parts))
+        return self.runaway > 0
+
+
+class OpenRouterBackend:
+    """
+    OpenAI-compatible chat-completions endpoint (OpenRouter by default)
+
+    Requests are raised as requests.exceptions.* on failure, which is what
+    the engine's retry policy and circuit breaker classify.
+    """
+
+    name = "openrouter"
+    default_model = DEFAULT_MODEL
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        api_url: Optional[str] = None,
+        transport=None,
+        pool_size: int = 10,
+        timeout: float = DEFAULT_TIMEOUT
+    ):
+        """
+        Initialize the backend
+
+        Args:
+            api_key: OpenRouter API key (default: OPENROUTER_API_KEY)
+            api_url: Chat completions endpoint (default: OpenRouter)
+            transport: Pooled HTTP transport (see http_transport.py)
+            pool_size: Pool size when the transport is created here
+            timeout: Request timeout in seconds
+
+        Raises:
+            ValueError: No API key given or set in the environment
+        """
+        self.api_key = api_key or os.getenv('OPENROUTER_API_KEY')
+        if not self.api_key:
+            raise ValueError(
+                "No API key given. Pass one in or set the OPENROUTER_API_KEY environment variable"
+            )
+
+        self.url = api_url or OPENROUTER_URL
+        self.transport = transport or create_transport(pool_size=pool_size)
+        self.timeout = timeout
+
+    @property
+    def endpoint(self) -> str:
+        """Circuit breaker key for the whole backend"""
+        return self.url
+
+    def build(
+        self,
+        model: str,
+        prompt: str,
+        images: List[tuple],
+        temperature: float,
+        max_tokens: int,
+        stream: bool = False
+    ) -> bytearray:
+        """
+        Build the request body (images streamed through base64 into one buffer)
+
+        Args:
+            model: Model identifier
+            prompt: Prompt text
+            images: List of (path, mime_type)
+            temperature: Sampling temperature
+            max_tokens: Max tokens of the response
+            stream: Ask for an SSE response
+
+        Returns:
+            JSON request body
+        """
+        return build_vision_payload(
+            model, prompt, images,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True if stream else None
+        )
+
+    def send(self, model: str, request: bytearray, timing: Dict[str, Any], on_delta=None) -> Dict[str, Any]:
+        """
+        Send one request (raises on HTTP or network errors)
+
+        Args:
+            model: Model identifier
+            request: Body from build()
+            timing: Per-request timing dict (upload_bytes, request_seconds,
+                ttfb_seconds, ttft_seconds)
+            on_delta: For bodies built with stream=True: called with each
+                content delta; returning True cancels the stream
+
+        Returns:
+            {"content", "model", "usage", "headers", "finish_reason"}
+        """
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": "https://github.com/image-text-extractor",
+            "X-Title": "Image Text Extractor"
+        }
+
+        timing["upload_bytes"] += len(request)
+        request_start = time.perf_counter()
+        response = self.transport.post(
+            self.url,
+            headers=headers,
+            data=request,
+            timeout=self.timeout,
+            stream=on_delta is not None
+        )
+        timing["ttfb_seconds"] = response.elapsed.total_seconds()
+
+        if on_delta is None:
+            timing["request_seconds"] = time.perf_counter() - request_start
+            response.raise_for_status()
+            result = response.json()
+            choice = result["choices"][0]
+            return {
+                "content": choice["message"]["content"],
+                "model": result.get("model") or model,
+                "usage": result.get("usage"),
+                "headers": response.headers,
+                "finish_reason": choice.get("finish_reason")
+            }
+
+        try:
+            response.raise_for_status()
+            return self._read_stream(response, model, request_start, timing, on_delta)
+        finally:
+            # Closing mid-stream drops the connection, which stops generation
+            response.close()
+            timing["request_seconds"] = time.perf_counter() - request_start
+
+    def _read_stream(
+        self,
+        response: requests.Response,
+        model: str,
+        request_start: float,
+        timing: Dict[str, Any],
+        on_delta
+    ) -> Dict[str, Any]:
+        """
+        Consume an SSE response
+
+        Args:
+            response: Streaming response (status already checked)
+            model: Requested model
+            request_start: perf_counter() when the request was sent
+            timing: Per-request timing dict (ttft_seconds is set here)
+            on_delta: Delta callback; True cancels
+
+        Returns:
+            {"content", "model", "usage", "headers", "finish_reason"}
+        """
+        parts = []
+        usage = None
+        finish_reason = None
+        answered_by = model
+
+        for chunk in iter_sse_data(response.iter_lines()):
+            if "error" in chunk:
+                error = chunk["error"]
+                raise RuntimeError(f"Stream error: {error.get('message', error) if isinstance(error, dict) else error}")
+
+            answered_by = chunk.get("model") or answered_by
+            usage = chunk.get("usage") or usage
+            for choice in chunk.get("choices") or []:
+                finish_reason = choice.get("finish_reason") or finish_reason
+                delta = (choice.get("delta") or {}).get("content")
+                if not delta:
+                    continue
+                if not parts:
+                    timing["ttft_seconds"] = time.perf_counter() - request_start
+                parts.append(delta)
+                if on_delta(delta):
+                    return {
+                        "content": "".join(parts),
+                        "model": answered_by,
+                        "usage": usage,
+                        "headers": response.headers,
+                        "finish_reason": "runaway"
+                    }
+
+        return {
+            "content": "".join(parts),
+            "model": answered_by,
+            "usage": usage,
+            "headers": response.headers,
+            "finish_reason": finish_reason
+        }
+
+    def close(self):
+        """Release pooled connections"""
+        self.transport.close()
+
+
+class MockBackend(OpenRouterBackend):
+    """
+    OpenRouterBackend wired to an in-process MockOpenRouter server
+
+    For offline runs and benchmarks: no API key, no credits, no network.
+    """
+
+    name = "mock"
+
+    def __init__(self, transport=None, pool_size: int = 10, timeout: float = DEFAULT_TIMEOUT, **mock_options):
+        """
+        Start the mock server and point the backend at it
+
+        Args:
+            transport: Pooled HTTP transport
+            pool_size: Pool size when the transport is created here
+            timeout: Request timeout in seconds
+            **mock_options: MockOpenRouter options (latency, rate_429, rate_5xx, ...)
+        """
+        from mock_openrouter import MockOpenRouter
+
+        self.server = MockOpenRouter(**mock_options).start()
+        super().__init__(
+            api_key="sk-or-mock",
+            api_url=self.server.url,
+            transport=transport,
+            pool_size=pool_size,
+            timeout=timeout
+        )
+
+    def close(self):
+        """Release connections and stop the server"""
+        super().close()
+        self.server.stop()
+
+
+class GeminiCLIBackend:
+    """
+    Google's `gemini` command-line tool (see skills/gemini)
+
+    Images are attached with the CLI's @path syntax, relative to a working
+    directory that contains all of them (in-memory images such as rendered
+    PDF pages are written to a temporary folder by the engine first, see
+    needs_files). The CLI reports no token usage, and a timed-out run is
+    raised as requests.exceptions.Timeout so the engine treats a hung CLI
+    like a slow endpoint.
+    """
+
+    name = "gemini-cli"
+    default_model = os.environ.get('GEMINI_MODEL', 'gemini-2.5-flash')
+    needs_files = True
+
+    def __init__(self, command: str = "gemini", timeout: float = DEFAULT_TIMEOUT):
+        """
+        Initialize the backend
+
+        Args:
+            command: Gemini CLI executable
+            timeout: Seconds before a run is killed
+        """
+        self.command = command
+        self.timeout = timeout
+
+    @property
+    def endpoint(self) -> str:
+        """Circuit breaker key for the whole backend"""
+        return self.command
+
+    def build(
+        self,
+        model: str,
+        prompt: str,
+        images: List[tuple],
+        temperature: float,
+        max_tokens: int,
+        stream: bool = False
+    ) -> Dict[str, str]:
+        """
+        Build the CLI prompt with @references to the images
+
+        Args:
+            model: Model identifier (passed with -m)
+            prompt: Prompt text
+            images: List of (path, mime_type)
+            temperature: Ignored (the CLI has no flag for it)
+            max_tokens: Ignored (the CLI has no flag for it)
+            stream: Ignored (the output is delivered in one piece)
+
+        Returns:
+            {"prompt", "cwd"}
+        """
+        paths = [Path(path).resolve() for path, _ in images]
+        cwd = os.path.commonpath([str(path.parent) for path in paths])
+        references = " ".join(
+            "@" + os.path.relpath(path, cwd).replace(" ", "\\ ") for path in paths
+        )
+        return {"prompt": f"{prompt}\n\n{references}", "cwd": cwd}
+
+    def send(self, model: str, request: Dict[str, str], timing: Dict[str, Any], on_delta=None) -> Dict[str, Any]:
+        """
+        Run the CLI once (raises on timeout or non-zero exit)
+
+        Args:
+            model: Model identifier
+            request: Output of build()
+            timing: Per-request timing dict (request_seconds)
+            on_delta: Called once with the whole output
+
+        Returns:
+            {"content", "model", "usage", "headers", "finish_reason"}
+        """
+        request_start = time.perf_counter()
+        try:
+            completed = subprocess.run(
+                [self.command, '-m', model, '-p', request["prompt"]],
+                cwd=request["cwd"],
+                capture_output=True,
+                text=True,
+                encoding='utf-8',
+                timeout=self.timeout
+            )
+        except subprocess.TimeoutExpired:
+            raise requests.exceptions.Timeout(f"{self.command} timed out after {self.timeout:g}s")
+        finally:
+            timing["request_seconds"] = time.perf_counter() - request_start
+
+        if completed.returncode != 0:
+            detail = (completed.stderr or completed.stdout).strip().splitlines()
+            raise RuntimeError(
+                f"{self.command} exited with status {completed.returncode}"
+                + (f": {detail[-1]}" if detail else "")
+            )
+
+        content = completed.stdout.strip()
+        if not content:
+            raise RuntimeError(f"{self.command} returned no output")
+        if on_delta is not None:
+            timing["ttft_seconds"] = timing["request_seconds"]
+            on_delta(content)
+        return {"content": content, "model": model, "usage": {}, "headers": {}, "finish_reason": None}
+
+    def close(self):
+        """Nothing to release"""
+
+
+BACKENDS = {
+    OpenRouterBackend.name: OpenRouterBackend,
+    MockBackend.name: MockBackend,
+    GeminiCLIBackend.name: GeminiCLIBackend,
+}
+
+
+def create_backend(
+    name: str = "openrouter",
+    api_key: Optional[str] = None,
+    api_url: Optional[str] = None,
+    transport=None,
+    pool_size: int = 10,
+    timeout: float = DEFAULT_TIMEOUT
+):
+    """
+    Create a backend by name
+
+    Args:
+        name: "openrouter", "mock" or "gemini-cli"
+        api_key: OpenRouter API key (openrouter only)
+        api_url: Chat completions endpoint (openrouter only)
+        transport: Pooled HTTP transport (openrouter / mock)
+        pool_size: Pool size when the transport is created here
+        timeout: Request timeout in seconds
+
+    Returns:
+        Backend instance
+
+    Raises:
+        ValueError: Unknown backend or missing API key
+    """
+    if name == OpenRouterBackend.name:
+        return OpenRouterBackend(api_key, api_url, transport=transport, pool_size=pool_size, timeout=timeout)
+    if name == MockBackend.name:
+        return MockBackend(transport=transport, pool_size=pool_size, timeout=timeout)
+    if name == GeminiCLIBackend.name:
+        return GeminiCLIBackend(timeout=timeout)
+    raise ValueError(f"Unknown backend: {name} (use {', '.join(BACKENDS)})")
+
+
+class ExtractionEngine:
+    """
+    Image -> text with caching, retries, routing and metrics
+
+    The engine owns no files or folders; batch drivers (ImageTextExtractor,
+    extract_images.process_images_folder) decide what to extract and where
+    results go.
+    """
+
+    def __init__(
+        self,
+        backend,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        cache: Optional[ResultCache] = None,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        pipeline: Optional[ImagePipeline] = None,
+        metrics: Optional[MetricsRecorder] = None,
+        router: Optional[ModelRouter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        models: Optional[List[str]] = None,
+        stream: bool = False,
+        pdf_dpi: int = DEFAULT_DPI,
+        max_request_tokens: int = DEFAULT_MAX_REQUEST_TOKENS
+    ):
+        """
+        Initialize the engine
+
+        Args:
+            backend: OpenRouterBackend, MockBackend, GeminiCLIBackend (see create_backend)
+            rate_limiter: Shared adaptive rate limiter (default: a new one)
+            cache: Content-addressed result cache (None = no cache)
+            preprocessor: Resize/recompress stage before upload (None = original images)
+            pipeline: Process pool preparing images ahead (None = prepare inline)
+            metrics: Per-image metrics recorder (default: in memory)
+            router: Latency-aware model ranking + hedging (None = fixed order)
+            breaker: Per-model/endpoint circuit breaker (default: a new one)
+            models: Vision models in preference order (default: the backend's default_model)
+            stream: Request SSE responses (time-to-first-token, sinks written as
+                tokens arrive, looping output cancelled early; no hedging)
+            pdf_dpi: Resolution PDF pages are rendered at (when not prepared by the pipeline)
+            max_request_tokens: Output-token cap of one packed request (see images_per_pack)
+        """
+        self.backend = backend
+        self.vision_models = list(models or [backend.default_model])
+        self.model = self.vision_models[0]
+
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter()
+        self.cache = cache
+        self.preprocessor = preprocessor
+        self.pipeline = pipeline
+        self.metrics = metrics or MetricsRecorder()
+
+        self.router = router
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+        self._hedge_lock = threading.Lock()
+        # Primary + hedge per request in flight (see set_concurrency)
+        self._hedge_workers = 2 * HEDGE_CONCURRENCY
+
+        self.breaker = breaker or CircuitBreaker()
+        self.stream = stream
+        self.pdf_dpi = pdf_dpi
+        self.max_request_tokens = max_request_tokens
+
+    def set_concurrency(self, workers: int):
+        """
+        Size shared resources for `workers` requests in flight
+
+        The rate limiter lets the first request of every worker through, and
+        the hedge pool gets a thread for the primary and the hedge of every
+        request, so a primary never queues behind other requests (which
+        would push it past the hedge delay and fire a needless hedge).
+
+        Args:
+            workers: Requests that may be in flight at once
+        """
+        self.rate_limiter.set_concurrency(workers)
+        with self._hedge_lock:
+            size = max(self._hedge_workers, 2 * workers)
+            if size != self._hedge_workers:
+                self._hedge_workers = size
+                if self._hedge_executor is not None:
+                    # Running requests finish on the old threads
+                    self._hedge_executor.shutdown(wait=False)
+                    self._hedge_executor = None
+
+    def close(self):
+        """Release the backend and the hedge threads"""
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+            self._hedge_executor = None
+        self.backend.close()
+
+    def extract_text_from_image(
+        self,
+        image_path: str,
+        prompt: str = DEFAULT_PROMPT,
+        temperature: float = 0.3,
+        max_tokens: int = 4000,
+        model: Optional[str] = None,
+        retry_with_other_models: bool = True,
+        max_retries: int = 3,
+        sink: Optional[StreamingTextFile] = None
+    ) -> Dict[str, Any]:
+        """
+        Extract text from one image
+
+        Args:
+            image_path: Path to the image
+            prompt: Extraction prompt
+            temperature: Sampling temperature (0.0 - 1.0)
+            max_tokens: Max tokens of the response
+            model: Specific model (skips routing)
+            retry_with_other_models: Switch model on errors
+            max_retries: Attempts per model
+            sink: File the text is streamed into (stream mode only; the
+                caller finishes or aborts it)
+
+        Returns:
+            {"success": True, "image_path", "extracted_text", "model", "usage", "attempts"
+             [, "finish_reason" when the output was cut]} or
+            {"success": False, "image_path", "error", "error_type", "attempts"}
+        """
+        models_to_try = self._models_to_try(model)
+
+        prepared = self._prepare_image(image_path, prompt, temperature, max_tokens, models_to_try)
+        if "result" in prepared:
+            return prepared["result"]
+
+        response = self._send_vision_request(
+            [(prepared["upload_path"], prepared["mime_type"])],
+            prompt,
+            temperature,
+            max_tokens,
+            models_to_try,
+            retry_with_other_models,
+            max_retries,
+            sink=sink
+        )
+        return self._build_result(image_path, prepared, response)
+
+    def extract_text_from_images(
+        self,
+        image_paths: List[str],
+        prompt: str = DEFAULT_PROMPT,
+        temperature: float = 0.3,
+        max_tokens: int = 4000,
+        model: Optional[str] = None,
+        retry_with_other_models: bool = True,
+        max_retries: int = 3
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract text from several images in ONE request (prompt sent once).
+        The response is split per image; images whose block is missing are
+        extracted on their own.
+
+        Args:
+            image_paths: Image paths
+            prompt: Extraction prompt (applies to each image)
+            temperature: Sampling temperature (0.0 - 1.0)
+            max_tokens: Max tokens PER image
+            model: Specific model (skips routing)
+            retry_with_other_models: Switch model on errors
+            max_retries: Attempts per model
+
+        Returns:
+            Results in the order of image_paths
+        """
+        models_to_try = self._models_to_try(model)
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(image_paths)
+        pending = []  # (index, prepared) of images that need a request
+
+        for index, image_path in enumerate(image_paths):
+            prepared = self._prepare_image(image_path, prompt, temperature, max_tokens, models_to_try)
+            if "result" in prepared:
+                results[index] = prepared["result"]
+            else:
+                pending.append((index, prepared))
+
+        # Packs whose combined output budget fits in one response (max_request_tokens)
+        size = self.images_per_pack(max_tokens)
+        for first in range(0, len(pending), size):
+            self._extract_pack(
+                pending[first:first + size], image_paths, results, prompt, temperature,
+                max_tokens, models_to_try, retry_with_other_models, max_retries
+            )
+
+        return results
+
+    def images_per_pack(self, max_tokens: int = 4000) -> int:
+        """
+        Most images one packed request can hold
+
+        Args:
+            max_tokens: Output tokens allowed per image
+
+        Returns:
+            Images whose combined output budget fits in max_request_tokens (at least 1)
+        """
+        return max(1, self.max_request_tokens // max(1, max_tokens))
+
+    def _extract_pack(
+        self,
+        pack: List[tuple],
+        image_paths: List[str],
+        results: List[Optional[Dict[str, Any]]],
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        models_to_try: List[str],
+        retry_with_other_models: bool,
+        max_retries: int
+    ):
+        """
+        Send one packed request and fill in the results of its images
+
+        Args:
+            pack: (index, prepared) of the images of this request
+            image_paths: All image paths of the call (indexed by pack)
+            results: Results of the call, filled in place
+            prompt: Extraction prompt (applies to each image)
+            temperature: Sampling temperature
+            max_tokens: Max tokens PER image
+            models_to_try: Models to try in order
+            retry_with_other_models: Switch model on errors
+            max_retries: Attempts per model
+        """
+        if len(pack) == 1:
+            index, prepared = pack[0]
+            response = self._send_vision_request(
+                [(prepared["upload_path"], prepared["mime_type"])],
+                prompt, temperature, max_tokens,
+                models_to_try, retry_with_other_models, max_retries
+            )
+            results[index] = self._build_result(image_paths[index], prepared, response)
+            return
+
+        response = self._send_vision_request(
+            [(prepared["upload_path"], prepared["mime_type"]) for _, prepared in pack],
+            batched_prompt(prompt, len(pack)),
+            temperature,
+            min(max_tokens * len(pack), self.max_request_tokens),
+            models_to_try,
+            retry_with_other_models,
+            max_retries
+        )
+
+        sections = [None] * len(pack)
+        if response["success"]:
+            sections = split_batched_response(response["content"], len(pack))
+
+        # Split token usage evenly across the images of the batch
+        usage = response.get("usage") or {}
+        shared_usage = {
+            key: round(value / len(pack)) for key, value in usage.items()
+            if isinstance(value, (int, float))
+        }
+
+        # Bytes, encode time, rate wait and attempts belong to the request:
+        # recorded on the first image answered by it, 0 on the others
+        owner = True
+        for (index, prepared), section in zip(pack, sections):
+            image_path = image_paths[index]
+            if section is not None:
+                image_response = dict(
+                    request_share(response, owner), content=section, usage=shared_usage, batch_size=len(pack)
+                )
+                results[index] = self._build_result(image_path, prepared, image_response)
+                owner = False
+            elif response["success"]:
+                # No block for this image in the response: extract it alone
+                print(f"   ⚠️  No result block for {Path(image_path).name}, extracting it alone")
+                single = self._send_vision_request(
+                    [(prepared["upload_path"], prepared["mime_type"])],
+                    prompt, temperature, max_tokens,
+                    models_to_try, retry_with_other_models, max_retries
+                )
+                results[index] = self._build_result(image_path, prepared, single)
+            else:
+                results[index] = self._build_result(image_path, prepared, request_share(response, owner))
+                owner = False
+
+    def _prepare_image(
+        self,
+        image_path: str,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        models_to_try: List[str]
+    ) -> Dict[str, Any]:
+        """
+        Check the cache, detect the MIME type and preprocess before sending
+
+        Args:
+            image_path: Path to the image
+            prompt: Extraction prompt
+            temperature: Sampling temperature
+            max_tokens: Max tokens of the response
+            models_to_try: Models that may answer
+
+        Returns:
+            {"result": ...} when already decided (cache hit / unreadable image),
+            else {"upload_path", "mime_type", "cache_key", "started", "prepare_seconds"}
+        """
+        # Read + magic-byte check + hash (in the process pool if there is one);
+        # the image is encoded straight into the request body later
+        started = time.perf_counter()
+        cache_key = None
+        try:
+            if self.pipeline is not None:
+                prepared = self.pipeline.get(image_path)  # Already preprocessed in a worker
+            else:
+                prepared = prepare_image_file(image_path, pdf_dpi=self.pdf_dpi)
+
+            if self.cache is not None:
+                cache_key = make_cache_key(
+                    prepared["image_hash"],
+                    prompt,
+                    ",".join(sorted(models_to_try)),  # Independent of router order
+                    temperature,
+                    max_tokens,
+                    variant=self.preprocessor.signature() if self.preprocessor else ''
+                )
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    cached.update(image_path=image_path, attempts=0, cached=True)
+                    self.metrics.record(
+                        image=Path(image_path).name,
+                        model=cached.get("model"),
+                        success=True,
+                        cached=True,
+                        attempts=0,
+                        latency_seconds=time.perf_counter() - started
+                    )
+                    return {"result": cached}
+
+            # The file actually uploaded (possibly resized/recompressed)
+            upload_path = prepared["upload_path"]
+            mime_type = prepared["mime_type"]
+            if self.preprocessor is not None and self.pipeline is None:
+                rendered = upload_path if isinstance(upload_path, bytes) else None  # PDF page
+                processed_path, processed_mime = self.preprocessor.process(image_path, data=rendered)
+                if processed_mime is not None:
+                    upload_path, mime_type = processed_path, processed_mime
+        except Exception as e:
+            self.metrics.record(
+                image=Path(image_path).name,
+                success=False,
+                attempts=0,
+                error_type=type(e).__name__,
+                latency_seconds=time.perf_counter() - started
+            )
+            return {"result": {
+                "success": False,
+                "image_path": image_path,
+                "error": f"Failed to read image: {str(e)}",
+                "error_type": type(e).__name__
+            }}
+
+        return {
+            "upload_path": upload_path,
+            "mime_type": mime_type,
+            "cache_key": cache_key,
+            "started": started,
+            "prepare_seconds": time.perf_counter() - started
+        }
+
+    def _build_result(
+        self,
+        image_path: str,
+        prepared: Dict[str, Any],
+        response: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Turn a _send_vision_request response into the result for one image
+
+        Args:
+            image_path: Path to the image
+            prepared: Output of _prepare_image
+            response: Output of _send_vision_request (content may be a split section)
+
+        Returns:
+            Result dict
+        """
+        self._record_metrics(image_path, prepared, response)
+
+        if not response["success"]:
+            return {
+                "success": False,
+                "image_path": image_path,
+                "error": response["error"],
+                "error_type": response["error_type"],
+                "attempts": response.get("attempts", 0)
+            }
+
+        extracted = {
+            "success": True,
+            "image_path": image_path,
+            "extracted_text": response["content"],
+            "model": response["model"],
+            "usage": response["usage"],
+            "attempts": response["attempts"]
+        }
+        if "batch_size" in response:
+            extracted["batch_size"] = response["batch_size"]
+        if response.get("finish_reason") in TRUNCATED:
+            # Cut off (max_tokens or runaway loop): returned, but not cached
+            extracted["finish_reason"] = response["finish_reason"]
+        elif prepared["cache_key"] is not None:
+            self.cache.put(prepared["cache_key"], extracted)
+        return extracted
+
+    def _models_to_try(self, model: Optional[str]) -> List[str]:
+        """
+        Models to try, in router order if there is a router
+
+        Args:
+            model: Specific model (skips the router)
+
+        Returns:
+            Models, preferred first
+        """
+        if model:
+            return [model]
+        if self.router is not None:
+            models = self.router.ranked(self.vision_models)
+        else:
+            models = self.vision_models.copy()
+        # Models with an open circuit go last (stable for the rest)
+        return sorted(models, key=lambda name: self.breaker.state(name) == OPEN)
+
+    def _circuit_wait(self, model: Optional[str]) -> float:
+        """
+        Seconds until a retry can go out (0 while some model/endpoint is up)
+
+        Args:
+            model: Specific model (None = all vision_models)
+
+        Returns:
+            Seconds to wait
+        """
+        models = [model] if model else self.vision_models
+        return max(
+            self.breaker.retry_in(self.backend.endpoint),
+            min(self.breaker.retry_in(name) for name in models)
+        )
+
+    def _post_once(
+        self,
+        model: str,
+        body_for,
+        max_tokens: int,
+        timing: Dict[str, Any],
+        collector: Optional[_StreamCollector] = None
+    ) -> Dict[str, Any]:
+        """
+        Send one request to one model (raises on errors)
+
+        Args:
+            model: Model
+            body_for: Function returning the backend request for a model
+            max_tokens: Max tokens of the response
+            timing: Timing dict of this attempt
+            collector: Delta collector of a streamed request
+
+        Returns:
+            {"content", "model", "usage", "finish_reason"}
+        """
+        endpoint = self.backend.endpoint
+
+        # Model/endpoint circuit open: fail fast without sending
+        for key in (model, endpoint):
+            if not self.breaker.allow(key):
+                raise CircuitOpenError(key, self.breaker.retry_in(key))
+
+        request = body_for(model, timing)
+
+        # Wait for the rate limiter
+        wait_start = time.perf_counter()
+        self.rate_limiter.acquire(model, tokens=max_tokens)
+        timing["rate_wait_seconds"] += time.perf_counter() - wait_start
+
+        if collector is not None:
+            collector.begin(model)
+
+        request_start = time.perf_counter()
+        try:
+            result = self.backend.send(model, request, timing, on_delta=collector)
+        except Exception as e:
+            if self.router is not None:
+                self.router.record(model, time.perf_counter() - request_start, success=False)
+            scope = failure_scope(e)
+            key = model if scope == "model" else endpoint
+            if scope is not None and self.breaker.record_failure(key):
+                print(f"   🔌 Circuit open for {key} ({self.breaker.retry_in(key):.0f}s)")
+            raise
+
+        self.breaker.record_success(model)
+        self.breaker.record_success(endpoint)
+        if self.router is not None:
+            self.router.record(model, timing["request_seconds"], success=True)
+
+        usage = result["usage"] or {}
+        self.rate_limiter.on_success(
+            model,
+            result["headers"],
+            tokens_used=usage.get("total_tokens", 0),
+            tokens_reserved=max_tokens
+        )
+
+        content = result["content"]
+        if collector is not None and collector.runaway:
+            # Keep one copy of the repeated passage
+            content = content[:len(content) - collector.runaway]
+            print(f"   ✂️  {model} output is looping, cancelled after {len(result['content']):,} chars")
+            if collector.sink is not None:
+                collector.sink.replace_content(result["model"], content)
+
+        return {
+            "content": content,
+            "model": result["model"],
+            "usage": result["usage"],
+            "finish_reason": result.get("finish_reason")
+        }
+
+    def _post_hedged(
+        self,
+        model: str,
+        hedge_model: Optional[str],
+        body_for,
+        max_tokens: int,
+        timing: Dict[str, Any],
+        collector: Optional[_StreamCollector] = None
+    ) -> Dict[str, Any]:
+        """
+        Send a request; if it is slower than the model's p95, send a
+        duplicate to hedge_model and take whichever answers first
+
+        Args:
+            model: Primary model
+            hedge_model: Backup model (None = no hedging)
+            body_for: Function returning the backend request for a model
+            max_tokens: Max tokens of the response
+            timing: Timing dict of the request (updated from the winner)
+            collector: Delta collector of a streamed request (never hedged:
+                two streams cannot share one sink)
+
+        Returns:
+            {"content", "model", "usage", "finish_reason"} of the first answer
+        """
+        delay = None
+        if self.router is not None and hedge_model and collector is None:
+            delay = self.router.hedge_delay(model)
+        if delay is None:
+            return self._post_once(model, body_for, max_tokens, timing, collector)
+
+        with self._hedge_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=self._hedge_workers, thread_name_prefix="hedge")
+        executor = self._hedge_executor
+
+        # Each attempt has its own timing (the loser keeps running after we return)
+        attempt_timing = {
+            model: dict(timing, encode_seconds=0.0, upload_bytes=0, rate_wait_seconds=0.0),
+            hedge_model: dict(timing, encode_seconds=0.0, upload_bytes=0, rate_wait_seconds=0.0),
+        }
+
+        def merge(winner: str, models_sent: List[str]):
+            for key in ("encode_seconds", "upload_bytes", "rate_wait_seconds"):
+                timing[key] += sum(attempt_timing[sent][key] for sent in models_sent)
+            timing["request_seconds"] = attempt_timing[winner]["request_seconds"]
+            timing["ttfb_seconds"] = attempt_timing[winner]["ttfb_seconds"]
+
+        primary = executor.submit(self._post_once, model, body_for, max_tokens, attempt_timing[model])
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            merge(model, [model])
+            return primary.result()
+
+        print(f"   🏁 {model} slower than p{self.router.hedge_quantile:g} ({delay:.1f}s), hedging to {hedge_model}")
+        self.router.record_hedge(hedge_model)
+        timing["hedged"] = True
+        hedge = executor.submit(self._post_once, hedge_model, body_for, max_tokens, attempt_timing[hedge_model])
+        models = {primary: model, hedge: hedge_model}
+
+        pending = {primary, hedge}
+        errors = {}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors[future] = e
+                    continue
+
+                if future is hedge:
+                    self.router.record_hedge(hedge_model, won=True)
+                merge(models[future], [model, hedge_model])
+                return result
+
+        # Both failed: report the hedge's 429 to the limiter, raise the primary's error
+        hedge_error = errors.get(hedge)
+        if isinstance(hedge_error, requests.exceptions.HTTPError) and \
+                getattr(hedge_error.response, 'status_code', None) == 429:
+            self.rate_limiter.on_rate_limited(hedge_model, hedge_error.response.headers)
+        merge(model, [model, hedge_model])
+        raise errors[primary]
+
+    def _record_metrics(
+        self,
+        image_path: str,
+        prepared: Dict[str, Any],
+        response: Dict[str, Any]
+    ):
+        """
+        Record metrics for one image (packed requests: one row per image, see request_share)
+
+        Args:
+            image_path: Path to the image
+            prepared: Output of _prepare_image
+            response: Output of _send_vision_request
+        """
+        timing = response.get("metrics") or {}
+        usage = response.get("usage") or {}
+        self.metrics.record(
+            image=Path(image_path).name,
+            model=response.get("model") or timing.get("model"),
+            success=response["success"],
+            cached=False,
+            attempts=response.get("attempts", timing.get("attempts")),
+            retry_reasons=timing.get("retry_reasons", []),
+            prepare_seconds=prepared.get("prepare_seconds"),
+            encode_seconds=timing.get("encode_seconds"),
+            upload_bytes=timing.get("upload_bytes"),
+            rate_wait_seconds=timing.get("rate_wait_seconds"),
+            ttfb_seconds=timing.get("ttfb_seconds"),
+            ttft_seconds=timing.get("ttft_seconds"),
+            request_seconds=timing.get("request_seconds"),
+            latency_seconds=time.perf_counter() - prepared["started"],
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens"),
+            total_tokens=usage.get("total_tokens"),
+            batch_size=response.get("batch_size", 1),
+            finish_reason=response.get("finish_reason"),
+            error_type=response.get("error_type")
+        )
+
+    def _send_vision_request(
+        self,
+        images: List[tuple],
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        models_to_try: List[str],
+        retry_with_other_models: bool,
+        max_retries: int,
+        sink: Optional[StreamingTextFile] = None
+    ) -> Dict[str, Any]:
+        """
+        Send one vision request (one or more images) with the retry policy
+
+        Args:
+            images: List of (upload_path or image bytes, mime_type)
+            prompt: Prompt text
+            temperature: Sampling temperature
+            max_tokens: Max tokens of the response
+            models_to_try: Models to try in order
+            retry_with_other_models: Switch model on errors
+            max_retries: Attempts per model
+            sink: File the streamed text is mirrored into (stream mode only)
+
+        Returns:
+            {"success": True, "content", "model", "usage", "finish_reason", "attempts", "metrics"} or
+            {"success": False, "error", "error_type", "attempts", "metrics"}
+        """
+        if getattr(self.backend, "needs_files", False) and any(isinstance(source, bytes) for source, _ in images):
+            # The backend reads files: keep in-memory pages on disk for the whole request (all retries)
+            with tempfile.TemporaryDirectory(prefix="exam-pages-") as folder:
+                files = []
+                for index, (source, mime_type) in enumerate(images):
+                    if isinstance(source, bytes):
+                        path = Path(folder) / f"page{index}{mimetypes.guess_extension(mime_type) or '.img'}"
+                        path.write_bytes(source)
+                        source = str(path)
+                    files.append((source, mime_type))
+                return self._send_vision_request(
+                    files, prompt, temperature, max_tokens, models_to_try,
+                    retry_with_other_models, max_retries, sink=sink
+                )
+
+        last_error = None
+        last_error_type = None
+
+        # Encode / rate-limit wait / TTFB timings and retry reasons (for metrics)
+        timing = {
+            "encode_seconds": 0.0,
+            "upload_bytes": 0,
+            "rate_wait_seconds": 0.0,
+            "ttfb_seconds": None,
+            "ttft_seconds": None,
+            "request_seconds": None,
+            "retry_reasons": [],
+        }
+        collector = _StreamCollector(sink) if self.stream else None
+
+        attempt = 0
+        model_index = 0
+        model_attempts = 0
+
+        # Requests are only rebuilt when the model changes (at most 2: primary + hedge)
+        bodies: Dict[str, Any] = {}
+        bodies_lock = threading.Lock()
+
+        def body_for(body_model: str, body_timing: Dict[str, Any]):
+            with bodies_lock:
+                if body_model not in bodies:
+                    if len(bodies) >= 2:
+                        bodies.clear()  # Free the old body before building a new one
+                    encode_start = time.perf_counter()
+                    bodies[body_model] = self.backend.build(
+                        body_model, prompt, images, temperature, max_tokens, stream=self.stream
+                    )
+                    body_timing["encode_seconds"] += time.perf_counter() - encode_start
+                return bodies[body_model]
+
+        def can_switch() -> bool:
+            return retry_with_other_models and model_index + 1 < len(models_to_try)
+
+        while model_index < len(models_to_try):
+            current_model = models_to_try[model_index]
+            attempt += 1
+            model_attempts += 1
+
+            try:
+                # Backup model for hedged requests (next best model)
+                hedge_model = models_to_try[model_index + 1] if can_switch() else None
+
+                result = self._post_hedged(current_model, hedge_model, body_for, max_tokens, timing, collector)
+
+                return {
+                    "success": True,
+                    "content": result["content"],
+                    "model": result["model"],
+                    "usage": result["usage"],
+                    "finish_reason": result["finish_reason"],
+                    "attempts": attempt,
+                    "metrics": timing
+                }
+
+            except requests.exceptions.HTTPError as e:
+                last_error = str(e)
+                last_error_type = type(e).__name__
+
+                status_code = getattr(e.response, 'status_code', None)
+                if status_code is None:
+                    break
+                timing["retry_reasons"].append(f"HTTP {status_code} ({current_model})")
+
+                # 429 = rate limited
+                if status_code == 429:
+                    wait_time = self.rate_limiter.on_rate_limited(current_model, e.response.headers)
+                    print(f"   ⚠️  Rate limited on {current_model}")
+                    if can_switch():
+                        model_index += 1
+                        model_attempts = 0
+                        print(f"   🔄 Switching to model: {models_to_try[model_index]}")
+                        continue
+                    if model_attempts < max_retries:
+                        # The limiter waits as long as the provider asked
+                        print(f"   ⏳ Waiting {wait_time:.1f}s before retrying...")
+                        continue
+                    break
+
+                # 400 = bad request, the model may not support vision
+                if status_code == 400:
+                    print(f"   ⚠️  Model {current_model} unsupported or bad request")
+                    if can_switch():
+                        model_index += 1
+                        model_attempts = 0
+                        print(f"   🔄 Switching to model: {models_to_try[model_index]}")
+                        time.sleep(1)
+                        continue
+                    break
+
+                # 5xx / 404 = model is failing: switch model, or back off while its circuit is closed
+                if failure_scope(e) == "model":
+                    if can_switch():
+                        model_index += 1
+                        model_attempts = 0
+                        print(f"   🔄 {current_model} returned {status_code}, switching to model: "
+                              f"{models_to_try[model_index]}")
+                        continue
+                    if model_attempts < max_retries and self.breaker.state(current_model) != OPEN:
+                        print(f"   ⚠️  Server error {status_code}, retrying in {2 ** model_attempts}s...")
+                        time.sleep(2 ** model_attempts)
+                        continue
+                    break
+
+                # Anything else is not worth retrying
+                break
+
+            except CircuitOpenError as e:
+                # Nothing was sent: not an attempt
+                attempt -= 1
+                last_error = str(e)
+                last_error_type = type(e).__name__
+                timing["retry_reasons"].append(f"circuit open ({e.key})")
+                if e.key == current_model and can_switch():
+                    model_index += 1
+                    model_attempts = 0
+                    continue
+                break
+
+            except requests.exceptions.RequestException as e:
+                last_error = str(e)
+                last_error_type = type(e).__name__
+                timing["retry_reasons"].append(last_error_type)
+
+                # Timeout or connection error: retry (unless the endpoint circuit just opened)
+                if self.breaker.state(self.backend.endpoint) == OPEN:
+                    continue
+                if model_attempts < max_retries:
+                    print(f"   ⚠️  {last_error_type}, retry {model_attempts}...")
+                    time.sleep(2 ** model_attempts)  # Exponential backoff
+                    continue
+                break
+
+            except Exception as e:
+                last_error = str(e)
+                last_error_type = type(e).__name__
+                break
+
+        # Every model failed
+        timing.update(model=models_to_try[min(model_index, len(models_to_try) - 1)], attempts=attempt)
+        return {
+            "success": False,
+            "error": last_error,
+            "error_type": last_error_type,
+            "attempts": attempt,
+            "metrics": timing
+        }
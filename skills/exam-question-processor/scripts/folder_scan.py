@@ -0,0 +1,126 @@
+"""
+Single-pass discovery of input images
+
+The extractors used to find their inputs with one Path.glob() per
+extension, sort the complete list, and then check for every image whether
+its `_extracted.txt` already exists. On folders with tens of thousands of
+images that is several full directory listings plus one stat() per image
+before the first request goes out. Here the folder is listed once with
+os.scandir (the entry type comes with the listing, no stat per file), all
+extensions are matched in the same pass, subfolders are walked on request,
+and existing outputs are collected from a single listing of the output
+folder into a set.
+
+scan_files() is a generator: a caller that does not need a sorted list can
+start working on the first image while the rest of the tree is still being
+listed.
+
+Features:
+- One os.scandir pass per folder; extension set and/or glob pattern
+- Optional recursion (depth-first, subfolders in name order)
+- Hidden files and folders skipped (like glob; also skips .segments, .preprocessed)
+- Existing outputs as a set of stems from one listing
+"""
+
+import fnmatch
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Set, Union
+
+OUTPUT_SUFFIX = "_extracted.txt"
+
+
+def scan_files(
+    root: Union[str, Path],
+    extensions: Optional[Iterable[str]] = None,
+    pattern: Optional[str] = None,
+    recursive: bool = False
+) -> Iterator[Path]:
+    """
+    Files of a folder, as they are listed
+
+    Args:
+        root: Folder to scan
+        extensions: Accepted suffixes, case-insensitive (None = any)
+        pattern: Glob pattern the file name must match, case-sensitive like
+            Path.glob (None = any)
+        recursive: Also scan subfolders
+
+    Yields:
+        Matching files (directory order within a folder)
+    """
+    suffixes = {extension.lower() for extension in extensions} if extensions is not None else None
+    stack = [os.fspath(root)]
+
+    while stack:
+        folder = stack.pop()
+        subfolders = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.'):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                subfolders.append(entry.path)
+                            continue
+                        if not entry.is_file():
+                            continue
+                    except OSError:  # Entry vanished or is unreadable
+                        continue
+                    if suffixes is not None and os.path.splitext(entry.name)[1].lower() not in suffixes:
+                        continue
+                    if pattern is not None and not fnmatch.fnmatchcase(entry.name, pattern):
+                        continue
+                    yield Path(entry.path)
+        except OSError as e:
+            if folder == os.fspath(root):
+                raise
+            print(f"⚠️  Cannot list {folder}: {e}")
+        # Pushed in reverse so subfolders are visited in name order
+        stack.extend(sorted(subfolders, reverse=True))
+
+
+def unique_stems(files: Iterable[Path]) -> Iterator[Path]:
+    """
+    Drop files whose name stem was already seen
+
+    Outputs are written flat (`<stem>_extracted.txt`), so two images with the
+    same stem in different subfolders would overwrite each other's text.
+
+    Args:
+        files: Files in processing order
+
+    Yields:
+        The first file of every stem
+    """
+    seen = {}
+    for path in files:
+        first = seen.setdefault(path.stem, path)
+        if first is path:
+            yield path
+        else:
+            print(f"⚠️  Skipping {path}: same output name as {first}")
+
+
+def existing_outputs(output_folder: Union[str, Path], suffix: str = OUTPUT_SUFFIX) -> Set[str]:
+    """
+    Image stems that already have an output file
+
+    Args:
+        output_folder: Folder the outputs are written to
+        suffix: Output file suffix after the image stem
+
+    Returns:
+        Set of stems (empty if the folder does not exist yet)
+    """
+    stems = set()
+    try:
+        with os.scandir(output_folder) as entries:
+            for entry in entries:
+                if entry.name.endswith(suffix):
+                    stems.add(entry.name[:-len(suffix)])
+    except FileNotFoundError:
+        pass
+    return stems
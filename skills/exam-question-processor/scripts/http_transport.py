@@ -0,0 +1,285 @@
+"""
+Pooled HTTP transports for the vision extractors
+
+A transport owns one connection pool for the whole batch, so every image
+and every retry reuses already-open keep-alive connections instead of
+paying a fresh TCP+TLS handshake per request.
+
+Features:
+- RequestsTransport: requests.Session with a sized HTTPAdapter pool
+- HttpxTransport: optional HTTP/2 via httpx (pip install "httpx[http2]")
+- Per-request timing, with new vs reused connection tracking
+- Both transports return requests.Response objects and raise requests
+  exceptions, so callers do not care which one is plugged in
+"""
+
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+class _TimingLog:
+    """Thread-safe list of per-request timing records"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.records: List[Dict[str, Any]] = []
+
+    def add(self, record: Dict[str, Any]):
+        with self._lock:
+            self.records.append(record)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Aggregate the timing records
+
+        Returns:
+            Dict with request count, connections opened/reused and
+            average latency per connection kind
+        """
+        with self._lock:
+            records = list(self.records)
+
+        new = [r["seconds"] for r in records if r.get("new_connection") is True]
+        reused = [r["seconds"] for r in records if r.get("new_connection") is False]
+
+        return {
+            "requests": len(records),
+            "new_connections": len(new),
+            "reused_connections": len(reused),
+            "avg_seconds": round(sum(r["seconds"] for r in records) / len(records), 3) if records else 0.0,
+            "avg_seconds_new": round(sum(new) / len(new), 3) if new else None,
+            "avg_seconds_reused": round(sum(reused) / len(reused), 3) if reused else None,
+        }
+
+
+class RequestsTransport:
+    """
+    requests.Session with a keep-alive connection pool
+
+    Usage:
+        transport = RequestsTransport(pool_size=8)
+        response = transport.post(url, headers=headers, json=payload, timeout=120)
+        print(transport.timing_summary())
+    """
+
+    def __init__(self, pool_size: int = 10, keep_alive: bool = True):
+        """
+        Initialize the transport
+
+        Args:
+            pool_size: Max connections kept open per host (>= concurrency)
+            keep_alive: Reuse connections between requests
+        """
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.timings = _TimingLog()
+
+        self.session = requests.Session()
+        # Retries are handled by the extractors, not by urllib3
+        self._adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', self._adapter)
+        self.session.mount('http://', self._adapter)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+
+    def _connection_count(self) -> Optional[int]:
+        """
+        Number of connections opened so far across all pools
+
+        Under concurrency another thread may open a connection between the
+        two reads, so per-request attribution is approximate; totals are exact.
+        """
+        try:
+            pools = self._adapter.poolmanager.pools
+            return sum(pools[key].num_connections for key in pools.keys())
+        except Exception:
+            return None
+
+    def post(self, url: str, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        """
+        Send a POST request through the pooled session
+
+        Args:
+            url: Request URL
+            timeout: Request timeout in seconds
+            **kwargs: Passed to requests.Session.post (headers, json, data, stream)
+
+        Returns:
+            requests.Response
+        """
+        connections_before = self._connection_count()
+        start = time.perf_counter()
+        status = None
+        try:
+            response = self.session.post(url, timeout=timeout, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            connections_after = self._connection_count()
+            new_connection = None
+            if connections_before is not None and connections_after is not None:
+                new_connection = connections_after > connections_before
+            self.timings.add({
+                "url": url,
+                "status": status,
+                "seconds": time.perf_counter() - start,
+                "new_connection": new_connection,
+            })
+
+    def timing_summary(self) -> Dict[str, Any]:
+        """Aggregated per-request timings (see _TimingLog.summary)"""
+        return self.timings.summary()
+
+    def close(self):
+        """Close all pooled connections"""
+        self.session.close()
+
+
+def _iter_slices(buffer, size: int = 64 * 1024):
+    """Yield a bytes-like buffer as bytes slices of at most `size`"""
+    view = memoryview(buffer)
+    for start in range(0, len(view), size):
+        yield bytes(view[start:start + size])
+
+
+class HttpxTransport:
+    """
+    httpx.Client transport with optional HTTP/2 multiplexing
+
+    Responses are converted to requests.Response and httpx errors to the
+    matching requests exceptions, so it is a drop-in for RequestsTransport.
+    """
+
+    def __init__(self, pool_size: int = 10, keep_alive: bool = True, http2: bool = True):
+        """
+        Initialize the transport
+
+        Args:
+            pool_size: Max open connections
+            keep_alive: Reuse connections between requests
+            http2: Negotiate HTTP/2 (requires the h2 package)
+        """
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError(
+                "httpx is required for HttpxTransport. "
+                "Install with: pip install \"httpx[http2]\""
+            )
+
+        self._httpx = httpx
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.timings = _TimingLog()
+        self.client = httpx.Client(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size if keep_alive else 0
+            )
+        )
+
+    def post(self, url: str, timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        """
+        Send a POST request through the httpx client
+
+        Args:
+            url: Request URL
+            timeout: Request timeout in seconds
+            **kwargs: headers, json or data (stream=True is accepted, but the
+                body is read in full before returning)
+
+        Returns:
+            requests.Response built from the httpx response
+        """
+        httpx = self._httpx
+        kwargs.pop('stream', None)
+        data = kwargs.pop('data', None)
+        if isinstance(data, (bytearray, memoryview)):
+            # httpx only accepts bytes; send the buffer in slices instead of copying it
+            headers = dict(kwargs.pop('headers', None) or {})
+            headers['Content-Length'] = str(len(data))
+            kwargs['headers'] = headers
+            kwargs['content'] = _iter_slices(data)
+        elif data is not None:
+            kwargs['content'] = data
+
+        start = time.perf_counter()
+        status = None
+        try:
+            try:
+                raw = self.client.post(url, timeout=timeout, **kwargs)
+            except httpx.TimeoutException as e:
+                raise requests.exceptions.Timeout(str(e))
+            except httpx.TransportError as e:
+                raise requests.exceptions.ConnectionError(str(e))
+
+            status = raw.status_code
+            response = requests.Response()
+            response.status_code = raw.status_code
+            response._content = raw.content
+            response._content_consumed = True  # iter_lines() replays _content
+            response.headers = CaseInsensitiveDict(raw.headers)
+            response.url = str(raw.url)
+            response.reason = raw.reason_phrase
+            response.encoding = raw.encoding
+            response.elapsed = timedelta(seconds=raw.elapsed.total_seconds())
+            return response
+        finally:
+            self.timings.add({
+                "url": url,
+                "status": status,
+                "seconds": time.perf_counter() - start,
+                "new_connection": None,
+            })
+
+    def timing_summary(self) -> Dict[str, Any]:
+        """Aggregated per-request timings (see _TimingLog.summary)"""
+        return self.timings.summary()
+
+    def close(self):
+        """Close all pooled connections"""
+        self.client.close()
+
+
+def create_transport(pool_size: int = 10, keep_alive: bool = True, http2: bool = False):
+    """
+    Build the transport matching the requested options
+
+    Args:
+        pool_size: Max connections kept open per host
+        keep_alive: Reuse connections between requests
+        http2: Use HttpxTransport with HTTP/2
+
+    Returns:
+        RequestsTransport or HttpxTransport
+    """
+    if http2:
+        return HttpxTransport(pool_size=pool_size, keep_alive=keep_alive, http2=True)
+    return RequestsTransport(pool_size=pool_size, keep_alive=keep_alive)
+
+
+def format_timing_summary(summary: Dict[str, Any]) -> str:
+    """
+    One-line human readable timing summary
+
+    Args:
+        summary: Output of timing_summary()
+
+    Returns:
+        Formatted string
+    """
+    line = (
+        f"{summary['requests']} requests, "
+        f"{summary['new_connections']} new / {summary['reused_connections']} reused connections, "
+        f"avg {summary['avg_seconds']}s"
+    )
+    if summary.get("avg_seconds_new") is not None and summary.get("avg_seconds_reused") is not None:
+        line += f" (new {summary['avg_seconds_new']}s vs reused {summary['avg_seconds_reused']}s)"
+    return line
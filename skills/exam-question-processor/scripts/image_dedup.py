@@ -0,0 +1,343 @@
+"""
+Perceptual-hash pre-dedup of page images
+
+Exam folders often hold several photos of the same page (re-shot with a
+slightly different crop, angle or exposure), and each one used to cost a
+full vision request. This pre-pass hashes every image, clusters images
+whose hashes are within a Hamming distance of each other with a BK-tree,
+and lets the extractors send only the first image of each cluster; its text
+is then copied to the other members' `_extracted.txt` files.
+
+Hashes are computed on the page content (grayscale, margins cropped to the
+bounding box of the dark pixels), so a different crop or border does not
+move the hash. Pages of the same exam share their layout, so the hashes are
+16x16 (256 bits) by default: 8x8 hashes cannot tell two question pages
+with the same layout apart.
+
+Features:
+- aHash, dHash and pHash (DCT), configurable hash size
+- BK-tree index: each image is compared only with nearby representatives
+- First image of a cluster (in folder order) is the one sent
+- Parallel hashing; unreadable images are never merged
+
+Requires Pillow (pip install pillow).
+"""
+
+import io
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; checked in ImageDeduplicator.__init__
+    Image = None
+    ImageOps = None
+
+from pdf_pages import is_page_path, render_page
+
+DEFAULT_METHOD = 'phash'
+DEFAULT_HASH_SIZE = 16
+
+# Default radius as a share of the hash bits. With 16x16 hashes of re-shot
+# pages vs different pages of one exam, pHash measured <= 20% vs >= 31%;
+# dHash and aHash separate them less well, so their radius is tighter
+DEFAULT_DISTANCE_SHARE = {'phash': 0.22, 'dhash': 0.15, 'ahash': 0.03}
+
+# Longest side the page is decoded at before hashing
+LOAD_SIDE = 1024
+
+# PDF pages are rendered just large enough to hash (A4 at 96 dpi ~ 1123px)
+PDF_HASH_DPI = 96
+
+
+def load_page(image_path: Union[str, Path], max_side: int = LOAD_SIDE) -> 'Image.Image':
+    """
+    Grayscale page cropped to its content
+
+    Args:
+        image_path: Image file or PDF page path (rendered at PDF_HASH_DPI)
+        max_side: Longest side to decode at (JPEG draft mode when possible)
+
+    Returns:
+        PIL grayscale image of the content bounding box
+    """
+    if is_page_path(image_path):
+        image_path = io.BytesIO(render_page(image_path, PDF_HASH_DPI))
+    with Image.open(image_path) as image:
+        image.draft('L', (max_side, max_side))
+        image = ImageOps.exif_transpose(image)  # Respect phone camera rotation
+        page = ImageOps.autocontrast(image.convert('L'))
+    page.thumbnail((max_side, max_side))
+
+    # Bounding box of the dark (ink) pixels
+    box = page.point(lambda value: 255 if value < 128 else 0).getbbox()
+    return page.crop(box) if box else page
+
+
+def _bits(values: Sequence[bool]) -> int:
+    result = 0
+    for value in values:
+        result = (result << 1) | bool(value)
+    return result
+
+
+def _pixels(image: 'Image.Image', width: int, height: int) -> List[int]:
+    return list(image.resize((width, height), Image.BOX).tobytes())
+
+
+def average_hash(image: 'Image.Image', hash_size: int = DEFAULT_HASH_SIZE) -> int:
+    """aHash: each cell brighter than the mean"""
+    pixels = _pixels(image, hash_size, hash_size)
+    mean = sum(pixels) / len(pixels)
+    return _bits(pixel > mean for pixel in pixels)
+
+
+def difference_hash(image: 'Image.Image', hash_size: int = DEFAULT_HASH_SIZE) -> int:
+    """dHash: each cell darker than its right neighbour"""
+    pixels = _pixels(image, hash_size + 1, hash_size)
+    row = hash_size + 1
+    return _bits(
+        pixels[y * row + x] < pixels[y * row + x + 1]
+        for y in range(hash_size) for x in range(hash_size)
+    )
+
+
+_COSINES: Dict[Tuple[int, int], List[List[float]]] = {}
+
+
+def perceptual_hash(image: 'Image.Image', hash_size: int = DEFAULT_HASH_SIZE) -> int:
+    """pHash: lowest hash_size x hash_size DCT frequencies above their median"""
+    size = 4 * hash_size
+    key = (size, hash_size)
+    if key not in _COSINES:
+        _COSINES[key] = [
+            [math.cos(math.pi * (2 * x + 1) * u / (2 * size)) for x in range(size)]
+            for u in range(hash_size)
+        ]
+    cosines = _COSINES[key]
+
+    pixels = _pixels(image, size, size)
+    rows = [pixels[y * size:(y + 1) * size] for y in range(size)]
+    # Separable DCT-II, only the frequencies that are kept
+    row_freqs = [[sum(c * p for c, p in zip(cosines[u], row)) for u in range(hash_size)] for row in rows]
+    coefficients = [
+        sum(cosines[u][y] * row_freqs[y][v] for y in range(size))
+        for u in range(hash_size) for v in range(hash_size)
+    ]
+    # The DC term (overall brightness) is left out of the median
+    median = sorted(coefficients[1:])[len(coefficients) // 2]
+    return _bits(coefficient > median for coefficient in coefficients)
+
+
+HASHES: Dict[str, Callable[..., int]] = {
+    'ahash': average_hash,
+    'dhash': difference_hash,
+    'phash': perceptual_hash,
+}
+
+
+def hamming_distance(first: int, second: int) -> int:
+    """Number of differing bits"""
+    return bin(first ^ second).count('1')
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over Hamming distance
+
+    A query with radius r only descends into children whose edge distance d
+    satisfies |d - distance(query, node)| <= r (triangle inequality).
+
+    Usage:
+        tree = BKTree()
+        tree.add(hash_value, "q1.jpeg")
+        for distance, item in tree.search(other_hash, 10):
+            ...
+    """
+
+    def __init__(self):
+        self._root: Optional[List[Any]] = None  # [hash, item, {distance: child}]
+        self._size = 0
+        self.comparisons = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, value: int, item: Any):
+        """Insert a hash with its item"""
+        self._size += 1
+        if self._root is None:
+            self._root = [value, item, {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming_distance(value, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, item, {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, Any]]:
+        """
+        Items within a Hamming distance
+
+        Args:
+            value: Query hash
+            radius: Max distance (inclusive)
+
+        Returns:
+            (distance, item) pairs, nearest first
+        """
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            self.comparisons += 1
+            distance = hamming_distance(value, node[0])
+            if distance <= radius:
+                found.append((distance, node[1]))
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+
+class ImageDeduplicator:
+    """
+    Cluster near-identical page images before extraction
+
+    Usage:
+        deduplicator = ImageDeduplicator()
+        unique, duplicates = deduplicator.cluster(image_files)
+        # extract `unique`; copy each one's text to duplicates.get(image, [])
+        print(format_image_dedup_stats(deduplicator.stats()))
+    """
+
+    def __init__(
+        self,
+        method: str = DEFAULT_METHOD,
+        hash_size: int = DEFAULT_HASH_SIZE,
+        max_distance: Optional[int] = None,
+        workers: int = 4
+    ):
+        """
+        Initialize the deduplicator
+
+        Args:
+            method: 'ahash', 'dhash' or 'phash'
+            hash_size: Hash grid side (hash has hash_size^2 bits)
+            max_distance: Max Hamming distance of a duplicate (default: see DEFAULT_DISTANCE_SHARE)
+            workers: Threads decoding and hashing images
+        """
+        if Image is None:
+            raise ImportError("Pillow is required for image dedup. Install with: pip install pillow")
+        if method not in HASHES:
+            raise ValueError(f"method must be one of: {', '.join(HASHES)}")
+
+        self.method = method
+        self.hash_size = hash_size
+        self.max_distance = (
+            max_distance if max_distance is not None
+            else round(hash_size * hash_size * DEFAULT_DISTANCE_SHARE[method])
+        )
+        self.workers = max(1, workers)
+
+        self._lock = threading.Lock()
+        self._stats = {"images": 0, "duplicates": 0, "clusters": 0, "errors": 0, "comparisons": 0, "seconds": 0.0}
+
+    def image_hash(self, image_path: Union[str, Path]) -> Optional[int]:
+        """
+        Hash of one image
+
+        Args:
+            image_path: Image file
+
+        Returns:
+            Hash, or None if the image cannot be read
+        """
+        try:
+            return HASHES[self.method](load_page(image_path), self.hash_size)
+        except (OSError, ValueError, ImportError, Image.DecompressionBombError):
+            return None
+
+    def cluster(self, image_files: Sequence[Path]) -> Tuple[List[Path], Dict[Path, List[Path]]]:
+        """
+        Split images into representatives and their near-duplicates
+
+        Args:
+            image_files: Images in processing order
+
+        Returns:
+            (representatives in order, representative -> duplicate images)
+        """
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            hashes = list(executor.map(self.image_hash, image_files))
+
+        tree = BKTree()
+        unique: List[Path] = []
+        duplicates: Dict[Path, List[Path]] = {}
+        errors = 0
+
+        for image_file, value in zip(image_files, hashes):
+            if value is None:
+                errors += 1
+                unique.append(image_file)
+                continue
+            matches = tree.search(value, self.max_distance)
+            if matches:
+                duplicates.setdefault(matches[0][1], []).append(image_file)
+            else:
+                tree.add(value, image_file)
+                unique.append(image_file)
+
+        with self._lock:
+            self._stats["images"] += len(image_files)
+            self._stats["duplicates"] += len(image_files) - len(unique)
+            self._stats["clusters"] += len(duplicates)
+            self._stats["errors"] += errors
+            self._stats["comparisons"] += tree.comparisons
+            self._stats["seconds"] += time.perf_counter() - start
+        return unique, duplicates
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Statistics so far
+
+        Returns:
+            Dict with images, duplicates (requests saved), clusters, errors,
+            comparisons, seconds, method, max_distance
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["seconds"] = round(stats["seconds"], 2)
+        stats["method"] = f"{self.method}{self.hash_size}"
+        stats["max_distance"] = self.max_distance
+        return stats
+
+
+def format_image_dedup_stats(stats: Dict[str, Any]) -> str:
+    """
+    One-line image dedup summary
+
+    Args:
+        stats: Output of ImageDeduplicator.stats()
+
+    Returns:
+        Formatted text
+    """
+    text = (
+        f"{stats['duplicates']}/{stats['images']} images were near-duplicates "
+        f"({stats['clusters']} clusters, requests saved: {stats['duplicates']}), "
+        f"{stats['method']} <= {stats['max_distance']} bits, {stats['comparisons']:,} comparisons, "
+        f"{stats['seconds']}s"
+    )
+    if stats["errors"]:
+        text += f", {stats['errors']} unreadable"
+    return text
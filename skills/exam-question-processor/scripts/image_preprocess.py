@@ -0,0 +1,252 @@
+"""
+Pre-upload image downscaling and recompression
+
+Phone photos of exam pages are often 4000px+ and several MB, far more than
+a vision model needs to read printed text. This stage resizes each image
+to a maximum edge, optionally converts to grayscale, recompresses it as
+JPEG/WebP/PNG and caches the processed variant on disk.
+
+Features:
+- Configurable max edge, output format, quality and grayscale
+- Processed variants cached by content hash + settings
+- Original kept whenever recompression would not make it smaller
+- Bytes-saved / estimated upload-time-saved statistics per batch
+
+Requires Pillow (pip install pillow).
+"""
+
+import hashlib
+import io
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; checked in ImagePreprocessor.__init__
+    Image = None
+    ImageOps = None
+
+FORMATS = {
+    'jpeg': ('JPEG', '.jpg', 'image/jpeg'),
+    'webp': ('WEBP', '.webp', 'image/webp'),
+    'png': ('PNG', '.png', 'image/png'),
+}
+
+
+class ImagePreprocessor:
+    """
+    Resize + recompress images before they are encoded into a request
+
+    Usage:
+        preprocessor = ImagePreprocessor(max_edge=2000, image_format='jpeg')
+        path, mime_type = preprocessor.process('q1.png')
+        print(preprocessor.stats())
+    """
+
+    def __init__(
+        self,
+        max_edge: int = 2000,
+        image_format: str = 'jpeg',
+        quality: int = 85,
+        grayscale: bool = False,
+        cache_dir: Union[str, Path] = '.preprocessed',
+        uplink_mbps: float = 10.0
+    ):
+        """
+        Initialize the preprocessor
+
+        Args:
+            max_edge: Longest side in pixels after resizing
+            image_format: Output format: jpeg, webp or png
+            quality: JPEG/WebP quality (1-100)
+            grayscale: Convert to 8-bit grayscale
+            cache_dir: Folder for processed variants
+            uplink_mbps: Upload bandwidth used to estimate time saved
+        """
+        if Image is None:
+            raise ImportError("Pillow is required for preprocessing. Install with: pip install pillow")
+        if image_format not in FORMATS:
+            raise ValueError(f"image_format must be one of: {', '.join(FORMATS)}")
+
+        self.max_edge = max_edge
+        self.image_format = image_format
+        self.quality = quality
+        self.grayscale = grayscale
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.uplink_mbps = uplink_mbps
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "images": 0,
+            "cached": 0,
+            "kept_original": 0,
+            "original_bytes": 0,
+            "processed_bytes": 0,
+            "seconds": 0.0,
+        }
+
+    def signature(self) -> str:
+        """
+        Settings fingerprint, so results of different settings never mix
+
+        Returns:
+            Short string describing the settings
+        """
+        return f"{self.image_format}-q{self.quality}-e{self.max_edge}{'-gray' if self.grayscale else ''}"
+
+    def _variant_path(self, data: bytes, image_path: Path) -> Path:
+        digest = hashlib.sha256(data)
+        digest.update(self.signature().encode('ascii'))
+        extension = FORMATS[self.image_format][1]
+        return self.cache_dir / f"{image_path.stem}_{digest.hexdigest()[:16]}{extension}"
+
+    def _encode(self, data: bytes) -> bytes:
+        """Resize and recompress raw image bytes"""
+        pil_format = FORMATS[self.image_format][0]
+
+        with Image.open(io.BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image)  # Respect phone camera rotation
+            if self.grayscale:
+                image = image.convert('L')
+            elif image.mode not in ('RGB', 'L') and pil_format == 'JPEG':
+                image = image.convert('RGB')
+            elif image.mode == 'P':
+                image = image.convert('RGBA')
+
+            image.thumbnail((self.max_edge, self.max_edge), Image.LANCZOS)
+
+            out = io.BytesIO()
+            options: Dict[str, Any] = {"optimize": True}
+            if pil_format in ('JPEG', 'WEBP'):
+                options["quality"] = self.quality
+            image.save(out, format=pil_format, **options)
+            return out.getvalue()
+
+    def settings(self) -> Dict[str, Any]:
+        """
+        Constructor arguments, used to rebuild the preprocessor in worker processes
+
+        Returns:
+            Dict of keyword arguments
+        """
+        return {
+            "max_edge": self.max_edge,
+            "image_format": self.image_format,
+            "quality": self.quality,
+            "grayscale": self.grayscale,
+            "cache_dir": str(self.cache_dir),
+            "uplink_mbps": self.uplink_mbps,
+        }
+
+    def process(self, image_path: Union[str, Path], data: Optional[bytes] = None) -> Tuple[str, Optional[str]]:
+        """
+        Return the path of the image variant to upload
+
+        Args:
+            image_path: Original image
+            data: Its bytes when already in memory (e.g. a rendered PDF page)
+
+        Returns:
+            (path, mime_type); mime_type is None when the original is kept
+        """
+        image_path = Path(image_path)
+        if data is None:
+            data = image_path.read_bytes()
+        upload_path, mime_type, delta = self.process_data(data, image_path)
+        self.record(delta)
+        return upload_path, mime_type
+
+    def process_data(self, data: bytes, image_path: Union[str, Path]) -> Tuple[str, Optional[str], Dict[str, Any]]:
+        """
+        Process already-read image bytes without touching the statistics
+
+        Safe to call in a worker process; pass the returned delta to
+        record() on the preprocessor that owns the statistics.
+
+        Args:
+            data: Original image bytes
+            image_path: Original image path (names the variant)
+
+        Returns:
+            (path, mime_type, stats delta); mime_type is None when the original is kept
+        """
+        image_path = Path(image_path)
+        start = time.perf_counter()
+        variant = self._variant_path(data, image_path)
+        mime_type = FORMATS[self.image_format][2]
+
+        cached = variant.exists()
+        if cached:
+            processed_size = variant.stat().st_size
+        else:
+            processed = self._encode(data)
+            processed_size = len(processed)
+            if processed_size < len(data):
+                tmp = variant.with_name(variant.name + f".{os.getpid()}.{threading.get_ident()}.tmp")
+                tmp.write_bytes(processed)
+                os.replace(tmp, variant)
+
+        keep_original = processed_size >= len(data)
+        delta = {
+            "images": 1,
+            "cached": int(cached),
+            "kept_original": int(keep_original),
+            "original_bytes": len(data),
+            "processed_bytes": len(data) if keep_original else processed_size,
+            "seconds": time.perf_counter() - start,
+        }
+
+        if keep_original:
+            return str(image_path), None, delta
+        return str(variant), mime_type, delta
+
+    def record(self, delta: Dict[str, Any]):
+        """
+        Add one image's statistics (from process_data) to the batch totals
+
+        Args:
+            delta: Stats delta returned by process_data
+        """
+        with self._lock:
+            for key, value in delta.items():
+                self._stats[key] += value
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Batch statistics
+
+        Returns:
+            Dict with byte counts, bytes saved and estimated upload seconds saved
+        """
+        with self._lock:
+            stats = dict(self._stats)
+
+        saved = stats["original_bytes"] - stats["processed_bytes"]
+        stats["bytes_saved"] = saved
+        stats["saved_ratio"] = round(saved / stats["original_bytes"], 3) if stats["original_bytes"] else 0.0
+        # Base64 inflates the upload by 4/3
+        stats["upload_seconds_saved"] = round(saved * 4 / 3 * 8 / (self.uplink_mbps * 1_000_000), 2)
+        stats["seconds"] = round(stats["seconds"], 2)
+        return stats
+
+
+def format_preprocess_stats(stats: Dict[str, Any]) -> str:
+    """
+    One-line human readable preprocessing summary
+
+    Args:
+        stats: Output of ImagePreprocessor.stats()
+
+    Returns:
+        Formatted string
+    """
+    return (
+        f"{stats['images']} images, "
+        f"{stats['original_bytes'] / 1024 / 1024:.1f} MB -> {stats['processed_bytes'] / 1024 / 1024:.1f} MB "
+        f"(saved {stats['saved_ratio'] * 100:.0f}%, ~{stats['upload_seconds_saved']}s upload), "
+        f"{stats['cached']} from cache, {stats['seconds']}s processing"
+    )
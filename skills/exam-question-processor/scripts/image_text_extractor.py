@@ -3,287 +3,473 @@ Image Text Extractor using OpenRouter Vision API
 Extracts text from images using AI vision models
 """
 
-import requests
-import json
+import asyncio
 import os
-import base64
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 import time
 import argparse
 
-
-class ImageTextExtractor:
+from circuit_breaker import CircuitBreaker
+from extraction_engine import (
+    BACKENDS, DEFAULT_MAX_REQUEST_TOKENS, ExtractionEngine, OpenRouterBackend, create_backend
+)
+from folder_scan import existing_outputs, scan_files, unique_stems
+from http_transport import create_transport, format_timing_summary
+from image_dedup import HASHES, ImageDeduplicator, format_image_dedup_stats
+from image_pipeline import ImagePipeline, format_pipeline_stats
+from image_preprocess import FORMATS, ImagePreprocessor, format_preprocess_stats
+from job_journal import JOURNAL_FILE, JobJournal, format_journal_summary, result_fields
+from model_router import ModelRouter, format_router_stats
+from page_segment import DEFAULT_GAP_FACTOR, PageSegmenter, format_segment_stats
+from pdf_pages import DEFAULT_DPI, expand_pdfs
+from rate_limiter import AdaptiveRateLimiter
+from request_metrics import MetricsRecorder, format_metrics_summary
+from result_cache import DEFAULT_CACHE_FILE, ResultCache
+from stream_writer import StreamingTextFile
+
+
+class ImageTextExtractor(ExtractionEngine):
     """
     Class để extract text từ ảnh sử dụng OpenRouter Vision API
+
+    Phần gửi request / retry / cache / metrics nằm ở ExtractionEngine
+    (extraction_engine.py); class này lo batch theo folder, retry queue,
+    journal và summary report.
     """
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        transport=None,
+        pool_size: int = 10,
+        cache: Optional[ResultCache] = None,
+        preprocessor: Optional[ImagePreprocessor] = None,
+        pipeline: Optional[ImagePipeline] = None,
+        metrics: Optional[MetricsRecorder] = None,
+        api_url: Optional[str] = None,
+        router: Optional[ModelRouter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        backend=None,
+        stream: bool = False,
+        deduplicator: Optional[ImageDeduplicator] = None,
+        pdf_dpi: int = DEFAULT_DPI,
+        segmenter: Optional[PageSegmenter] = None,
+        max_request_tokens: int = DEFAULT_MAX_REQUEST_TOKENS
+    ):
         """
         Khởi tạo Image Text Extractor
 
         Args:
             api_key: OpenRouter API key
+            rate_limiter: Rate limiter dùng chung (mặc định tạo mới)
+            transport: HTTP transport có connection pool (xem http_transport.py)
+            pool_size: Kích thước pool khi tự tạo transport
+            cache: Cache kết quả theo nội dung ảnh (None = không dùng cache)
+            preprocessor: Resize/nén ảnh trước khi upload (None = gửi ảnh gốc)
+            pipeline: Process pool chuẩn bị ảnh trước (None = chuẩn bị ngay khi gửi)
+            metrics: Ghi metrics từng ảnh (latency, TTFB, bytes, tokens) ra JSONL
+            api_url: Endpoint chat completions (mặc định OpenRouter; dùng cho mock server)
+            router: Chọn model nhanh nhất còn khỏe + hedged request (None = thứ tự cố định)
+            breaker: Circuit breaker theo model/endpoint dùng chung (mặc định tạo mới)
+            backend: Backend của extraction engine (mặc định OpenRouter với api_key/api_url/transport)
+            stream: Nhận response dạng SSE, ghi dần vào file _extracted.txt (đổi tên
+                atomically khi xong), đo time-to-first-token, cắt sớm output bị lặp
+            deduplicator: Gom các ảnh chụp lại cùng một trang (perceptual hash), chỉ gửi
+                một ảnh đại diện và chép text sang các ảnh còn lại (None = gửi mọi ảnh)
+            pdf_dpi: Độ phân giải khi render trang PDF (file .pdf khớp file_pattern
+                được tách thành từng trang, mỗi trang chỉ render khi sắp gửi)
+            segmenter: Cắt mỗi trang thành từng câu hỏi (khoảng trắng giữa các câu) để
+                gửi song song, response ngắn hơn (None = gửi nguyên trang)
+            max_request_tokens: Số output token tối đa của một request gộp nhiều ảnh
+                (nhóm lớn hơn sẽ được chia nhỏ)
+        """
+        if backend is None:
+            backend = OpenRouterBackend(api_key, api_url, transport=transport, pool_size=pool_size)
+
+        models = None
+        if isinstance(backend, OpenRouterBackend):
+            # Các model vision có sẵn trên OpenRouter (ưu tiên free hoặc giá rẻ)
+            models = [
+                # "google/gemini-2.0-flash-exp:free",  # Free vision model - mạnh nhất
+                "google/gemini-2.0-flash-001"
+                # "google/gemini-flash-1.5-8b:free",   # Free backup
+                # "qwen/qwen-2-vl-7b-instruct:free",   # Free alternative
+                # "meta-llama/llama-3.2-11b-vision-instruct:free",  # Free alternative
+
+                # "openai/gpt-4o-mini",  # Rẻ nhất trong GPT-4 vision
+                # "openai/gpt-4o",
+            ]
+
+        super().__init__(
+            backend,
+            rate_limiter=rate_limiter,
+            cache=cache,
+            preprocessor=preprocessor,
+            pipeline=pipeline,
+            metrics=metrics,
+            router=router,
+            breaker=breaker,
+            models=models,
+            stream=stream,
+            pdf_dpi=pdf_dpi,
+            max_request_tokens=max_request_tokens
+        )
+
+        self.api_key = getattr(backend, 'api_key', None)
+        self.base_url = backend.endpoint
+
+        # Transport HTTP của backend (None với Gemini CLI)
+        self.transport = getattr(backend, 'transport', None)
+
+        # Journal trạng thái từng ảnh của batch đang chạy (mở trong batch_extract_*)
+        self.journal: Optional[JobJournal] = None
+
+        # Ảnh đại diện -> các ảnh gần giống hệt của batch đang chạy
+        self.deduplicator = deduplicator
+        self.duplicates: Dict[Path, List[Path]] = {}
+
+        # Cắt trang thành từng câu trước khi gửi
+        self.segmenter = segmenter
+
+    def batch_extract_from_folder(
+        self,
+        folder_path: str,
+        prompt: str = "Extract all text from this image.",
+        output_folder: str = "extracted_texts",
+        file_pattern: str = "*.jpeg",
+        delay_seconds: float = 1.0,
+        model: Optional[str] = None,
+        skip_existing: bool = True,
+        max_retry_rounds: int = 3,
+        concurrency: int = 1,
+        images_per_request: int = 1,
+        max_request_bytes: int = 20 * 1024 * 1024,
+        resume: bool = True,
+        recursive: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract text từ tất cả ảnh trong folder với retry queue system
+
+        Args:
+            folder_path: Đường dẫn đến folder chứa ảnh
+            prompt: Prompt yêu cầu extract text
+            output_folder: Folder để lưu kết quả
+            file_pattern: Pattern của file ảnh (*.jpeg, *.png, etc.)
+            delay_seconds: Delay giữa các request (tránh rate limit)
+            model: Model cụ thể
+            skip_existing: Bỏ qua file đã extract
+            max_retry_rounds: Số lần retry queue tối đa
+            concurrency: Số request chạy song song (> 1 sẽ dùng async mode)
+            images_per_request: Số ảnh gộp vào một request (1 = mỗi ảnh một request)
+            max_request_bytes: Tổng dung lượng ảnh tối đa trong một request gộp
+            resume: Ghi journal (.journal.jsonl) và tiếp tục từ lần chạy trước
+            recursive: Tìm ảnh cả trong các folder con (output vẫn nằm chung một folder)
+
+        Returns:
+            List các kết quả
         """
-        self.api_key = api_key or os.getenv('OPENROUTER_API_KEY')
+        if concurrency > 1:
+            return asyncio.run(self.batch_extract_from_folder_async(
+                folder_path=folder_path,
+                prompt=prompt,
+                output_folder=output_folder,
+                file_pattern=file_pattern,
+                delay_seconds=delay_seconds,
+                model=model,
+                skip_existing=skip_existing,
+                max_retry_rounds=max_retry_rounds,
+                concurrency=concurrency,
+                images_per_request=images_per_request,
+                max_request_bytes=max_request_bytes,
+                resume=resume,
+                recursive=recursive
+            ))
+
+        # Tạo output folder nếu chưa có
+        output_path = Path(output_folder)
+        output_path.mkdir(exist_ok=True)
+
+        self.journal = JobJournal(output_path / JOURNAL_FILE) if resume else None
+
+        image_files = self._collect_image_files(folder_path, file_pattern, output_path, skip_existing, recursive)
+        if not image_files:
+            self._close_journal()
+            return []
 
-        if not self.api_key:
-            raise ValueError(
-                "API key không được cung cấp. "
-                "Vui lòng truyền vào hoặc set biến môi trường OPENROUTER_API_KEY"
+        if self.journal is not None:
+            run = self.journal.start_run(
+                [image_file.name for image_file in image_files],
+                folder=str(folder_path),
+                pattern=file_pattern
             )
+            if run > 1:
+                print(f"📒 Tiếp tục từ journal (lần chạy thứ {run})")
 
-        self.base_url = "https://openrouter.ai/api/v1/chat/completions"
+        image_files = self._dedup_images(image_files)
 
-        # Các model vision có sẵn trên OpenRouter (ưu tiên free hoặc giá rẻ)
-        self.vision_models = [
-            # "google/gemini-2.0-flash-exp:free",  # Free vision model - mạnh nhất
-            "google/gemini-2.0-flash-001"
-            # "google/gemini-flash-1.5-8b:free",   # Free backup
-            # "qwen/qwen-2-vl-7b-instruct:free",   # Free alternative
-            # "meta-llama/llama-3.2-11b-vision-instruct:free",  # Free alternative
-            
-            # "openai/gpt-4o-mini",  # Rẻ nhất trong GPT-4 vision
-            # "openai/gpt-4o",
-        ]
+        print(f"📁 Tìm thấy {len(image_files)} ảnh cần xử lý")
+        print(f"🤖 Sử dụng model: {model or self.model}")
+        print(f"💾 Kết quả sẽ được lưu vào: {output_folder}")
+        print(f"🔄 Max retry rounds: {max_retry_rounds}")
+        images_per_request = self._fit_images_per_request(images_per_request)
+        if images_per_request > 1:
+            print(f"📦 Gộp tối đa {images_per_request} ảnh / request")
+        print("=" * 80)
 
-        self.model = self.vision_models[0]  # Dùng model đầu tiên làm mặc định
+        all_results = []
+        retry_queue = list(image_files)  # Queue chứa các file cần xử lý
+        retry_round = 0
 
-    def encode_image_to_base64(self, image_path: str) -> str:
-        """
-        Encode ảnh thành base64 string
+        while retry_queue and retry_round < max_retry_rounds:
+            if retry_round > 0:
+                print(f"\n{'=' * 80}")
+                print(f"🔄 RETRY ROUND {retry_round}: {len(retry_queue)} ảnh còn lại")
+                print(f"{'=' * 80}")
 
-        Args:
-            image_path: Đường dẫn đến file ảnh
+            current_batch = retry_queue.copy()
+            retry_queue = []  # Clear queue để chứa các file lỗi mới
 
-        Returns:
-            Base64 encoded string
-        """
-        with open(image_path, 'rb') as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+            # Process pool bắt đầu chuẩn bị ảnh của round này
+            if self.pipeline is not None:
+                self.pipeline.start(current_batch)
 
-    def get_image_mime_type(self, image_path: str) -> str:
-        """
-        Xác định MIME type của ảnh
+            groups = self._group_images(current_batch, images_per_request, max_request_bytes)
 
-        Args:
-            image_path: Đường dẫn đến file ảnh
+            for i, group in enumerate(groups, 1):
+                names = ", ".join(image_file.name for image_file in group)
+                print(f"\n[{i}/{len(groups)}] (Round {retry_round + 1}) Đang xử lý: {names}")
 
-        Returns:
-            MIME type string
-        """
-        ext = Path(image_path).suffix.lower()
-        mime_types = {
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.webp': 'image/webp',
-            '.bmp': 'image/bmp'
-        }
-        return mime_types.get(ext, 'image/jpeg')
-
-    def extract_text_from_image(
-        self,
-        image_path: str,
-        prompt: str = "Extract all text from this image.",
-        temperature: float = 0.3,
-        max_tokens: int = 4000,
-        model: Optional[str] = None,
-        retry_with_other_models: bool = True,
-        max_retries: int = 3
-    ) -> Dict[str, Any]:
-        """
-        Extract text từ một ảnh với retry logic
+                # Extract text với retry logic (thử tất cả models)
+                results = self._extract_group(group, prompt, model, output_path, retry_round)
 
-        Args:
-            image_path: Đường dẫn đến file ảnh
-            prompt: Prompt yêu cầu extract text
-            temperature: Độ ngẫu nhiên (0.0 - 1.0)
-            max_tokens: Số token tối đa
-            model: Model cụ thể (nếu không dùng mặc định)
-            retry_with_other_models: Tự động thử model khác khi gặp lỗi
-            max_retries: Số lần retry tối đa
+                for image_file, result in zip(group, results):
+                    self._handle_result(
+                        result, image_file, output_path, retry_round,
+                        max_retry_rounds, retry_queue, all_results
+                    )
 
-        Returns:
-            Dict chứa kết quả
-        """
-        # Encode ảnh một lần
-        try:
-            base64_image = self.encode_image_to_base64(image_path)
-            mime_type = self.get_image_mime_type(image_path)
-        except Exception as e:
-            return {
-                "success": False,
-                "image_path": image_path,
-                "error": f"Failed to read image: {str(e)}",
-                "error_type": type(e).__name__
-            }
-
-        # Danh sách models để thử
-        models_to_try = [model] if model else self.vision_models.copy()
-
-        last_error = None
-        last_error_type = None
-
-        for attempt, current_model in enumerate(models_to_try, 1):
-            try:
-                # Chuẩn bị headers
-                headers = {
-                    "Authorization": f"Bearer {self.api_key}",
-                    "Content-Type": "application/json",
-                    "HTTP-Referer": "https://github.com/image-text-extractor",
-                    "X-Title": "Image Text Extractor"
-                }
-
-                # Chuẩn bị payload với vision format
-                payload = {
-                    "model": current_model,
-                    "messages": [
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": prompt
-                                },
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:{mime_type};base64,{base64_image}"
-                                    }
-                                }
-                            ]
-                        }
-                    ],
-                    "temperature": temperature,
-                    "max_tokens": max_tokens
-                }
-
-                # Gửi request
-                response = requests.post(
-                    self.base_url,
-                    headers=headers,
-                    json=payload,
-                    timeout=120
-                )
+                # Delay để tránh rate limit
+                if i < len(groups):
+                    time.sleep(delay_seconds)
 
-                response.raise_for_status()
-                result = response.json()
-
-                return {
-                    "success": True,
-                    "image_path": image_path,
-                    "extracted_text": result["choices"][0]["message"]["content"],
-                    "model": result.get("model"),
-                    "usage": result.get("usage"),
-                    "attempts": attempt
-                }
-
-            except requests.exceptions.HTTPError as e:
-                last_error = str(e)
-                last_error_type = type(e).__name__
-
-                # Kiểm tra status code
-                if hasattr(e.response, 'status_code'):
-                    status_code = e.response.status_code
-
-                    # 429 = Rate limit
-                    if status_code == 429:
-                        print(f"   ⚠️  Rate limit với {current_model}")
-                        if retry_with_other_models and attempt < len(models_to_try):
-                            print(f"   🔄 Chuyển sang model: {models_to_try[attempt]}")
-                            time.sleep(2)  # Delay trước khi thử model khác
-                            continue
-                        else:
-                            break
-
-                    # 400 = Bad request - có thể model không hỗ trợ vision
-                    elif status_code == 400:
-                        print(f"   ⚠️  Model {current_model} không hỗ trợ hoặc bad request")
-                        if retry_with_other_models and attempt < len(models_to_try):
-                            print(f"   🔄 Chuyển sang model: {models_to_try[attempt]}")
-                            time.sleep(1)
-                            continue
-                        else:
-                            break
-
-                    # Các lỗi khác
-                    else:
-                        break
-
-            except requests.exceptions.RequestException as e:
-                last_error = str(e)
-                last_error_type = type(e).__name__
-
-                # Timeout hoặc connection error - thử lại
-                if attempt < max_retries:
-                    print(f"   ⚠️  Lỗi kết nối, retry lần {attempt}...")
-                    time.sleep(2 ** attempt)  # Exponential backoff
-                    continue
-                else:
-                    break
+            retry_round += 1
 
-            except Exception as e:
-                last_error = str(e)
-                last_error_type = type(e).__name__
-                break
+            # Nếu còn file trong retry queue, delay lâu hơn trước khi retry
+            if retry_queue:
+                delay_time = 5 * retry_round  # Tăng delay theo số round
+                # Nếu mọi model đều đang ngắt mạch, chờ đến lúc được thử lại
+                delay_time = max(delay_time, round(self._circuit_wait(model)))
+                print(f"\n⏸️  Delay {delay_time}s trước retry round tiếp theo...")
+                time.sleep(delay_time)
 
-        # Nếu tất cả đều thất bại
-        return {
-            "success": False,
-            "image_path": image_path,
-            "error": last_error,
-            "error_type": last_error_type
-        }
+        return self._finish_batch(all_results, output_path, retry_queue, max_retry_rounds)
 
-    def batch_extract_from_folder(
+    async def batch_extract_from_folder_async(
         self,
         folder_path: str,
         prompt: str = "Extract all text from this image.",
         output_folder: str = "extracted_texts",
         file_pattern: str = "*.jpeg",
-        delay_seconds: float = 1.0,
+        delay_seconds: float = 0.0,
         model: Optional[str] = None,
         skip_existing: bool = True,
-        max_retry_rounds: int = 3
+        max_retry_rounds: int = 3,
+        concurrency: int = 4,
+        images_per_request: int = 1,
+        max_request_bytes: int = 20 * 1024 * 1024,
+        resume: bool = True,
+        recursive: bool = False
     ) -> List[Dict[str, Any]]:
         """
-        Extract text từ tất cả ảnh trong folder với retry queue system
+        Async mode của batch_extract_from_folder: nhiều request chạy song song,
+        giới hạn bởi semaphore. Output files, retry queue và summary report
+        giống hệt mode tuần tự.
 
         Args:
             folder_path: Đường dẫn đến folder chứa ảnh
             prompt: Prompt yêu cầu extract text
             output_folder: Folder để lưu kết quả
             file_pattern: Pattern của file ảnh (*.jpeg, *.png, etc.)
-            delay_seconds: Delay giữa các request (tránh rate limit)
+            delay_seconds: Khoảng cách tối thiểu giữa 2 lần gửi request
             model: Model cụ thể
             skip_existing: Bỏ qua file đã extract
             max_retry_rounds: Số lần retry queue tối đa
+            concurrency: Số request tối đa đang chạy cùng lúc
+            images_per_request: Số ảnh gộp vào một request (1 = mỗi ảnh một request)
+            max_request_bytes: Tổng dung lượng ảnh tối đa trong một request gộp
+            resume: Ghi journal (.journal.jsonl) và tiếp tục từ lần chạy trước
+            recursive: Tìm ảnh cả trong các folder con (output vẫn nằm chung một folder)
 
         Returns:
             List các kết quả
         """
-        # Tạo output folder nếu chưa có
+        if concurrency < 1:
+            raise ValueError("concurrency phải >= 1")
+
+        # Rate limiter và pool hedge theo số worker (request đầu không phải chờ)
+        self.set_concurrency(concurrency)
+
         output_path = Path(output_folder)
         output_path.mkdir(exist_ok=True)
 
-        # Lấy danh sách ảnh
-        folder = Path(folder_path)
-        image_files = sorted(folder.glob(file_pattern))
+        self.journal = JobJournal(output_path / JOURNAL_FILE) if resume else None
+
+        image_files = self._collect_image_files(folder_path, file_pattern, output_path, skip_existing, recursive)
+        if not image_files:
+            self._close_journal()
+            return []
+
+        if self.journal is not None:
+            run = self.journal.start_run(
+                [image_file.name for image_file in image_files],
+                folder=str(folder_path),
+                pattern=file_pattern
+            )
+            if run > 1:
+                print(f"📒 Tiếp tục từ journal (lần chạy thứ {run})")
+
+        image_files = self._dedup_images(image_files)
+
+        print(f"📁 Tìm thấy {len(image_files)} ảnh cần xử lý")
+        print(f"🤖 Sử dụng model: {model or self.model}")
+        print(f"💾 Kết quả sẽ được lưu vào: {output_folder}")
+        print(f"🔄 Max retry rounds: {max_retry_rounds}")
+        print(f"⚡ Concurrency: {concurrency}")
+        images_per_request = self._fit_images_per_request(images_per_request)
+        if images_per_request > 1:
+            print(f"📦 Gộp tối đa {images_per_request} ảnh / request")
+        print("=" * 80)
+
+        semaphore = asyncio.Semaphore(concurrency)
+        dispatch_lock = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        last_dispatch = [0.0]
+
+        async def extract_one(group: List[Path]) -> List[Dict[str, Any]]:
+            async with semaphore:
+                # Giãn cách thời điểm gửi request (không chặn các request đang chạy)
+                if delay_seconds > 0:
+                    async with dispatch_lock:
+                        wait = last_dispatch[0] + delay_seconds - loop.time()
+                        if wait > 0:
+                            await asyncio.sleep(wait)
+                        last_dispatch[0] = loop.time()
+
+                return await asyncio.to_thread(
+                    self._extract_group, group, prompt, model, output_path, retry_round
+                )
+
+        all_results = []
+        retry_queue = list(image_files)
+        retry_round = 0
+
+        while retry_queue and retry_round < max_retry_rounds:
+            if retry_round > 0:
+                print(f"\n{'=' * 80}")
+                print(f"🔄 RETRY ROUND {retry_round}: {len(retry_queue)} ảnh còn lại")
+                print(f"{'=' * 80}")
+
+            current_batch = retry_queue.copy()
+            retry_queue = []
+
+            # Process pool bắt đầu chuẩn bị ảnh của round này
+            if self.pipeline is not None:
+                self.pipeline.start(current_batch)
+
+            groups = self._group_images(current_batch, images_per_request, max_request_bytes)
+
+            async def run_group(group: List[Path]):
+                return group, await extract_one(group)
+
+            tasks = [asyncio.create_task(run_group(group)) for group in groups]
+
+            done_count = 0
+            for finished in asyncio.as_completed(tasks):
+                group, results = await finished
+                for image_file, result in zip(group, results):
+                    done_count += 1
+                    print(f"\n[{done_count}/{len(current_batch)}] (Round {retry_round + 1}) Xong: {image_file.name}")
+
+                    self._handle_result(
+                        result, image_file, output_path, retry_round,
+                        max_retry_rounds, retry_queue, all_results
+                    )
+
+            # Giữ thứ tự retry queue ổn định theo thứ tự file ban đầu
+            order = {image_file: idx for idx, image_file in enumerate(current_batch)}
+            retry_queue.sort(key=lambda image_file: order[image_file])
+
+            retry_round += 1
+
+            if retry_queue:
+                delay_time = max(5 * retry_round, round(self._circuit_wait(model)))
+                print(f"\n⏸️  Delay {delay_time}s trước retry round tiếp theo...")
+                await asyncio.sleep(delay_time)
+
+        return self._finish_batch(all_results, output_path, retry_queue, max_retry_rounds)
+
+    def _collect_image_files(
+        self,
+        folder_path: str,
+        file_pattern: str,
+        output_path: Path,
+        skip_existing: bool,
+        recursive: bool = False
+    ) -> List[Path]:
+        """
+        Lấy danh sách ảnh cần xử lý (lọc các file đã extract nếu cần)
+
+        Folder được liệt kê một lần bằng os.scandir (folder_scan.py); các file
+        output đã có được đọc từ một lần liệt kê output folder vào một set,
+        không cần exists() cho từng ảnh.
+
+        File PDF được thay bằng các trang của nó (`de_p001.pdf-page`, ...);
+        trang chưa được render ở đây, chỉ đếm số trang. Nếu có segmenter,
+        mỗi trang được thay bằng các ảnh từng câu (`q1_s01.jpeg`, ...).
+
+        Args:
+            folder_path: Đường dẫn đến folder chứa ảnh
+            file_pattern: Pattern của file ảnh
+            output_path: Output folder
+            skip_existing: Bỏ qua file đã extract
+            recursive: Tìm cả trong các folder con
+
+        Returns:
+            List các file ảnh cần xử lý
+        """
+        try:
+            found = sorted(scan_files(folder_path, pattern=file_pattern, recursive=recursive))
+        except OSError as e:
+            print(f"⚠️  Không đọc được folder {folder_path}: {e}")
+            return []
+        if recursive:
+            found = list(unique_stems(found))  # Output chung một folder: tên phải khác nhau
+        image_files = expand_pdfs(found)
 
         if not image_files:
             print(f"⚠️  Không tìm thấy ảnh nào trong {folder_path} với pattern {file_pattern}")
             return []
 
+        if self.segmenter is not None:
+            pages = len(image_files)
+            image_files = self.segmenter.split_all(image_files)
+            if len(image_files) > pages:
+                print(f"✂️  Đã cắt {pages} trang thành {len(image_files)} ảnh (mỗi câu một ảnh)")
+
         # Lọc các file đã extract nếu skip_existing = True
         if skip_existing:
             files_to_process = []
             skipped_count = 0
+            extracted = existing_outputs(output_path)
 
             for image_file in image_files:
-                output_file = output_path / f"{image_file.stem}_extracted.txt"
-                if output_file.exists():
+                # Journal đã biết ảnh nào xong, không cần kiểm tra file output
+                if self.journal is not None and self.journal.is_done(image_file.name):
+                    skipped_count += 1
+                    continue
+                if image_file.stem in extracted:
                     skipped_count += 1
                 else:
                     files_to_process.append(image_file)
@@ -295,99 +481,339 @@ class ImageTextExtractor:
 
         if not image_files:
             print("✅ Tất cả file đã được extract!")
-            return []
 
-        print(f"📁 Tìm thấy {len(image_files)} ảnh cần xử lý")
-        print(f"🤖 Sử dụng model: {model or self.model}")
-        print(f"💾 Kết quả sẽ được lưu vào: {output_folder}")
-        print(f"🔄 Max retry rounds: {max_retry_rounds}")
-        print("=" * 80)
+        return image_files
 
-        all_results = []
-        retry_queue = list(image_files)  # Queue chứa các file cần xử lý
-        retry_round = 0
+    def _dedup_images(self, image_files: List[Path]) -> List[Path]:
+        """
+        Gom các ảnh gần giống hệt nhau, chỉ giữ ảnh đại diện để gửi API
 
-        while retry_queue and retry_round < max_retry_rounds:
-            if retry_round > 0:
-                print(f"\n{'=' * 80}")
-                print(f"🔄 RETRY ROUND {retry_round}: {len(retry_queue)} ảnh còn lại")
-                print(f"{'=' * 80}")
+        Args:
+            image_files: Danh sách ảnh cần xử lý
 
-            current_batch = retry_queue.copy()
-            retry_queue = []  # Clear queue để chứa các file lỗi mới
+        Returns:
+            Các ảnh đại diện (ảnh đầu tiên của mỗi nhóm, giữ nguyên thứ tự)
+        """
+        self.duplicates = {}
+        if self.deduplicator is None or len(image_files) < 2:
+            return image_files
 
-            for i, image_file in enumerate(current_batch, 1):
-                total_processed = len(all_results) + i
-                print(f"\n[{i}/{len(current_batch)}] (Round {retry_round + 1}) Đang xử lý: {image_file.name}")
+        unique, self.duplicates = self.deduplicator.cluster(image_files)
+        if self.duplicates:
+            print(f"🖼️  {len(image_files) - len(unique)} ảnh gần giống hệt ảnh khác: "
+                  f"chỉ gửi {len(unique)} ảnh, text được chép sang các ảnh còn lại")
+        return unique
 
-                # Extract text với retry logic (thử tất cả models)
-                result = self.extract_text_from_image(
-                    image_path=str(image_file),
-                    prompt=prompt,
-                    model=model,
-                    retry_with_other_models=True,
-                    max_retries=3
-                )
+    def _fit_images_per_request(self, images_per_request: int) -> int:
+        """
+        Giảm số ảnh mỗi request để tổng output token không vượt max_request_tokens
 
-                # Hiển thị kết quả
-                if result["success"]:
-                    print(f"✅ Thành công!")
-                    if "attempts" in result and result["attempts"] > 1:
-                        print(f"   (Thành công sau {result['attempts']} lần thử)")
+        Args:
+            images_per_request: Số ảnh gộp mong muốn
 
-                    # Lưu kết quả vào file
-                    output_file = output_path / f"{image_file.stem}_extracted.txt"
-                    with open(output_file, 'w', encoding='utf-8') as f:
-                        f.write(f"Image: {image_file.name}\n")
-                        f.write(f"Model: {result.get('model', 'N/A')}\n")
-                        f.write(f"Retry Round: {retry_round + 1}\n")
-                        f.write("=" * 80 + "\n\n")
-                        f.write(result["extracted_text"])
-                        f.write("\n\n" + "=" * 80 + "\n")
-                        if "usage" in result:
-                            f.write(f"Tokens used: {result['usage'].get('total_tokens', 'N/A')}\n")
+        Returns:
+            Số ảnh gộp thực tế
+        """
+        fitted = min(images_per_request, self.images_per_pack())
+        if fitted < images_per_request:
+            print(f"⚠️  Giảm còn {fitted} ảnh / request (tối đa {self.max_request_tokens} output token / request)")
+        return fitted
 
-                    print(f"💾 Đã lưu: {output_file.name}")
+    def _group_images(
+        self,
+        image_files: List[Path],
+        images_per_request: int,
+        max_request_bytes: int
+    ) -> List[List[Path]]:
+        """
+        Chia danh sách ảnh thành các nhóm cho từng request
 
-                    # Hiển thị preview
-                    preview = result["extracted_text"][:200]
-                    print(f"📄 Preview: {preview}...")
+        Args:
+            image_files: Danh sách ảnh (giữ nguyên thứ tự)
+            images_per_request: Số ảnh tối đa mỗi nhóm
+            max_request_bytes: Tổng dung lượng ảnh tối đa mỗi nhóm
 
-                    all_results.append(result)
+        Returns:
+            List các nhóm ảnh
+        """
+        if images_per_request <= 1:
+            return [[image_file] for image_file in image_files]
 
-                else:
-                    print(f"❌ Lỗi: {result['error']}")
-
-                    # Đưa vào retry queue nếu chưa hết retry rounds
-                    if retry_round < max_retry_rounds - 1:
-                        print(f"   🔄 Đưa vào retry queue")
-                        retry_queue.append(image_file)
-                    else:
-                        print(f"   ⛔ Đã hết retry rounds, lưu lỗi")
-                        # Lưu lỗi
-                        error_file = output_path / f"{image_file.stem}_error.txt"
-                        with open(error_file, 'w', encoding='utf-8') as f:
-                            f.write(f"Image: {image_file.name}\n")
-                            f.write(f"Error: {result['error']}\n")
-                            f.write(f"Error Type: {result['error_type']}\n")
-                            f.write(f"Retry Rounds: {retry_round + 1}\n")
-
-                        all_results.append(result)
+        groups: List[List[Path]] = []
+        current: List[Path] = []
+        current_bytes = 0
 
-                # Delay để tránh rate limit
-                if i < len(current_batch):
-                    time.sleep(delay_seconds)
+        for image_file in image_files:
+            try:
+                size = image_file.stat().st_size
+            except OSError:
+                size = 0  # Lỗi đọc file sẽ được báo khi extract
 
-            retry_round += 1
+            if current and (len(current) >= images_per_request or current_bytes + size > max_request_bytes):
+                groups.append(current)
+                current, current_bytes = [], 0
 
-            # Nếu còn file trong retry queue, delay lâu hơn trước khi retry
-            if retry_queue:
-                delay_time = 5 * retry_round  # Tăng delay theo số round
-                print(f"\n⏸️  Delay {delay_time}s trước retry round tiếp theo...")
-                time.sleep(delay_time)
+            current.append(image_file)
+            current_bytes += size
+
+        if current:
+            groups.append(current)
+        return groups
 
-        # Tạo summary report
-        self._create_summary_report(all_results, output_path)
+    def _extract_group(
+        self,
+        group: List[Path],
+        prompt: str,
+        model: Optional[str],
+        output_path: Optional[Path] = None,
+        retry_round: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract một nhóm ảnh (một ảnh dùng extract_text_from_image)
+
+        Ở stream mode, text của ảnh đơn được ghi dần vào file .part cạnh file
+        kết quả; _handle_result đổi tên (thành công) hoặc xóa (lỗi) file này.
+
+        Args:
+            group: Nhóm ảnh
+            prompt: Prompt yêu cầu extract text
+            model: Model cụ thể
+            output_path: Output folder (cần cho stream mode)
+            retry_round: Round hiện tại (ghi vào header của file)
+
+        Returns:
+            List kết quả theo thứ tự trong nhóm
+        """
+        if len(group) == 1:
+            image_file = group[0]
+            sink = None
+            if self.stream and output_path is not None:
+                sink = StreamingTextFile(
+                    output_path / f"{image_file.stem}_extracted.txt",
+                    header=lambda answered_by: self._output_header(image_file, answered_by, retry_round)
+                )
+
+            result = self.extract_text_from_image(
+                image_path=str(image_file),
+                prompt=prompt,
+                model=model,
+                retry_with_other_models=True,
+                max_retries=3,
+                sink=sink
+            )
+            if sink is not None:
+                result["stream_sink"] = sink
+            return [result]
+
+        return self.extract_text_from_images(
+            image_paths=[str(image_file) for image_file in group],
+            prompt=prompt,
+            model=model,
+            retry_with_other_models=True,
+            max_retries=3
+        )
+
+    def _handle_result(
+        self,
+        result: Dict[str, Any],
+        image_file: Path,
+        output_path: Path,
+        retry_round: int,
+        max_retry_rounds: int,
+        retry_queue: List[Path],
+        all_results: List[Dict[str, Any]]
+    ):
+        """
+        Lưu kết quả của một ảnh, hoặc đưa vào retry queue nếu lỗi
+
+        Args:
+            result: Kết quả từ extract_text_from_image
+            image_file: File ảnh
+            output_path: Output folder
+            retry_round: Round hiện tại (bắt đầu từ 0)
+            max_retry_rounds: Số lần retry queue tối đa
+            retry_queue: Queue chứa các file lỗi cho round sau
+            all_results: List tổng hợp kết quả
+        """
+        sink = result.pop("stream_sink", None)
+
+        if result["success"]:
+            print(f"✅ Thành công!")
+            if result.get("cached"):
+                print(f"   ♻️  Lấy từ cache (không gọi API)")
+            elif result.get("batch_size", 1) > 1:
+                print(f"   📦 Gộp chung request với {result['batch_size'] - 1} ảnh khác")
+            elif "attempts" in result and result["attempts"] > 1:
+                print(f"   (Thành công sau {result['attempts']} lần thử)")
+            if result.get("finish_reason") == "length":
+                print(f"   ⚠️  Output bị cắt ở max_tokens")
+            elif result.get("finish_reason") == "runaway":
+                print(f"   ⚠️  Output bị lặp, đã dừng stream sớm")
+
+            # Lưu kết quả vào file
+            output_file = output_path / f"{image_file.stem}_extracted.txt"
+            if sink is not None and sink.started:
+                # Text đã được ghi dần vào file .part: thêm footer rồi đổi tên
+                sink.finish(self._output_footer(result))
+            else:
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    f.write(self._output_header(image_file, result.get('model', 'N/A'), retry_round))
+                    f.write(result["extracted_text"])
+                    f.write(self._output_footer(result))
+
+            print(f"💾 Đã lưu: {output_file.name}")
+
+            if self.journal is not None:
+                self.journal.record(
+                    image_file.name, "done",
+                    round=retry_round + 1,
+                    output=output_file.name,
+                    **result_fields(result)
+                )
+
+            # Hiển thị preview
+            preview = result["extracted_text"][:200]
+            print(f"📄 Preview: {preview}...")
+
+            all_results.append(result)
+            self._fan_out(result, image_file, output_path, retry_round, all_results)
+
+        else:
+            print(f"❌ Lỗi: {result['error']}")
+            if sink is not None:
+                sink.abort()
+
+            final = retry_round >= max_retry_rounds - 1
+            if self.journal is not None:
+                self.journal.record(
+                    image_file.name, "failed" if final else "retry",
+                    round=retry_round + 1,
+                    attempts=result.get("attempts", 0),
+                    error=result["error"],
+                    error_type=result.get("error_type")
+                )
+
+            # Đưa vào retry queue nếu chưa hết retry rounds
+            if not final:
+                print(f"   🔄 Đưa vào retry queue")
+                retry_queue.append(image_file)
+            else:
+                print(f"   ⛔ Đã hết retry rounds, lưu lỗi")
+                # Lưu lỗi
+                error_file = output_path / f"{image_file.stem}_error.txt"
+                with open(error_file, 'w', encoding='utf-8') as f:
+                    f.write(f"Image: {image_file.name}\n")
+                    f.write(f"Error: {result['error']}\n")
+                    f.write(f"Error Type: {result['error_type']}\n")
+                    f.write(f"Retry Rounds: {retry_round + 1}\n")
+
+                all_results.append(result)
+                self._fan_out(result, image_file, output_path, retry_round, all_results)
+
+    def _fan_out(
+        self,
+        result: Dict[str, Any],
+        image_file: Path,
+        output_path: Path,
+        retry_round: int,
+        all_results: List[Dict[str, Any]]
+    ):
+        """
+        Chép kết quả cuối cùng của ảnh đại diện sang các ảnh gần giống hệt nó
+
+        Args:
+            result: Kết quả của ảnh đại diện (thành công hoặc lỗi ở round cuối)
+            image_file: Ảnh đại diện
+            output_path: Output folder
+            retry_round: Round hiện tại (bắt đầu từ 0)
+            all_results: List tổng hợp kết quả
+        """
+        for member in self.duplicates.get(image_file, []):
+            if result["success"]:
+                output_file = output_path / f"{member.stem}_extracted.txt"
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    f.write(self._output_header(member, result.get('model', 'N/A'), retry_round, duplicate_of=image_file))
+                    f.write(result["extracted_text"])
+                    # Không gọi API cho ảnh trùng: 0 token
+                    f.write(self._output_footer({"usage": {"total_tokens": 0}}))
+                print(f"   🖼️  Chép sang ảnh trùng: {output_file.name}")
+                if self.journal is not None:
+                    self.journal.record(
+                        member.name, "done",
+                        round=retry_round + 1,
+                        model=result.get("model"),
+                        output=output_file.name
+                    )
+            else:
+                error_file = output_path / f"{member.stem}_error.txt"
+                with open(error_file, 'w', encoding='utf-8') as f:
+                    f.write(f"Image: {member.name}\n")
+                    f.write(f"Duplicate Of: {image_file.name}\n")
+                    f.write(f"Error: {result['error']}\n")
+                    f.write(f"Error Type: {result['error_type']}\n")
+                    f.write(f"Retry Rounds: {retry_round + 1}\n")
+                if self.journal is not None:
+                    self.journal.record(
+                        member.name, "failed",
+                        round=retry_round + 1,
+                        error=result["error"],
+                        error_type=result.get("error_type")
+                    )
+
+            all_results.append({
+                "success": result["success"],
+                "image_path": str(member),
+                "model": result.get("model"),
+                "extracted_text": result.get("extracted_text"),
+                "error": result.get("error"),
+                "error_type": result.get("error_type"),
+                "duplicate_of": image_file.name,
+            })
+
+    @staticmethod
+    def _output_header(image_file: Path, model: str, retry_round: int, duplicate_of: Optional[Path] = None) -> str:
+        """Phần đầu của file _extracted.txt (ảnh trùng ghi thêm ảnh đại diện)"""
+        return (
+            f"Image: {image_file.name}\n"
+            f"Model: {model}\n"
+            f"Retry Round: {retry_round + 1}\n"
+            + (f"Duplicate Of: {duplicate_of.name}\n" if duplicate_of is not None else "")
+            + "=" * 80 + "\n\n"
+        )
+
+    @staticmethod
+    def _output_footer(result: Dict[str, Any]) -> str:
+        """Phần cuối của file _extracted.txt (sau text)"""
+        footer = "\n\n" + "=" * 80 + "\n"
+        if "usage" in result:
+            footer += f"Tokens used: {(result['usage'] or {}).get('total_tokens', 'N/A')}\n"
+        return footer
+
+    def _finish_batch(
+        self,
+        all_results: List[Dict[str, Any]],
+        output_path: Path,
+        retry_queue: List[Path],
+        max_retry_rounds: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Tạo summary report và hiển thị các ảnh còn lại trong retry queue
+
+        Args:
+            all_results: List tổng hợp kết quả
+            output_path: Output folder
+            retry_queue: Các file vẫn còn lỗi
+            max_retry_rounds: Số lần retry queue tối đa
+
+        Returns:
+            List các kết quả
+        """
+        # Tạo summary report (gộp kết quả của mọi lần chạy nếu có journal)
+        if self.journal is not None:
+            self._create_summary_report(self.journal.results(), output_path)
+        else:
+            self._create_summary_report(all_results, output_path)
+        self._close_journal()
 
         # Hiển thị thống kê retry queue
         if retry_queue:
@@ -397,6 +823,12 @@ class ImageTextExtractor:
 
         return all_results
 
+    def _close_journal(self):
+        """Đóng journal của batch hiện tại"""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
     def _create_summary_report(self, results: List[Dict[str, Any]], output_path: Path):
         """
         Tạo báo cáo tổng hợp
@@ -428,13 +860,91 @@ class ImageTextExtractor:
                         f.write(f"- {Path(result['image_path']).name}: {result['error']}\n")
                 f.write("\n")
 
-            # Total tokens used
+            # Total tokens used (kết quả từ cache không tốn token)
             total_tokens = sum(
-                r.get("usage", {}).get("total_tokens", 0)
-                for r in results if r["success"]
+                (r.get("usage") or {}).get("total_tokens", 0)
+                for r in results if r["success"] and not r.get("cached")
             )
             f.write(f"Total tokens used: {total_tokens:,}\n")
 
+            # Tổng hợp qua các lần chạy (journal)
+            if self.journal is not None:
+                f.write(f"Journal: {format_journal_summary(self.journal.summary())}\n")
+
+            # Thống kê cache
+            if self.cache is not None:
+                saved_tokens = sum(
+                    (r.get("usage") or {}).get("total_tokens", 0)
+                    for r in results if r["success"] and r.get("cached")
+                )
+                cache_stats = self.cache.stats()
+                f.write(
+                    f"Cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                    f"(hit rate {cache_stats['hit_rate'] * 100:.1f}%), "
+                    f"{cache_stats['entries']} entries, {cache_stats['bytes']:,} bytes, "
+                    f"{cache_stats['evictions']} evicted\n"
+                )
+                f.write(f"Tokens saved by cache: {saved_tokens:,}\n")
+
+            # Thống kê kết nối HTTP (keep-alive)
+            if self.transport is not None:
+                f.write(f"HTTP: {format_timing_summary(self.transport.timing_summary())}\n")
+
+            # Thống kê tiền xử lý ảnh
+            if self.preprocessor is not None:
+                f.write(f"Preprocess: {format_preprocess_stats(self.preprocessor.stats())}\n")
+
+            # Thống kê process pool chuẩn bị ảnh
+            if self.pipeline is not None:
+                f.write(f"Prefetch: {format_pipeline_stats(self.pipeline.stats())}\n")
+
+            # Cắt trang thành từng câu
+            if self.segmenter is not None:
+                f.write(f"Segmentation: {format_segment_stats(self.segmenter.stats())}\n")
+
+            # Ảnh gần giống hệt (không gọi API)
+            if self.deduplicator is not None:
+                f.write(f"Image dedup: {format_image_dedup_stats(self.deduplicator.stats())}\n")
+
+            # Latency / throughput (chi tiết từng ảnh trong metrics JSONL)
+            metrics_summary = self.metrics.summary()
+            if metrics_summary.get("images"):
+                f.write("\nLATENCY:\n")
+                f.write("-" * 80 + "\n")
+                f.write(format_metrics_summary(metrics_summary) + "\n")
+                if self.metrics.path is not None:
+                    f.write(f"Per-image metrics: {self.metrics.path}\n")
+
+            # Thống kê router (latency/lỗi theo model, hedged requests)
+            if self.router is not None and self.router.stats():
+                f.write("\nMODEL ROUTER:\n")
+                f.write("-" * 80 + "\n")
+                for line in format_router_stats(self.router.stats()):
+                    f.write(line + "\n")
+
+            # Circuit breaker (chỉ khi có model/endpoint từng lỗi)
+            breaker_stats = self.breaker.stats()
+            if breaker_stats:
+                f.write("\nCIRCUIT BREAKER:\n")
+                f.write("-" * 80 + "\n")
+                for key, stats in breaker_stats.items():
+                    f.write(
+                        f"- {key}: {stats['state']}, ngắt {stats['trips']} lần, "
+                        f"từ chối {stats['rejected']} request\n"
+                    )
+
+            # Thống kê rate limiter theo từng model
+            limiter_stats = self.rate_limiter.stats()
+            if limiter_stats:
+                f.write("\nRATE LIMITER:\n")
+                f.write("-" * 80 + "\n")
+                for model_name, stats in limiter_stats.items():
+                    f.write(
+                        f"- {model_name}: {stats['rpm']} rpm, "
+                        f"{stats['rate_limited']} lần 429, "
+                        f"chờ {stats['waited_seconds']}s\n"
+                    )
+
         print("\n" + "=" * 80)
         print(f"✅ Hoàn thành! Đã xử lý {len(results)} ảnh")
         print(f"   - Thành công: {success_count}")
@@ -467,6 +977,50 @@ Examples:
     --api-key sk-or-xxx \\
     --input-folder images \\
     --prompt-file custom_prompt.txt
+
+  # Async mode with 8 concurrent requests
+  python image_text_extractor.py \\
+    --api-key sk-or-xxx \\
+    --input-folder images \\
+    --concurrency 8
+
+  # Pack 4 images into each request
+  python image_text_extractor.py \\
+    --api-key sk-or-xxx \\
+    --input-folder images \\
+    --images-per-request 4
+
+  # Stream text into the output files as it is generated
+  python image_text_extractor.py \\
+    --api-key sk-or-xxx \\
+    --input-folder images \\
+    --stream
+
+  # Send re-shot photos of the same page only once
+  python image_text_extractor.py \\
+    --api-key sk-or-xxx \\
+    --input-folder images \\
+    --dedup-images
+
+  # Whole-page photos: cut each page into one image per question
+  python image_text_extractor.py \\
+    --api-key sk-or-xxx \\
+    --input-folder images \\
+    --segment \\
+    --concurrency 8
+
+  # Scanned exam PDFs: pages are rendered one by one as they are sent
+  python image_text_extractor.py \\
+    --api-key sk-or-xxx \\
+    --input-folder scans \\
+    --file-pattern "*.pdf" \\
+    --pdf-dpi 200
+
+  # Use the local Gemini CLI instead of OpenRouter
+  python image_text_extractor.py \\
+    --backend gemini-cli \\
+    --models gemini-2.5-flash \\
+    --input-folder images
         """
     )
 
@@ -491,7 +1045,21 @@ Examples:
     parser.add_argument(
         '--file-pattern',
         default='*.jpeg',
-        help='File pattern to match (default: *.jpeg). Use *.png, *.jpg, etc.'
+        help='File pattern to match (default: *.jpeg). Use *.png, *.jpg, etc.; '
+             'matching PDFs are split into pages (requires PyMuPDF)'
+    )
+
+    parser.add_argument(
+        '--recursive',
+        action='store_true',
+        help='Also look for images in subfolders (outputs stay in one folder, so names must differ)'
+    )
+
+    parser.add_argument(
+        '--pdf-dpi',
+        type=int,
+        default=DEFAULT_DPI,
+        help=f'Resolution PDF pages are rendered at (default: {DEFAULT_DPI})'
     )
 
     parser.add_argument(
@@ -514,16 +1082,217 @@ Examples:
         help='Maximum retry rounds for failed extractions (default: 3)'
     )
 
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=1,
+        help='Number of concurrent requests; > 1 enables async mode (default: 1)'
+    )
+
+    parser.add_argument(
+        '--images-per-request',
+        type=int,
+        default=1,
+        help='Pack up to N images into one vision request (default: 1)'
+    )
+
+    parser.add_argument(
+        '--max-request-mb',
+        type=float,
+        default=20,
+        help='Max total image size per packed request in MB (default: 20)'
+    )
+
+    parser.add_argument(
+        '--max-request-tokens',
+        type=int,
+        default=DEFAULT_MAX_REQUEST_TOKENS,
+        help='Max output tokens one packed request may ask for; larger packs are split '
+             f'(default: {DEFAULT_MAX_REQUEST_TOKENS})'
+    )
+
+    parser.add_argument(
+        '--pool-size',
+        type=int,
+        default=None,
+        help='HTTP connection pool size (default: max(10, concurrency))'
+    )
+
+    parser.add_argument(
+        '--http2',
+        action='store_true',
+        help='Use HTTP/2 via httpx (requires: pip install "httpx[http2]")'
+    )
+
+    parser.add_argument(
+        '--preprocess',
+        action='store_true',
+        help='Resize and recompress images before upload (requires Pillow)'
+    )
+
+    parser.add_argument(
+        '--max-edge',
+        type=int,
+        default=2000,
+        help='Longest image side in pixels when preprocessing (default: 2000)'
+    )
+
+    parser.add_argument(
+        '--image-format',
+        choices=sorted(FORMATS),
+        default='jpeg',
+        help='Format of preprocessed images (default: jpeg)'
+    )
+
+    parser.add_argument(
+        '--quality',
+        type=int,
+        default=85,
+        help='JPEG/WebP quality of preprocessed images (default: 85)'
+    )
+
+    parser.add_argument(
+        '--grayscale',
+        action='store_true',
+        help='Convert preprocessed images to grayscale'
+    )
+
+    parser.add_argument(
+        '--prefetch-workers',
+        type=int,
+        default=min(4, os.cpu_count() or 1),
+        help='Worker processes that read/validate/preprocess images ahead of the '
+             'network requests (default: min(4, CPU count); 0 = inline)'
+    )
+
+    parser.add_argument(
+        '--models',
+        default=None,
+        help='Comma-separated vision models; with more than one, each image goes to the '
+             'currently fastest healthy model'
+    )
+
+    parser.add_argument(
+        '--hedge',
+        action='store_true',
+        help='When a request is slower than its model\'s p95, send a duplicate to the next '
+             'model and keep the first answer (needs --models with 2+ models; costs extra tokens)'
+    )
+
+    parser.add_argument(
+        '--dedup-images',
+        action='store_true',
+        help='Cluster near-identical images by perceptual hash, extract one per cluster and '
+             'copy its text to the others (requires Pillow)'
+    )
+
+    parser.add_argument(
+        '--dedup-method',
+        choices=list(HASHES),
+        default='phash',
+        help='Perceptual hash for --dedup-images (default: phash)'
+    )
+
+    parser.add_argument(
+        '--dedup-distance',
+        type=int,
+        default=None,
+        help='Max Hamming distance (bits of a 256-bit hash) between duplicates '
+             '(default: 56 for phash, 38 for dhash, 8 for ahash)'
+    )
+
+    parser.add_argument(
+        '--segment',
+        action='store_true',
+        help='Cut each page at the whitespace between questions and extract every question '
+             'as its own image (crops cached in <output>/.segments; requires Pillow)'
+    )
+
+    parser.add_argument(
+        '--segment-gap',
+        type=float,
+        default=DEFAULT_GAP_FACTOR,
+        help='A blank gap this many times the typical line gap separates two questions '
+             f'(default: {DEFAULT_GAP_FACTOR})'
+    )
+
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Stream responses (SSE): text is written to <image>_extracted.txt as it arrives '
+             '(renamed into place when done), TTFT is reported, looping output is cut short; '
+             'disables --hedge'
+    )
+
+    parser.add_argument(
+        '--breaker-threshold',
+        type=int,
+        default=5,
+        help='Consecutive 5xx/timeout failures that open a model/endpoint circuit (default: 5)'
+    )
+
+    parser.add_argument(
+        '--breaker-cooldown',
+        type=float,
+        default=30,
+        help='Seconds an open circuit fails fast before a probe (default: 30)'
+    )
+
+    parser.add_argument(
+        '--backend',
+        choices=list(BACKENDS),
+        default='openrouter',
+        help='Where requests go: OpenRouter, an in-process mock server, or the gemini CLI '
+             '(default: openrouter)'
+    )
+
+    parser.add_argument(
+        '--api-url',
+        default=None,
+        help='Chat completions endpoint (default: OpenRouter; see mock_openrouter.py for offline runs)'
+    )
+
+    parser.add_argument(
+        '--metrics-file',
+        default=None,
+        help='Per-image metrics JSONL (default: <output-folder>/metrics.jsonl)'
+    )
+
+    parser.add_argument(
+        '--no-resume',
+        action='store_true',
+        help='Do not read or write the job journal (.journal.jsonl in the output folder)'
+    )
+
+    parser.add_argument(
+        '--cache-file',
+        default=str(DEFAULT_CACHE_FILE),
+        help=f'SQLite result cache shared across runs (default: {DEFAULT_CACHE_FILE})'
+    )
+
+    parser.add_argument(
+        '--cache-max-mb',
+        type=int,
+        default=512,
+        help='Max cache size in MB before LRU eviction (default: 512)'
+    )
+
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Disable the result cache'
+    )
+
     args = parser.parse_args()
 
     print("=" * 80)
     print("IMAGE TEXT EXTRACTOR - BATCH PROCESSING")
     print("=" * 80)
 
-    # Get API key from args or environment
+    # Get API key from args or environment (chỉ backend OpenRouter cần)
     api_key = args.api_key or os.getenv('OPENROUTER_API_KEY')
 
-    if not api_key:
+    if args.backend == 'openrouter' and not api_key:
         print("\nCảnh báo: Chưa thiết lập API key!")
         print("Vui lòng cung cấp API key bằng một trong hai cách:")
         print("  1. Sử dụng --api-key sk-or-xxx")
@@ -531,7 +1300,7 @@ Examples:
         return
 
     # Validate API key format
-    if not api_key.startswith('sk-or-'):
+    if args.backend == 'openrouter' and not api_key.startswith('sk-or-'):
         print("\nCảnh báo: API key nên bắt đầu bằng 'sk-or-'")
         print("Get your key at: https://openrouter.ai/keys")
 
@@ -546,17 +1315,94 @@ Examples:
         custom_prompt = "Extract all text from this image."
 
     # Initialize extractor with API key
+    pool_size = args.pool_size or max(10, args.concurrency)
+
     try:
-        extractor = ImageTextExtractor(api_key=api_key)
-    except ValueError as e:
+        transport = create_transport(pool_size=pool_size, http2=args.http2)
+        cache = None
+        if not args.no_cache:
+            cache = ResultCache(args.cache_file, max_bytes=args.cache_max_mb * 1024 * 1024)
+        preprocessor = None
+        if args.preprocess:
+            preprocessor = ImagePreprocessor(
+                max_edge=args.max_edge,
+                image_format=args.image_format,
+                quality=args.quality,
+                grayscale=args.grayscale,
+                cache_dir=Path(args.output_folder) / ".preprocessed"
+            )
+        pipeline = None
+        if args.prefetch_workers > 0:
+            pipeline = ImagePipeline(
+                workers=args.prefetch_workers,
+                max_ahead=max(8, 2 * args.concurrency * args.images_per_request),
+                preprocessor=preprocessor,
+                pdf_dpi=args.pdf_dpi
+            )
+        deduplicator = None
+        if args.dedup_images:
+            deduplicator = ImageDeduplicator(method=args.dedup_method, max_distance=args.dedup_distance)
+        segmenter = None
+        if args.segment:
+            segmenter = PageSegmenter(
+                cache_dir=Path(args.output_folder) / ".segments",
+                gap_factor=args.segment_gap,
+                pdf_dpi=args.pdf_dpi
+            )
+        metrics = MetricsRecorder(args.metrics_file or Path(args.output_folder) / "metrics.jsonl")
+        models = [name.strip() for name in (args.models or "").split(',') if name.strip()]
+        router = ModelRouter(hedge=args.hedge) if len(models) > 1 else None
+        extractor = ImageTextExtractor(
+            cache=cache,
+            preprocessor=preprocessor,
+            pipeline=pipeline,
+            metrics=metrics,
+            router=router,
+            breaker=CircuitBreaker(
+                failure_threshold=args.breaker_threshold,
+                cooldown_seconds=args.breaker_cooldown
+            ),
+            backend=create_backend(
+                args.backend,
+                api_key=api_key,
+                api_url=args.api_url,
+                transport=transport
+            ),
+            stream=args.stream,
+            deduplicator=deduplicator,
+            pdf_dpi=args.pdf_dpi,
+            segmenter=segmenter,
+            max_request_tokens=args.max_request_tokens
+        )
+        if models:
+            extractor.vision_models = models
+            extractor.model = models[0]
+    except (ValueError, ImportError) as e:
         print(f"\nLỗi: {e}")
         return
 
-    print(f"\nFolder ảnh: {args.input_folder}")
+    print(f"\nBackend: {args.backend}")
+    print(f"Folder ảnh: {args.input_folder}")
     print(f"Output folder: {args.output_folder}")
-    print(f"File pattern: {args.file_pattern}")
+    print(f"File pattern: {args.file_pattern}{' (recursive)' if args.recursive else ''}")
     print(f"Delay: {args.delay}s")
     print(f"Max retry rounds: {args.max_retry_rounds}")
+    print(f"Concurrency: {args.concurrency}")
+    print(f"Images per request: {args.images_per_request}")
+    print(f"HTTP pool size: {pool_size}{' (HTTP/2)' if args.http2 else ''}")
+    print(f"Prefetch workers: {args.prefetch_workers or 'inline'}")
+    if args.stream:
+        print("Streaming: on")
+    if segmenter is not None:
+        print(f"Segmentation: gap factor {args.segment_gap}")
+    if deduplicator is not None:
+        print(f"Image dedup: {args.dedup_method}, max distance {deduplicator.max_distance} bits")
+    if router is not None:
+        print(f"Models: {', '.join(models)} (latency routing{', hedged' if args.hedge else ''})")
+    print(f"Cache: {'disabled' if args.no_cache else args.cache_file}")
+    if args.preprocess:
+        print(f"Preprocess: max edge {args.max_edge}px, {args.image_format} q{args.quality}"
+              f"{', grayscale' if args.grayscale else ''}")
 
     # Run batch extraction
     print("\nBắt đầu xử lý...\n")
@@ -567,9 +1413,19 @@ Examples:
         output_folder=args.output_folder,
         file_pattern=args.file_pattern,
         delay_seconds=args.delay,
-        max_retry_rounds=args.max_retry_rounds
+        max_retry_rounds=args.max_retry_rounds,
+        concurrency=args.concurrency,
+        images_per_request=args.images_per_request,
+        max_request_bytes=int(args.max_request_mb * 1024 * 1024),
+        resume=not args.no_resume,
+        recursive=args.recursive
     )
 
+    if pipeline is not None:
+        pipeline.close()
+    metrics.close()
+    extractor.close()
+
     print("\nHoàn thành tất cả!")
 
 
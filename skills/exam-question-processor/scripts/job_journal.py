@@ -0,0 +1,316 @@
+"""
+Crash-safe job journal for batch extraction
+
+Every state change of every image (retry, done, failed) is appended as one
+JSON line to `<output folder>/.journal.jsonl` and fsync'ed before the run
+moves on. A restarted run replays the journal to know exactly which images
+are finished, how many attempts and tokens each one has cost so far, and
+why the others failed, so it can resume without re-checking output files
+and report totals across all runs.
+
+Features:
+- Append-only JSONL, one fsync per record (survives kill -9 / power loss)
+- Torn last line from a crash is ignored on replay
+- Cumulative attempts, tokens and runs per image
+- Automatic compaction when the log grows far beyond the number of images
+- Thread-safe
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+JOURNAL_FILE = ".journal.jsonl"
+
+# Compact when the log has this many lines per known image
+_COMPACT_RATIO = 8
+_COMPACT_MIN_LINES = 1000
+
+
+class JobJournal:
+    """
+    Append-only per-image state log for one output folder
+
+    Usage:
+        journal = JobJournal(output_path / JOURNAL_FILE)
+        journal.start_run(image_names)
+        todo = [name for name in image_names if not journal.is_done(name)]
+        journal.record(name, "done", round=1, attempts=1, usage=usage)
+        print(journal.summary(image_names))
+        journal.close()
+    """
+
+    STATES = ("retry", "done", "failed")
+
+    def __init__(self, path: Union[str, Path], fsync: bool = True):
+        """
+        Open (or create) the journal and replay existing records
+
+        Args:
+            path: Journal file path
+            fsync: fsync after every record (disable only for benchmarks)
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fsync = fsync
+
+        self._lock = threading.Lock()
+        self._images: Dict[str, Dict[str, Any]] = {}
+        self.runs = 0
+        self._lines = 0
+
+        self._replay()
+        if self._lines > max(_COMPACT_MIN_LINES, _COMPACT_RATIO * len(self._images)):
+            self.compact()
+
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self.run = self.runs
+
+    def _replay(self):
+        """Rebuild in-memory state from the log"""
+        if not self.path.exists():
+            return
+
+        with open(self.path, 'rb') as f:
+            data = f.read()
+
+        for line in data.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # Torn write from a crash
+            self._lines += 1
+            self._apply(entry)
+
+        # Terminate a torn last line so the next record starts cleanly
+        if data and not data.endswith(b'\n'):
+            with open(self.path, 'ab') as f:
+                f.write(b'\n')
+
+    def _apply(self, entry: Dict[str, Any]):
+        """Fold one record into the in-memory state"""
+        if entry.get("event") == "run":
+            self.runs = max(self.runs, entry.get("run", 0))
+            return
+
+        if entry.get("event") == "snapshot":
+            self._images[entry["image"]] = entry["state"]
+            return
+
+        state = self._images.setdefault(entry["image"], {
+            "state": None,
+            "attempts": 0,
+            "tokens": 0,
+            "runs": [],
+        })
+        state["state"] = entry["state"]
+        state["round"] = entry.get("round")
+        state["attempts"] += entry.get("attempts", 0)
+        state["tokens"] += entry.get("tokens", 0)
+        state["updated"] = entry.get("t")
+        if entry.get("run") not in state["runs"]:
+            state["runs"].append(entry.get("run"))
+
+        for key in ("model", "cached", "cached_tokens", "error", "error_type", "output"):
+            if key in entry:
+                state[key] = entry[key]
+        if entry["state"] == "done":
+            state.pop("error", None)
+            state.pop("error_type", None)
+            if not entry.get("cached"):
+                state.pop("cached_tokens", None)
+
+    def _append(self, entry: Dict[str, Any]):
+        """Write one record durably (caller holds the lock)"""
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._lines += 1
+
+    def start_run(self, images: Iterable[str], **info: Any) -> int:
+        """
+        Mark the start of a (re)started run
+
+        Args:
+            images: Image names planned for this run
+            **info: Extra fields to record (folder, pattern, ...)
+
+        Returns:
+            Run number (1 for the first run in this output folder)
+        """
+        with self._lock:
+            self.runs += 1
+            self.run = self.runs
+            self._append({
+                "event": "run",
+                "run": self.run,
+                "t": time.time(),
+                "images": len(list(images)),
+                **info,
+            })
+            return self.run
+
+    def record(self, image: str, state: str, **fields: Any):
+        """
+        Append a state transition for one image
+
+        Args:
+            image: Image name (file name, not full path)
+            state: One of STATES
+            **fields: round, attempts, tokens, model, cached, cached_tokens, error,
+                error_type, output (tokens = spent by this attempt; a cache hit
+                records 0 and keeps the cached result's own count in cached_tokens)
+        """
+        if state not in self.STATES:
+            raise ValueError(f"state must be one of: {', '.join(self.STATES)}")
+
+        entry = {"t": time.time(), "run": self.run, "image": image, "state": state}
+        entry.update({key: value for key, value in fields.items() if value is not None})
+
+        with self._lock:
+            self._append(entry)
+            self._apply(entry)
+
+    def state(self, image: str) -> Optional[Dict[str, Any]]:
+        """
+        Current state of one image
+
+        Args:
+            image: Image name
+
+        Returns:
+            State dict, or None if the image was never recorded
+        """
+        with self._lock:
+            state = self._images.get(image)
+            return dict(state) if state else None
+
+    def is_done(self, image: str) -> bool:
+        """True if the image finished successfully in any run"""
+        with self._lock:
+            state = self._images.get(image)
+            return bool(state) and state["state"] == "done"
+
+    def summary(self, images: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Totals across all runs
+
+        Args:
+            images: Restrict to these image names (default: all recorded)
+
+        Returns:
+            Dict with runs, done, failed, pending, attempts, tokens
+        """
+        with self._lock:
+            names = list(images) if images is not None else list(self._images)
+            states = [self._images.get(name) for name in names]
+
+        return {
+            "runs": self.runs,
+            "images": len(names),
+            "done": sum(1 for s in states if s and s["state"] == "done"),
+            "failed": sum(1 for s in states if s and s["state"] == "failed"),
+            "pending": sum(1 for s in states if not s or s["state"] == "retry"),
+            "attempts": sum(s["attempts"] for s in states if s),
+            "tokens": sum(s["tokens"] for s in states if s),
+        }
+
+    def results(self, images: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Final result of every finished image, in the format of extraction results
+
+        A result served from the cache reports the tokens of the cached result
+        (what the cache saved), like the live result did.
+
+        Args:
+            images: Restrict to these image names (default: all recorded)
+
+        Returns:
+            List of {success, image_path, model, attempts, usage, cached, error, error_type}
+        """
+        with self._lock:
+            names = list(images) if images is not None else list(self._images)
+            states = [(name, self._images.get(name)) for name in names]
+
+        results = []
+        for name, state in states:
+            if not state or state["state"] not in ("done", "failed"):
+                continue
+            result = {
+                "success": state["state"] == "done",
+                "image_path": name,
+                "model": state.get("model"),
+                "attempts": state["attempts"],
+                "usage": {"total_tokens": state.get("cached_tokens", 0) if state.get("cached") else state["tokens"]},
+                "cached": state.get("cached", False),
+            }
+            if not result["success"]:
+                result["error"] = state.get("error", "unknown error")
+                result["error_type"] = state.get("error_type", "")
+            results.append(result)
+        return results
+
+    def compact(self):
+        """Rewrite the log as one snapshot line per image (atomic replace)"""
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with self._lock:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({"event": "run", "run": self.runs, "t": time.time(), "compacted": True}) + "\n")
+                for image, state in self._images.items():
+                    f.write(json.dumps({"event": "snapshot", "image": image, "state": state}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self._lines = len(self._images) + 1
+
+            reopen = getattr(self, "_file", None)
+            if reopen is not None:
+                reopen.close()
+                self._file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        """Close the journal file"""
+        with self._lock:
+            self._file.close()
+
+
+def result_fields(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Journal fields of one extraction result
+
+    Args:
+        result: Result dict of ExtractionEngine.extract_text_from_image
+
+    Returns:
+        attempts, tokens, model, cached and cached_tokens for record()
+    """
+    cached = bool(result.get("cached"))
+    tokens = (result.get("usage") or {}).get("total_tokens", 0)
+    return {
+        "attempts": result.get("attempts", 0),
+        "tokens": 0 if cached else tokens,
+        "model": result.get("model"),
+        "cached": cached,
+        "cached_tokens": tokens if cached else None,
+    }
+
+
+def format_journal_summary(summary: Dict[str, Any]) -> str:
+    """
+    One-line human readable journal summary
+
+    Args:
+        summary: Output of JobJournal.summary()
+
+    Returns:
+        Formatted string
+    """
+    return (
+        f"{summary['done']}/{summary['images']} done, {summary['failed']} failed, "
+        f"{summary['pending']} pending after {summary['runs']} run(s); "
+        f"{summary['attempts']} API attempts, {summary['tokens']:,} tokens in total"
+    )
@@ -0,0 +1,757 @@
+"""
+Priority / deadline scheduler for extraction jobs across several folders
+
+One CLI run used to handle one folder from start to end, so an urgent exam
+queued behind a 1,000-image archive waited for all of it. Here every folder
+is a job with a priority and an optional deadline, and all jobs share one
+ExtractionEngine (one connection pool, adaptive rate limiter, circuit
+breaker and cache) and one pool of worker threads. Whenever a worker is
+free it asks the scheduler for the next image:
+
+1. A job that would miss its deadline at its fair share of the workers
+   (remaining images x seconds per image / its share) is "at risk"; at-risk
+   jobs go first, earliest deadline first.
+2. Otherwise images are handed out in proportion to priority (stride
+   scheduling): a priority-3 job gets three images for every one of a
+   priority-1 job, and no job starves.
+
+Each job writes the same `_extracted.txt` files and resumable journal as
+extract_images.py into its own output folder, and reports progress,
+throughput and ETA while the run goes on.
+
+Features:
+- Any number of jobs, added before or during a run
+- One global concurrency and rate budget for all jobs
+- Deadline-at-risk jobs first (EDF), priority-weighted sharing otherwise
+- Per-job progress, images/min and ETA (periodic lines + final table)
+- Per-job journal: a restarted run skips finished images
+
+Usage:
+    python job_scheduler.py --backend mock \\
+        --job exams/archive \\
+        --job exams/midterm,priority=5,deadline=30m
+"""
+
+import argparse
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple, Union
+
+from extract_images import EXTRACTION_PROMPT, natural_sort_key, save_extracted_text
+from extraction_engine import BACKENDS, DEFAULT_TIMEOUT, ExtractionEngine, create_backend
+from folder_scan import scan_files, unique_stems
+from http_transport import create_transport
+from job_journal import JOURNAL_FILE, JobJournal, result_fields
+from pdf_pages import DEFAULT_DPI, expand_pdfs
+from request_metrics import MetricsRecorder, format_metrics_summary
+from result_cache import DEFAULT_CACHE_FILE, ResultCache
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif', '.pdf')
+
+# Seconds per image assumed until the first images finish
+DEFAULT_IMAGE_SECONDS = 5.0
+
+# Weight of the newest image in the seconds-per-image moving average
+_EMA_WEIGHT = 0.2
+
+_STRIDE = 1.0
+
+
+class ExtractionJob:
+    """
+    One folder to extract, with its priority, deadline and progress
+
+    Usage:
+        job = ExtractionJob("exams/midterm", priority=5, deadline=time.time() + 1800)
+    """
+
+    def __init__(
+        self,
+        input_folder: Union[str, Path],
+        output_folder: Optional[Union[str, Path]] = None,
+        name: Optional[str] = None,
+        priority: int = 1,
+        deadline: Optional[float] = None,
+        recursive: bool = False,
+        output_root: Optional[Union[str, Path]] = None
+    ):
+        """
+        Initialize the job
+
+        Args:
+            input_folder: Folder with the images (and PDFs)
+            output_folder: Where the texts go (default: <output_root>/<name>, or
+                <input_folder>/extracted_texts without output_root)
+            name: Name in progress reports (default: folder name)
+            priority: Share of the workers relative to other jobs (>= 1)
+            deadline: Epoch seconds the job should be finished by (None = no deadline)
+            recursive: Also extract images in subfolders
+            output_root: Parent of the default output folder; the folder follows
+                the name the scheduler gives the job (made unique on submit)
+        """
+        self.input_folder = Path(input_folder)
+        self.name = name or self.input_folder.name
+        self.output_root = Path(output_root) if output_root and not output_folder else None
+        if output_folder:
+            self.output_folder = Path(output_folder)
+        elif self.output_root is not None:
+            self.output_folder = self.output_root / self.name
+        else:
+            self.output_folder = self.input_folder / "extracted_texts"
+        self.priority = max(1, int(priority))
+        self.deadline = deadline
+        self.recursive = recursive
+
+        self.pending: Deque[Path] = deque()
+        self.total = 0
+        self.skipped = 0
+        self.done = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.journal: Optional[JobJournal] = None
+
+        # Stride scheduling position (lowest goes next)
+        self.pass_value = 0.0
+
+    @property
+    def remaining(self) -> int:
+        """Images not finished yet (queued or being extracted)"""
+        return len(self.pending) + self.in_flight
+
+    def discover(self, image_extensions=IMAGE_EXTENSIONS, resume: bool = True):
+        """
+        List the images of the folder (natural order) and skip finished ones
+
+        Args:
+            image_extensions: Accepted extensions (.pdf files become pages)
+            resume: Use the output folder's journal
+        """
+        found = scan_files(self.input_folder, image_extensions, recursive=self.recursive)
+        if self.recursive:
+            found = unique_stems(found)
+        images = expand_pdfs(sorted(found, key=natural_sort_key))
+
+        if resume:
+            self.output_folder.mkdir(parents=True, exist_ok=True)
+            self.journal = JobJournal(self.output_folder / JOURNAL_FILE)
+            pending = [image for image in images if not self.journal.is_done(image.name)]
+            self.skipped = len(images) - len(pending)
+            images = pending
+            self.journal.start_run([image.name for image in images], folder=str(self.input_folder), job=self.name)
+
+        self.pending = deque(images)
+        self.total = len(images)
+
+    def progress(self, now: float, image_seconds: float, share: float) -> Dict[str, Any]:
+        """
+        Progress snapshot
+
+        Args:
+            now: Current time (epoch seconds)
+            image_seconds: Seconds one worker needs per image
+            share: Workers this job gets at its fair share
+
+        Returns:
+            Dict with name, priority, done, failed, skipped, total, in_flight,
+            images_per_minute, eta_seconds, deadline_seconds (left, or left at
+            finish; negative = missed), at_risk, finished
+        """
+        elapsed = ((self.finished_at or now) - self.started_at) if self.started_at else 0.0
+        finished = self.done + self.failed
+        rate = finished / elapsed if elapsed > 0 and finished else 0.0
+
+        if not self.remaining:
+            eta = 0.0
+        elif rate:
+            eta = self.remaining / rate
+        else:
+            eta = self.remaining * image_seconds / max(share, 1e-9)
+
+        # A finished job is judged by when it finished
+        reference = self.finished_at if not self.remaining and self.finished_at else now
+        deadline_left = (self.deadline - reference) if self.deadline is not None else None
+        return {
+            "name": self.name,
+            "priority": self.priority,
+            "done": self.done,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "total": self.total,
+            "in_flight": self.in_flight,
+            "images_per_minute": round(rate * 60, 1),
+            "eta_seconds": round(eta, 1),
+            "deadline_seconds": round(deadline_left, 1) if deadline_left is not None else None,
+            "at_risk": deadline_left is not None and bool(self.remaining) and eta > deadline_left,
+            "finished": not self.remaining,
+        }
+
+
+class JobScheduler:
+    """
+    Share one engine and worker pool between extraction jobs
+
+    Usage:
+        scheduler = JobScheduler(engine, concurrency=8)
+        scheduler.submit(ExtractionJob("exams/archive"))
+        scheduler.submit(ExtractionJob("exams/midterm", priority=5, deadline=time.time() + 1800))
+        scheduler.run(progress_interval=30)
+        print(format_job_table(scheduler.progress()))
+    """
+
+    def __init__(
+        self,
+        engine: ExtractionEngine,
+        concurrency: int = 4,
+        prompt: str = EXTRACTION_PROMPT,
+        max_retries: int = 3,
+        image_extensions=IMAGE_EXTENSIONS,
+        resume: bool = True
+    ):
+        """
+        Initialize the scheduler
+
+        Args:
+            engine: Extraction engine shared by all jobs (its rate limiter is the global budget)
+            concurrency: Worker threads (requests in flight) across all jobs
+            prompt: Extraction prompt
+            max_retries: Attempts per image (engine retry policy)
+            image_extensions: Accepted extensions
+            resume: Keep a journal per job and skip images finished earlier
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+
+        self.engine = engine
+        self.concurrency = concurrency
+        engine.set_concurrency(concurrency)
+        self.prompt = prompt
+        self.max_retries = max_retries
+        self.image_extensions = image_extensions
+        self.resume = resume
+
+        self.jobs: List[ExtractionJob] = []
+        self._cond = threading.Condition()
+        # Jobs being listed in submit(): their names and output folders are taken
+        self._reserved: Set[str] = set()
+        self._reserving: List[ExtractionJob] = []
+        self._workers: List[threading.Thread] = []
+        self._running = False
+        self._image_seconds = DEFAULT_IMAGE_SECONDS
+        self._timed = 0
+
+    def submit(self, job: ExtractionJob) -> ExtractionJob:
+        """
+        Add a job (also while run() is going)
+
+        A name already taken gets a suffix (exams, exams_2, ...), and so does
+        an output folder derived from it under output_root.
+
+        Args:
+            job: Job to add; its folder is listed here
+
+        Returns:
+            The job
+
+        Raises:
+            ValueError: Another job already writes to the same output folder
+        """
+        with self._cond:
+            names = {other.name for other in self.jobs} | self._reserved
+            base, number = job.name, 2
+            while job.name in names:
+                job.name, number = f"{base}_{number}", number + 1
+            if job.output_root is not None:
+                job.output_folder = job.output_root / job.name
+
+            # Outputs and the journal are per folder: two jobs must not share one
+            target = os.path.normcase(os.path.abspath(job.output_folder))
+            for other in list(self.jobs) + list(self._reserving):
+                if os.path.normcase(os.path.abspath(other.output_folder)) == target:
+                    raise ValueError(f"Job {job.name}: output folder {job.output_folder} is already used by job {other.name}")
+            self._reserved.add(job.name)
+            self._reserving.append(job)
+
+        try:
+            job.discover(self.image_extensions, self.resume)
+        finally:
+            with self._cond:
+                self._reserved.discard(job.name)
+                self._reserving.remove(job)
+
+        with self._cond:
+            # Start level with the active jobs instead of owing them a burst
+            active = [other.pass_value for other in self.jobs if other.remaining]
+            job.pass_value = min(active) if active else 0.0
+            self.jobs.append(job)
+            if not job.remaining:
+                job.finished_at = time.time()
+            self._cond.notify_all()
+            if self._running:
+                self._spawn_workers()
+        return job
+
+    def _share(self, job: ExtractionJob, runnable: List[ExtractionJob]) -> float:
+        """Workers a job gets at its fair (priority-weighted) share"""
+        total_weight = sum(other.priority for other in runnable) or job.priority
+        return self.concurrency * job.priority / total_weight
+
+    def _pick(self, now: float) -> Optional[Tuple[ExtractionJob, Path]]:
+        """Next image to extract (caller holds the lock)"""
+        runnable = [job for job in self.jobs if job.pending]
+        if not runnable:
+            return None
+
+        at_risk = [
+            job for job in runnable
+            if job.deadline is not None
+            and now + job.remaining * self._image_seconds / self._share(job, runnable) > job.deadline
+        ]
+        if at_risk:
+            job = min(at_risk, key=lambda candidate: candidate.deadline)
+        else:
+            job = min(runnable, key=lambda candidate: (candidate.pass_value, -candidate.priority))
+
+        job.pass_value += _STRIDE / job.priority
+        job.in_flight += 1
+        if job.started_at is None:
+            job.started_at = now
+        return job, job.pending.popleft()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                picked = self._pick(time.time())
+            if picked is None:
+                return
+            job, image = picked
+
+            start = time.perf_counter()
+            try:
+                success = self._extract(job, image)
+            except Exception as e:  # One broken image must not stop the worker
+                print(f"  ❌ [{job.name}] {image.name}: {e}")
+                success = False
+            seconds = time.perf_counter() - start
+
+            with self._cond:
+                job.in_flight -= 1
+                if success:
+                    job.done += 1
+                else:
+                    job.failed += 1
+                if not job.remaining:
+                    job.finished_at = time.time()
+                    print(f"🏁 [{job.name}] finished: {job.done} done, {job.failed} failed")
+                self._timed += 1
+                weight = max(_EMA_WEIGHT, 1 / self._timed)
+                self._image_seconds += weight * (seconds - self._image_seconds)
+
+    def _extract(self, job: ExtractionJob, image: Path) -> bool:
+        """Extract one image and write its output; True on success"""
+        result = self.engine.extract_text_from_image(
+            str(image),
+            prompt=self.prompt,
+            retry_with_other_models=True,
+            max_retries=self.max_retries
+        )
+        if not result["success"]:
+            print(f"  ❌ [{job.name}] {image.name}: {result['error']}")
+            if job.journal is not None:
+                job.journal.record(
+                    image.name, "failed",
+                    attempts=result.get("attempts", 0),
+                    error=result["error"],
+                    error_type=result.get("error_type")
+                )
+            return False
+
+        output_filename = f"{image.stem}_extracted.txt"
+        save_extracted_text(
+            result["extracted_text"],
+            job.output_folder / output_filename,
+            {
+                "Image": image.name,
+                "Model": result.get("model"),
+                "Timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+            }
+        )
+        if job.journal is not None:
+            job.journal.record(image.name, "done", output=output_filename, **result_fields(result))
+        return True
+
+    def _spawn_workers(self):
+        """Start workers up to the concurrency (caller holds the lock)"""
+        self._workers = [worker for worker in self._workers if worker.is_alive()]
+        pending = sum(len(job.pending) for job in self.jobs)
+        for _ in range(min(self.concurrency - len(self._workers), pending)):
+            worker = threading.Thread(target=self._worker, daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def run(self, progress_interval: float = 30.0):
+        """
+        Extract until every submitted job is finished
+
+        Args:
+            progress_interval: Seconds between progress lines (0 = none)
+        """
+        with self._cond:
+            self._running = True
+            self._spawn_workers()
+
+        next_report = time.monotonic() + progress_interval
+        while True:
+            with self._cond:
+                self._spawn_workers()  # Picks up jobs submitted after the workers drained
+                if not self._workers:
+                    self._running = False
+                    break
+                worker = self._workers[0]
+            worker.join(timeout=0.5)
+            if progress_interval > 0 and time.monotonic() >= next_report:
+                next_report = time.monotonic() + progress_interval
+                for snapshot in self.progress():
+                    if not snapshot["finished"]:
+                        print(f"⏱️  {format_job_progress(snapshot)}")
+
+        for job in self.jobs:
+            if job.journal is not None:
+                job.journal.close()
+                job.journal = None
+
+    def progress(self) -> List[Dict[str, Any]]:
+        """
+        Progress of every job
+
+        Returns:
+            List of ExtractionJob.progress() snapshots, in submission order
+        """
+        with self._cond:
+            now = time.time()
+            runnable = [job for job in self.jobs if job.remaining] or self.jobs
+            return [
+                job.progress(now, self._image_seconds, self._share(job, runnable))
+                for job in self.jobs
+            ]
+
+
+def parse_deadline(value: str, now: Optional[float] = None) -> float:
+    """
+    Deadline as epoch seconds
+
+    Args:
+        value: Duration from now ("90s", "30m", "2h", "1h30m") or a time of
+            day ("17:30", today or tomorrow if already past)
+        now: Reference time (default: time.time())
+
+    Returns:
+        Epoch seconds
+
+    Raises:
+        ValueError: Unknown format
+    """
+    now = time.time() if now is None else now
+    value = value.strip().lower()
+
+    match = re.fullmatch(r'(\d{1,2}):(\d{2})', value)
+    if match:
+        reference = datetime.fromtimestamp(now)
+        target = reference.replace(hour=int(match.group(1)), minute=int(match.group(2)), second=0, microsecond=0)
+        if target.timestamp() <= now:
+            target += timedelta(days=1)
+        return target.timestamp()
+
+    parts = re.findall(r'(\d+(?:\.\d+)?)([hms])', value)
+    if not parts or "".join(number + unit for number, unit in parts) != value:
+        raise ValueError(f"Invalid deadline: {value!r} (use e.g. 90s, 30m, 1h30m or 17:30)")
+    seconds = sum(float(number) * {'h': 3600, 'm': 60, 's': 1}[unit] for number, unit in parts)
+    return now + seconds
+
+
+def parse_job_spec(spec: str, output_root: Optional[Union[str, Path]] = None, recursive: bool = False) -> ExtractionJob:
+    """
+    Job from a command-line spec
+
+    Args:
+        spec: "FOLDER[,priority=N][,deadline=30m|17:30][,name=NAME][,output=DIR]"
+        output_root: Default output is <output_root>/<name> (None = <FOLDER>/extracted_texts)
+        recursive: Also extract images in subfolders
+
+    Returns:
+        ExtractionJob
+
+    Raises:
+        ValueError: Unknown key or bad value
+    """
+    folder, *options = [part.strip() for part in spec.split(',')]
+    fields: Dict[str, str] = {}
+    for option in options:
+        key, separator, value = option.partition('=')
+        if not separator or key not in ('priority', 'deadline', 'name', 'output'):
+            raise ValueError(f"Invalid job option {option!r} (use priority=, deadline=, name=, output=)")
+        fields[key] = value
+
+    return ExtractionJob(
+        folder,
+        output_folder=fields.get("output"),
+        output_root=output_root,
+        name=fields.get("name"),
+        priority=int(fields.get("priority", 1)),
+        deadline=parse_deadline(fields["deadline"]) if "deadline" in fields else None,
+        recursive=recursive
+    )
+
+
+def _format_seconds(seconds: float) -> str:
+    seconds = int(round(abs(seconds)))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def format_job_progress(snapshot: Dict[str, Any]) -> str:
+    """
+    One-line progress of a job
+
+    Args:
+        snapshot: Output of ExtractionJob.progress()
+
+    Returns:
+        Formatted text
+    """
+    text = (
+        f"[{snapshot['name']}] p{snapshot['priority']} "
+        f"{snapshot['done'] + snapshot['failed']}/{snapshot['total']} "
+        f"({snapshot['failed']} failed, {snapshot['in_flight']} in flight), "
+        f"{snapshot['images_per_minute']} images/min, ETA {_format_seconds(snapshot['eta_seconds'])}"
+    )
+    if snapshot["deadline_seconds"] is not None:
+        left = snapshot["deadline_seconds"]
+        if left < 0:
+            text += f", deadline missed by {_format_seconds(left)}"
+        else:
+            text += f", deadline in {_format_seconds(left)}{' - AT RISK' if snapshot['at_risk'] else ''}"
+    return text
+
+
+def format_job_table(snapshots: List[Dict[str, Any]]) -> str:
+    """
+    Per-job summary table
+
+    Args:
+        snapshots: Output of JobScheduler.progress()
+
+    Returns:
+        Formatted table
+    """
+    lines = [
+        f"{'Job':<24} {'Prio':>4} {'Done':>6} {'Failed':>6} {'Skipped':>7} {'Img/min':>8}  Deadline",
+        "-" * 80,
+    ]
+    for snapshot in snapshots:
+        deadline = "-"
+        if snapshot["deadline_seconds"] is not None:
+            left = snapshot["deadline_seconds"]
+            if snapshot["finished"]:
+                deadline = "met" if left >= 0 else f"missed by {_format_seconds(left)}"
+            else:
+                deadline = f"in {_format_seconds(left)}" if left >= 0 else f"missed by {_format_seconds(left)}"
+        lines.append(
+            f"{snapshot['name'][:24]:<24} {snapshot['priority']:>4} {snapshot['done']:>6} "
+            f"{snapshot['failed']:>6} {snapshot['skipped']:>7} {snapshot['images_per_minute']:>8}  {deadline}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Extract several exam folders at once, sharing workers by priority and deadline",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Archive in the background, urgent exam due in 30 minutes
+  python job_scheduler.py --api-key sk-or-xxx \\
+    --job exams/archive \\
+    --job exams/midterm,priority=5,deadline=30m
+
+  # Fixed output folders and a time-of-day deadline
+  python job_scheduler.py --api-key sk-or-xxx --concurrency 8 \\
+    --output-root extracted \\
+    --job scans/de1,deadline=17:30 \\
+    --job scans/de2,priority=2
+
+  # Offline run against the mock server
+  python job_scheduler.py --backend mock --job images --job images2,priority=3
+        """
+    )
+
+    parser.add_argument(
+        '--job',
+        action='append',
+        required=True,
+        metavar='FOLDER[,priority=N][,deadline=30m|17:30][,name=NAME][,output=DIR]',
+        help='Folder to extract; repeat for more jobs. Higher priority = larger share of the '
+             'workers; a job that would miss its deadline goes first'
+    )
+
+    parser.add_argument(
+        '--output-root',
+        default=None,
+        help='Write each job to <output-root>/<job name>; repeated names get _2, _3, ... (default: <folder>/extracted_texts)'
+    )
+
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=4,
+        help='Requests in flight across all jobs (default: 4)'
+    )
+
+    parser.add_argument(
+        '--backend',
+        choices=list(BACKENDS),
+        default='openrouter',
+        help='Where requests go: OpenRouter, an in-process mock server, or the gemini CLI '
+             '(default: openrouter)'
+    )
+
+    parser.add_argument(
+        '--api-key',
+        default=None,
+        help='OpenRouter API key (can also use OPENROUTER_API_KEY environment variable)'
+    )
+
+    parser.add_argument(
+        '--api-url',
+        default=None,
+        help='Chat completions endpoint (default: OpenRouter)'
+    )
+
+    parser.add_argument(
+        '--models',
+        default=None,
+        help='Comma-separated vision models in preference order (default: the backend\'s default model)'
+    )
+
+    parser.add_argument(
+        '--max-retries',
+        type=int,
+        default=3,
+        help='Maximum retry attempts per image (default: 3)'
+    )
+
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help=f'Request timeout in seconds (default: {DEFAULT_TIMEOUT})'
+    )
+
+    parser.add_argument(
+        '--recursive',
+        action='store_true',
+        help='Also extract images in subfolders of each job folder'
+    )
+
+    parser.add_argument(
+        '--pdf-dpi',
+        type=int,
+        default=DEFAULT_DPI,
+        help=f'Resolution PDF pages are rendered at (requires PyMuPDF; default: {DEFAULT_DPI})'
+    )
+
+    parser.add_argument(
+        '--progress-interval',
+        type=float,
+        default=30,
+        help='Seconds between progress lines (default: 30; 0 = only the final table)'
+    )
+
+    parser.add_argument(
+        '--cache-file',
+        default=str(DEFAULT_CACHE_FILE),
+        help=f'SQLite result cache shared across runs (default: {DEFAULT_CACHE_FILE})'
+    )
+
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Disable the result cache'
+    )
+
+    parser.add_argument(
+        '--no-resume',
+        action='store_true',
+        help='Do not read or write the job journals (.journal.jsonl in each output folder)'
+    )
+
+    args = parser.parse_args()
+
+    try:
+        jobs = [parse_job_spec(spec, args.output_root, args.recursive) for spec in args.job]
+        engine = ExtractionEngine(
+            create_backend(
+                args.backend,
+                api_key=args.api_key or os.getenv('OPENROUTER_API_KEY'),
+                api_url=args.api_url,
+                transport=create_transport(pool_size=max(10, args.concurrency)),
+                timeout=args.timeout
+            ),
+            cache=None if args.no_cache else ResultCache(args.cache_file),
+            metrics=MetricsRecorder(),
+            models=[name.strip() for name in (args.models or "").split(',') if name.strip()] or None,
+            pdf_dpi=args.pdf_dpi
+        )
+    except (ValueError, ImportError) as e:
+        print(f"❌ Error: {e}")
+        return
+
+    scheduler = JobScheduler(
+        engine,
+        concurrency=args.concurrency,
+        max_retries=args.max_retries,
+        resume=not args.no_resume
+    )
+    for job in jobs:
+        try:
+            scheduler.submit(job)
+        except OSError as e:
+            print(f"❌ Error: cannot list {job.input_folder}: {e}")
+            continue
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            continue
+        deadline = (
+            f", deadline {datetime.fromtimestamp(job.deadline):%H:%M:%S}" if job.deadline is not None else ""
+        )
+        skipped = f" ({job.skipped} finished earlier)" if job.skipped else ""
+        print(f"📁 [{job.name}] {job.total} images{skipped}, priority {job.priority}{deadline} -> {job.output_folder}")
+
+    print(f"\nBackend: {args.backend}, model: {engine.model}, concurrency {args.concurrency}")
+    print("=" * 80)
+
+    start = time.perf_counter()
+    scheduler.run(progress_interval=args.progress_interval)
+
+    print("\n" + "=" * 80)
+    print(f" JOB SUMMARY ({time.perf_counter() - start:.1f}s)")
+    print("=" * 80)
+    print(format_job_table(scheduler.progress()))
+    print()
+    for line in format_metrics_summary(engine.metrics.summary()).splitlines():
+        print(f" {line}")
+    engine.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Manifest of the sources behind a joined question file
+
+Rejoining a large question bank used to re-read and re-parse every
+`_extracted.txt` file even when only one of them changed. The manifest
+remembers, for each source, its size, mtime, content hash and the byte
+range of its section in the joined file, plus a fingerprint of the joined
+file itself. An incremental join stats the sources, re-reads only those
+whose size/mtime moved, and copies every other section straight from the
+previous joined file.
+
+Features:
+- Per-source size, mtime_ns, sha256 and (offset, length) in the joined file
+- Touched-but-identical files detected by hash (section reused)
+- Options fingerprint: changing separators/metadata forces a full rebuild
+- Joined-file fingerprint: an edited or missing output forces a full rebuild
+- Atomic save (temp file + os.replace)
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+MANIFEST_VERSION = 1
+
+
+def manifest_path_for(output_file: Union[str, Path]) -> Path:
+    """
+    Manifest location for a joined file (hidden, next to it)
+
+    Args:
+        output_file: Joined output file
+
+    Returns:
+        Path of `.<name>.manifest.json`
+    """
+    output_file = Path(output_file)
+    return output_file.with_name(f".{output_file.name}.manifest.json")
+
+
+def hash_bytes(data: bytes) -> str:
+    """sha256 hex digest of a source file's raw bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class JoinManifest:
+    """
+    Source -> section bookkeeping for one joined file
+
+    Usage:
+        manifest = JoinManifest.load(manifest_path_for(output_file), options)
+        entry = manifest.lookup(name, stat) if manifest.usable(output_file) else None
+        ...
+        manifest.save(output_file)
+    """
+
+    def __init__(self, path: Union[str, Path], options: Dict[str, Any]):
+        """
+        Create an empty manifest
+
+        Args:
+            path: Manifest file path
+            options: Join options that shape the sections (separator, metadata, ...)
+        """
+        self.path = Path(path)
+        self.options = dict(options)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.output: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def load(cls, path: Union[str, Path], options: Dict[str, Any]) -> 'JoinManifest':
+        """
+        Read a manifest; unreadable, outdated or differently-configured
+        manifests load as empty (full rebuild)
+
+        Args:
+            path: Manifest file path
+            options: Options of the current join
+
+        Returns:
+            JoinManifest
+        """
+        manifest = cls(path, options)
+        try:
+            with open(manifest.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return manifest
+
+        if data.get("version") != MANIFEST_VERSION or data.get("options") != manifest.options:
+            return manifest
+
+        manifest.entries = data.get("entries") or {}
+        manifest.output = data.get("output")
+        return manifest
+
+    def usable(self, output_file: Union[str, Path]) -> bool:
+        """
+        Whether the previous joined file can still be copied from
+
+        Args:
+            output_file: Joined output file
+
+        Returns:
+            True if it exists and has the size/mtime recorded at save time
+        """
+        if not self.entries or not self.output:
+            return False
+        try:
+            stat = os.stat(output_file)
+        except OSError:
+            return False
+        return stat.st_size == self.output["size"] and stat.st_mtime_ns == self.output["mtime_ns"]
+
+    def lookup(self, name: str, stat: os.stat_result) -> Optional[Dict[str, Any]]:
+        """
+        Entry of a source whose size and mtime are unchanged
+
+        Args:
+            name: Source file name
+            stat: Current os.stat() of the source
+
+        Returns:
+            Manifest entry, or None if the file must be re-read
+        """
+        entry = self.entries.get(name)
+        if entry is None:
+            return None
+        if entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            return None
+        return entry
+
+    def save(self, output_file: Union[str, Path]):
+        """
+        Write the manifest atomically, fingerprinting the joined file
+
+        Args:
+            output_file: Joined output file just written
+        """
+        stat = os.stat(output_file)
+        self.output = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+        data = {
+            "version": MANIFEST_VERSION,
+            "options": self.options,
+            "output": self.output,
+            "entries": self.entries,
+        }
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -9,12 +9,34 @@ Features:
 - Configurable separators
 - Metadata removal options
 - Multiple output modes
+- Parallel file reading
+- Incremental rejoin: only changed files are re-read (see join_manifest.py)
+- Single pass for several outputs (joined text, clean files, JSON, Markdown)
+- Header stripped by offset (str.find / mmap), body copied without re-encoding
+- Optional question index (SQLite/FTS5, see question_store.py) from the same scan
+- Optional near-duplicate removal (MinHash/LSH, see question_dedup.py) with a dedup map
 """
 
 import argparse
+import json
+import mmap
+import os
 import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from join_manifest import JoinManifest, hash_bytes, manifest_path_for
+from question_dedup import DEFAULT_THRESHOLD, DedupMap, NearDuplicateIndex, format_dedup_stats
+from question_store import QuestionStore, QuestionStoreSink, parse_extracted_text
+
+# Bytes copied per read when reusing sections of the previous joined file
+COPY_CHUNK = 1024 * 1024
+
+# Files read ahead of the sinks, per reader thread
+READ_AHEAD = 4
 
 
 def natural_sort_key(filename):
@@ -31,10 +53,107 @@ def natural_sort_key(filename):
     return [int(part) if part.isdigit() else part for part in parts]
 
 
+def text_content_span(buffer, include_metadata: bool = False) -> Tuple[int, int]:
+    """
+    Locate the main text without copying it
+
+    Same result as extract_text_content, as offsets: the header ends at the
+    end of the second line containing 40 '=' and the rest is stripped.
+    Works on str, bytes, bytearray and mmap (offsets are then byte offsets).
+
+    Args:
+        buffer: File content (str, or UTF-8 bytes without '\r')
+        include_metadata: If True, keep metadata header (whole buffer)
+
+    Returns:
+        (start, end) of the text in buffer
+    """
+    if include_metadata:
+        return 0, len(buffer)
+
+    is_text = isinstance(buffer, str)
+    separator, newline = ('=' * 40, '\n') if is_text else (b'=' * 40, b'\n')
+
+    # Remove metadata header (between first two === lines)
+    first = buffer.find(separator)
+    if first != -1:
+        first_end = buffer.find(newline, first)
+        second = buffer.find(separator, first_end + 1) if first_end != -1 else -1
+        if second != -1:
+            second_end = buffer.find(newline, second)
+            if second_end == -1:
+                return 0, 0
+            return _strip_span(buffer, second_end + 1, len(buffer), is_text)
+
+    return _strip_span(buffer, 0, len(buffer), is_text)
+
+
+# Whitespace str.strip() removes that is a single UTF-8 byte
+_ASCII_SPACE = frozenset(b' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f')
+
+
+def _strip_span(buffer, start: int, end: int, is_text: bool) -> Tuple[int, int]:
+    """Offsets of buffer[start:end].strip(), for str or UTF-8 bytes"""
+    if is_text:
+        while start < end and buffer[start].isspace():
+            start += 1
+        while end > start and buffer[end - 1].isspace():
+            end -= 1
+        return start, end
+
+    while start < end:
+        step = 1 if buffer[start] in _ASCII_SPACE else _utf8_space(buffer, start, 1)
+        if not step:
+            break
+        start += step
+    while end > start:
+        step = 1 if buffer[end - 1] in _ASCII_SPACE else _utf8_space(buffer, end, -1)
+        if not step:
+            break
+        end -= step
+    return start, end
+
+
+def _utf8_space(buffer, offset: int, direction: int) -> int:
+    """Byte length of a non-ASCII whitespace character starting (1) or ending (-1) at offset, else 0"""
+    edge = buffer[offset] if direction > 0 else buffer[offset - 1]
+    if edge < 0x80:
+        return 0
+    for length in (2, 3):
+        chunk = buffer[offset:offset + length] if direction > 0 else buffer[max(0, offset - length):offset]
+        try:
+            if len(chunk) == length and bytes(chunk).decode('utf-8').isspace():
+                return length
+        except UnicodeDecodeError:
+            continue
+    return 0
+
+
 def extract_text_content(content: str, include_metadata: bool = False) -> str:
     """
     Extract main text content, optionally removing metadata header
 
+    The header is located with str.find and the text sliced once (no line
+    splitting).
+
+    Args:
+        content: File content
+        include_metadata: If True, keep metadata header
+
+    Returns:
+        Extracted content
+    """
+    if include_metadata:
+        return content
+
+    start, end = text_content_span(content)
+    return content[start:end]
+
+
+def legacy_extract_text_content(content: str, include_metadata: bool = False) -> str:
+    """
+    Line-splitting version of extract_text_content (kept for bench_join.py)
+
     Args:
         content: File content
         include_metadata: If True, keep metadata header
@@ -45,10 +164,8 @@ def extract_text_content(content: str, include_metadata: bool = False) -> str:
     if include_metadata:
         return content
 
-    # Remove metadata header (between first two === lines)
     lines = content.split('\n')
 
-    # Find metadata boundaries
     separator_indices = []
     for idx, line in enumerate(lines):
         if '=' * 40 in line:
@@ -56,7 +173,6 @@ def extract_text_content(content: str, include_metadata: bool = False) -> str:
             if len(separator_indices) == 2:
                 break
 
-    # If metadata found, skip it
     if len(separator_indices) >= 2:
         text_start = separator_indices[1] + 1
         return '\n'.join(lines[text_start:]).strip()
@@ -64,106 +180,690 @@ def extract_text_content(content: str, include_metadata: bool = False) -> str:
     return content.strip()
 
 
-def join_extracted_files(
-    input_folder: str,
-    output_folder: str,
-    output_filename: str = "all_questions_joined.txt",
+def copy_text_content(file_path: Union[str, Path], out_f, include_metadata: bool = False) -> int:
+    """
+    Stream the main text of an extracted file straight into a binary handle
+
+    The file is memory-mapped and the text written as a memoryview slice,
+    so it is never decoded or copied into Python objects. Files with '\r'
+    line endings go through the decoding path (their newlines must be
+    normalized like text-mode reading does).
+
+    Args:
+        file_path: Extracted text file
+        out_f: Binary file handle to write to
+        include_metadata: If True, copy the whole file
+
+    Returns:
+        Bytes written
+    """
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if mapped.find(b'\r') != -1:
+                data = extract_text_content(_decode(mapped[:]), include_metadata).encode('utf-8')
+                out_f.write(data)
+                return len(data)
+
+            start, end = text_content_span(mapped, include_metadata)
+            with memoryview(mapped) as view:
+                out_f.write(view[start:end])
+            return end - start
+
+
+def question_label(file_path: Path, idx: int) -> str:
+    """
+    Question number shown in the separator of a file's section
+
+    Crops of one page (page_segment.py: `q3_s02`) and pages of a PDF
+    (pdf_pages.py: `q3_p002`) get the page's number followed by their
+    own, e.g. "3.2" or "3.2.1", so every crop keeps its own section and
+    its own Q<n>_clean.txt.
+
+    Args:
+        file_path: Extracted text file
+        idx: 1-based position in the joined file (used when the name has no qN)
+
+    Returns:
+        Question number as text
+    """
+    match = re.search(r'q(\d+)', file_path.name, re.IGNORECASE)
+    if not match:
+        return str(idx)
+    parts = [match.group(1)]
+    rest = file_path.name[match.end():]
+    for marker in (r'_p(\d+)', r'_s(\d+)'):
+        sub = re.search(marker + r'(?=_|\.|$)', rest)
+        if sub:
+            parts.append(str(int(sub.group(1))))
+    return ".".join(parts)
+
+
+def render_section(
+    content: str,
+    question_num: str,
     include_separator: bool = True,
-    include_metadata: bool = False,
-    pattern: str = "*_extracted.txt"
-):
+    include_metadata: bool = False
+) -> str:
     """
-    Join all extracted text files into single document
+    Section of one question in the joined file
+
+    Args:
+        content: Extracted file content
+        question_num: Question number for the separator
+        include_separator: Add the QUESTION separator
+        include_metadata: Keep the metadata header
+
+    Returns:
+        Section text
+    """
+    return section_header(question_num, include_separator) + extract_text_content(content, include_metadata) + "\n\n"
+
+
+def section_header(question_num: str, include_separator: bool = True) -> str:
+    """QUESTION separator written before a section ("" without separators)"""
+    if not include_separator:
+        return ""
+    return "\n" + "=" * 80 + "\n" + f"QUESTION {question_num}\n" + "=" * 80 + "\n\n"
+
+
+def joined_header(total: int, source_folder: str) -> str:
+    """Header block of the joined file"""
+    return (
+        "=" * 80 + "\n"
+        "JOINED EXTRACTED TEXTS - ALL QUESTIONS\n"
+        + "=" * 80 + "\n"
+        f"Total files: {total}\n"
+        f"Source folder: {source_folder}\n"
+        + "=" * 80 + "\n\n"
+    )
+
+
+JOINED_FOOTER = "\n" + "=" * 80 + "\n" + "END OF JOINED FILE\n" + "=" * 80 + "\n"
+
+
+def _read_source(file_path: Path) -> Tuple[Optional[bytes], Optional[os.stat_result], Optional[str]]:
+    """Read one source file: (data, stat, error)"""
+    try:
+        with open(file_path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            return f.read(), stat, None
+    except OSError as e:
+        return None, None, str(e)
+
+
+def _decode(data: bytes) -> str:
+    """Decode like open(..., 'r', encoding='utf-8') would (universal newlines)"""
+    return data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+
+def list_extracted_files(input_folder: str, pattern: str = "*_extracted.txt") -> List[Path]:
+    """
+    Glob and natural-sort the extracted files of a folder
 
     Args:
         input_folder: Folder containing extracted text files
-        output_folder: Folder to save joined file
-        output_filename: Name of output file
-        include_separator: Add separators between questions
-        include_metadata: Keep metadata headers from individual files
         pattern: Glob pattern for matching files
+
+    Returns:
+        Sorted files (empty after printing why when there are none)
     """
     input_path = Path(input_folder)
-    output_path = Path(output_folder)
 
     # Validate input
     if not input_path.exists():
         print(f" Error: Input folder not found: {input_folder}")
-        return
+        return []
 
     # Get all extracted files
     extracted_files = list(input_path.glob(pattern))
 
     if not extracted_files:
         print(f"  No extracted files found in {input_folder}")
-        return
+        return []
 
     # Natural sort
-    extracted_files = sorted(extracted_files, key=natural_sort_key)
+    return sorted(extracted_files, key=natural_sort_key)
+
+
+def _load_record(item: Tuple[int, Path]) -> Dict[str, Any]:
+    """Read and decode one file (runs in a reader thread)"""
+    idx, file_path = item
+    record = {"index": idx, "path": file_path, "label": question_label(file_path, idx)}
+    data, stat, error = _read_source(file_path)
+    if error is None:
+        try:
+            record["content"] = _decode(data)
+        except UnicodeDecodeError as e:
+            error = str(e)
+    if error is not None:
+        record["error"] = error
+        return record
+    record.update(stat=stat, hash=hash_bytes(data), bytes=len(data), data=data)
+    return record
+
+
+def scan_extracted_files(files: List[Path], workers: int = 8) -> Iterator[Dict[str, Any]]:
+    """
+    Read every file once, in parallel, and yield records in file order
+
+    At most a few files per worker are read ahead, so memory stays bounded
+    however large the folder is.
+
+    Args:
+        files: Sorted extracted files
+        workers: Reader threads
+
+    Yields:
+        {"index", "path", "label", "content", "data", "stat", "hash", "bytes"} or
+        {"index", "path", "label", "error"}
+    """
+    workers = max(1, workers)
+    items = iter(enumerate(files, 1))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque(executor.submit(_load_record, item) for item in islice(items, READ_AHEAD * workers))
+        while pending:
+            record = pending.popleft().result()
+            for item in islice(items, 1):
+                pending.append(executor.submit(_load_record, item))
+            yield record
+
+
+def clean_text(record: Dict[str, Any]) -> str:
+    """Content without the metadata header (parsed once per record, shared by sinks)"""
+    if "clean" not in record:
+        record["clean"] = extract_text_content(record["content"], include_metadata=False)
+    return record["clean"]
+
+
+def _discard_tmp(out, tmp_file: Path):
+    """Close and delete the temp file of an aborted sink"""
+    if out is not None:
+        out.close()
+    try:
+        os.remove(tmp_file)
+    except FileNotFoundError:
+        pass
+
+
+class JoinedTextSink:
+    """
+    all_questions_joined.txt: header, one section per question, footer
+
+    Written to a temp file and renamed into place on close; an aborted run
+    removes the temp file and leaves the previous output and manifest alone.
+    With a manifest, the section of every file is recorded for later
+    incremental joins.
+    """
+
+    def __init__(
+        self,
+        output_file: Path,
+        include_separator: bool = True,
+        include_metadata: bool = False,
+        manifest: Optional[JoinManifest] = None
+    ):
+        self.output_file = Path(output_file)
+        self.include_separator = include_separator
+        self.include_metadata = include_metadata
+        self.manifest = manifest
+        self._tmp_file = self.output_file.with_name(self.output_file.name + ".tmp")
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._out = None
+
+    def start(self, files: List[Path], source_folder: str):
+        """Open the output (called once, before the first record)"""
+        self.output_file.parent.mkdir(parents=True, exist_ok=True)
+        self._out = open(self._tmp_file, 'wb')
+        self._out.write(joined_header(len(files), source_folder).encode('utf-8'))
+
+    def add(self, record: Dict[str, Any]):
+        """Write one question"""
+        raw = record["data"]
+        if not self.include_metadata and raw.find(b'\r') == -1:
+            # Body sliced out of the raw bytes: no decode/strip/encode round trip
+            start, end = text_content_span(raw)
+            data = b"".join((
+                section_header(record["label"], self.include_separator).encode('utf-8'),
+                memoryview(raw)[start:end],
+                b"\n\n"
+            ))
+        else:
+            text = record["content"] if self.include_metadata else clean_text(record)
+            section = render_section(text, record["label"], self.include_separator, include_metadata=True)
+            data = section.encode('utf-8')
+
+        self._entries[record["path"].name] = {
+            "label": record["label"],
+            "size": record["stat"].st_size,
+            "mtime_ns": record["stat"].st_mtime_ns,
+            "hash": record["hash"],
+            "offset": self._out.tell(),
+            "length": len(data),
+        }
+        self._out.write(data)
+
+    def close(self):
+        """Finish the output"""
+        self._out.write(JOINED_FOOTER.encode('utf-8'))
+        self._out.close()
+        os.replace(self._tmp_file, self.output_file)
+        if self.manifest is not None:
+            self.manifest.entries = self._entries
+            self.manifest.save(self.output_file)
+
+    def abort(self):
+        """Drop the partial output (the previous file stays in place)"""
+        _discard_tmp(self._out, self._tmp_file)
+
+
+class CleanFilesSink:
+    """One Q<n>_clean.txt per question (no metadata)"""
+
+    def __init__(self, output_folder: Path):
+        self.output_folder = Path(output_folder)
+
+    def start(self, files: List[Path], source_folder: str):
+        """Open the output (called once, before the first record)"""
+        self.output_folder.mkdir(parents=True, exist_ok=True)
+
+    def add(self, record: Dict[str, Any]):
+        """Write one question"""
+        output_file = self.output_folder / f"Q{record['label']}_clean.txt"
+        with open(output_file, 'w', encoding='utf-8') as out_f:
+            out_f.write(clean_text(record))
+        print(f"   Created: {output_file.name}")
+
+    def close(self):
+        """Nothing to finish (one file per question)"""
+
+    def abort(self):
+        """Nothing to undo (finished questions keep their files)"""
+
+
+class JsonSink:
+    """
+    {"source_folder", "total", "questions": [{"question", "file", "text"}, ...]}, streamed
+
+    Written to a temp file and renamed into place on close, like JoinedTextSink.
+    """
+
+    def __init__(self, output_file: Path):
+        self.output_file = Path(output_file)
+        self._tmp_file = self.output_file.with_name(self.output_file.name + ".tmp")
+        self._out = None
+        self._first = True
+
+    def start(self, files: List[Path], source_folder: str):
+        """Open the output (called once, before the first record)"""
+        self.output_file.parent.mkdir(parents=True, exist_ok=True)
+        self._out = open(self._tmp_file, 'w', encoding='utf-8')
+        self._out.write(
+            f'{{"source_folder": {json.dumps(str(source_folder), ensure_ascii=False)}, '
+            f'"total": {len(files)}, "questions": [\n'
+        )
+
+    def add(self, record: Dict[str, Any]):
+        """Write one question"""
+        entry = {"question": record["label"], "file": record["path"].name, "text": clean_text(record)}
+        self._out.write(("" if self._first else ",\n") + json.dumps(entry, ensure_ascii=False))
+        self._first = False
+
+    def close(self):
+        """Finish the output"""
+        self._out.write("\n]}\n")
+        self._out.close()
+        os.replace(self._tmp_file, self.output_file)
+
+    def abort(self):
+        """Drop the partial output (the previous file stays in place)"""
+        _discard_tmp(self._out, self._tmp_file)
+
+
+class MarkdownSink:
+    """
+    One "## Question n" section per question
+
+    Written to a temp file and renamed into place on close, like JoinedTextSink.
+    """
+
+    def __init__(self, output_file: Path):
+        self.output_file = Path(output_file)
+        self._tmp_file = self.output_file.with_name(self.output_file.name + ".tmp")
+        self._out = None
+
+    def start(self, files: List[Path], source_folder: str):
+        """Open the output (called once, before the first record)"""
+        self.output_file.parent.mkdir(parents=True, exist_ok=True)
+        self._out = open(self._tmp_file, 'w', encoding='utf-8')
+        self._out.write(f"# All Questions\n\n{len(files)} questions from `{source_folder}`\n\n")
+
+    def add(self, record: Dict[str, Any]):
+        """Write one question"""
+        self._out.write(f"## Question {record['label']}\n\n{clean_text(record)}\n\n")
+
+    def close(self):
+        """Finish the output"""
+        self._out.close()
+        os.replace(self._tmp_file, self.output_file)
+
+    def abort(self):
+        """Drop the partial output (the previous file stays in place)"""
+        _discard_tmp(self._out, self._tmp_file)
+
+
+def run_pipeline(
+    files: List[Path],
+    sinks: List[Any],
+    source_folder: str,
+    workers: int = 8,
+    records: Optional[Iterable[Dict[str, Any]]] = None
+) -> Dict[str, int]:
+    """
+    Scan the files once and feed every record to every sink
+
+    Args:
+        files: Sorted extracted files (see list_extracted_files)
+        sinks: Objects with start(files, source_folder), add(record), close()
+            (after a complete scan) and abort() (scan interrupted or failed)
+        source_folder: Folder name written into headers
+        workers: Reader threads
+        records: Records of `files` already read by an earlier pass (default:
+            scan the files here)
+
+    Returns:
+        Dict with files, read (files read successfully) and bytes
+    """
+    stats = {"files": len(files), "read": 0, "bytes": 0}
+
+    for sink in sinks:
+        sink.start(files, source_folder)
+    if records is None:
+        records = scan_extracted_files(files, workers)
+    try:
+        for record in records:
+            print(f"[{record['index']}/{len(files)}] Processing: {record['path'].name}")
+            if "error" in record:
+                print(f"    Error reading file: {record['error']}")
+                continue
+
+            stats["read"] += 1
+            stats["bytes"] += record["bytes"]
+            for sink in sinks:
+                try:
+                    sink.add(record)
+                except Exception as e:
+                    print(f"    Error: {str(e)}")
+    except BaseException:
+        # Ctrl+C or a failed scan: nothing partial replaces a complete output
+        for sink in sinks:
+            sink.abort()
+        raise
+
+    for sink in sinks:
+        sink.close()
+
+    return stats
+
+
+def join_extracted_files(
+    input_folder: str,
+    output_folder: str,
+    output_filename: str = "all_questions_joined.txt",
+    include_separator: bool = True,
+    include_metadata: bool = False,
+    pattern: str = "*_extracted.txt",
+    incremental: bool = False,
+    workers: int = 8
+):
+    """
+    Join all extracted text files into single document
+
+    Args:
+        input_folder: Folder containing extracted text files
+        output_folder: Folder to save joined file
+        output_filename: Name of output file
+        include_separator: Add separators between questions
+        include_metadata: Keep metadata headers from individual files
+        pattern: Glob pattern for matching files
+        incremental: Keep a manifest next to the output and, on later runs,
+            re-read only files whose size/mtime changed; other sections are
+            copied from the previous joined file
+        workers: Threads reading source files
+    """
+    extracted_files = list_extracted_files(input_folder, pattern)
+    if not extracted_files:
+        return
 
     print(f"\n Found {len(extracted_files)} extracted files")
     print(f" Output: {output_folder}/{output_filename}")
     print("=" * 80)
 
-    # Create output folder
-    output_path.mkdir(parents=True, exist_ok=True)
+    output_file = Path(output_folder) / output_filename
 
-    # Create joined file
-    output_file = output_path / output_filename
+    manifest = _load_manifest(output_file, input_folder, include_separator, include_metadata) if incremental else None
+    if manifest is not None and manifest.usable(output_file):
+        _join_incremental(
+            extracted_files, output_file, manifest, input_folder,
+            include_separator, include_metadata, workers
+        )
+    else:
+        if manifest is not None:
+            print(" No usable manifest, rebuilding the whole file")
+        run_pipeline(
+            extracted_files,
+            [JoinedTextSink(output_file, include_separator, include_metadata, manifest)],
+            input_folder,
+            workers
+        )
 
-    with open(output_file, 'w', encoding='utf-8') as out_f:
-        # Write header
-        out_f.write("=" * 80 + "\n")
-        out_f.write("JOINED EXTRACTED TEXTS - ALL QUESTIONS\n")
-        out_f.write("=" * 80 + "\n")
-        out_f.write(f"Total files: {len(extracted_files)}\n")
-        out_f.write(f"Source folder: {input_folder}\n")
-        out_f.write("=" * 80 + "\n\n")
+    _print_joined_summary(len(extracted_files), output_file)
 
-        # Process each file
-        for idx, file_path in enumerate(extracted_files, 1):
-            print(f"[{idx}/{len(extracted_files)}] Processing: {file_path.name}")
 
-            try:
-                # Read file
-                with open(file_path, 'r', encoding='utf-8') as in_f:
-                    content = in_f.read()
+def _load_manifest(
+    output_file: Path,
+    input_folder: str,
+    include_separator: bool,
+    include_metadata: bool
+) -> JoinManifest:
+    """Manifest of the joined file for the given join options"""
+    return JoinManifest.load(
+        manifest_path_for(output_file),
+        {
+            "include_separator": include_separator,
+            "include_metadata": include_metadata,
+            "source_folder": str(input_folder),
+        }
+    )
+
 
-                # Extract question number from filename
-                match = re.search(r'q(\d+)', file_path.name, re.IGNORECASE)
-                question_num = match.group(1) if match else str(idx)
+def _print_joined_summary(total: int, output_file: Path):
+    print("\n" + "=" * 80)
+    print(f" Successfully joined {total} files")
+    print(f" Output file: {output_file}")
+    print(f" Size: {output_file.stat().st_size:,} bytes")
+    print("=" * 80)
 
-                # Write separator header
-                if include_separator:
-                    out_f.write("\n" + "=" * 80 + "\n")
-                    out_f.write(f"QUESTION {question_num}\n")
-                    out_f.write("=" * 80 + "\n\n")
 
-                # Extract and write content
-                text_content = extract_text_content(content, include_metadata)
-                out_f.write(text_content)
-                out_f.write("\n\n")
+def _join_incremental(
+    extracted_files: List[Path],
+    output_file: Path,
+    manifest: JoinManifest,
+    input_folder: str,
+    include_separator: bool,
+    include_metadata: bool,
+    workers: int
+):
+    """
+    Rejoin reusing the previous joined file (manifest must be usable)
 
+    Args:
+        extracted_files: Sorted extracted files
+        output_file: Joined file (also the source of reused sections)
+        manifest: Manifest of output_file
+        input_folder: Source folder (for the header)
+        include_separator: Add separators between questions
+        include_metadata: Keep metadata headers from individual files
+        workers: Threads reading changed files
+    """
+    # Decide per file: reuse the old section (size/mtime unchanged) or re-read it
+    plan: List[Dict[str, Any]] = []
+    to_read = []
+    for idx, file_path in enumerate(extracted_files, 1):
+        item = {"path": file_path, "label": question_label(file_path, idx), "entry": None}
+        old = manifest.entries.get(file_path.name)
+        if old is not None and old["label"] == item["label"]:
+            item["entry"] = old
+            try:
+                item["reuse"] = manifest.lookup(file_path.name, file_path.stat()) is not None
+            except OSError:
+                pass
+        if not item.get("reuse"):
+            to_read.append(item)
+        plan.append(item)
+
+    # Read changed files in parallel; sections are rendered in file order
+    changed = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for done, (item, (data, stat, error)) in enumerate(
+            zip(to_read, executor.map(_read_source, [item["path"] for item in to_read])), 1
+        ):
+            print(f"[{done}/{len(to_read)}] Processing: {item['path'].name}")
+            if error is not None:
+                print(f"    Error reading file: {error}")
+                continue
+
+            item["stat"] = stat
+            item["hash"] = hash_bytes(data)
+            if item["entry"] is not None and item["entry"]["hash"] == item["hash"]:
+                # Touched but identical: the old section is still right
+                item["reuse"] = True
+                continue
+            try:
+                item["section"] = render_section(
+                    _decode(data), item["label"], include_separator, include_metadata
+                ).encode('utf-8')
+                changed += 1
             except Exception as e:
                 print(f"    Error reading file: {str(e)}")
+
+    # Write next to the output, then swap (the old file is still being copied from)
+    entries: Dict[str, Dict[str, Any]] = {}
+    tmp_file = output_file.with_name(output_file.name + ".tmp")
+    try:
+        _write_incremental(output_file, tmp_file, plan, entries, len(extracted_files), input_folder)
+    except BaseException:
+        tmp_file.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_file, output_file)
+
+    manifest.entries = entries
+    manifest.save(output_file)
+    print(f"\n Re-read {len(to_read)} files ({changed} changed), reused {len(entries) - changed} sections")
+
+
+def _write_incremental(
+    output_file: Path,
+    tmp_file: Path,
+    plan: List[Dict[str, Any]],
+    entries: Dict[str, Dict[str, Any]],
+    total: int,
+    input_folder: str
+):
+    """Write the rejoined file to tmp_file, filling entries (see _join_incremental)"""
+    with open(output_file, 'rb') as old_f, open(tmp_file, 'wb') as out_f:
+        out_f.write(joined_header(total, input_folder).encode('utf-8'))
+
+        # Pending run of adjacent reused sections: copied with one seek
+        run_start = run_end = 0
+
+        def flush_run():
+            remaining = run_end - run_start
+            old_f.seek(run_start)
+            while remaining > 0:
+                chunk = old_f.read(min(COPY_CHUNK, remaining))
+                if not chunk:
+                    raise OSError(f"{output_file} is shorter than its manifest says")
+                out_f.write(chunk)
+                remaining -= len(chunk)
+
+        for item in plan:
+            if item.get("reuse"):
+                old = item["entry"]
+                if old["offset"] != run_end:
+                    flush_run()
+                    run_start = run_end = old["offset"]
+                entries[item["path"].name] = dict(
+                    old,
+                    offset=out_f.tell() + (run_end - run_start),
+                    **({"size": item["stat"].st_size, "mtime_ns": item["stat"].st_mtime_ns}
+                       if "stat" in item else {})
+                )
+                run_end += old["length"]
                 continue
 
+            if "section" not in item:
+                continue  # Unreadable file: left out, retried next run
+            flush_run()
+            run_start = run_end = 0
+            entries[item["path"].name] = {
+                "label": item["label"],
+                "size": item["stat"].st_size,
+                "mtime_ns": item["stat"].st_mtime_ns,
+                "hash": item["hash"],
+                "offset": out_f.tell(),
+                "length": len(item["section"]),
+            }
+            out_f.write(item["section"])
+
+        flush_run()
+
         # Write footer
-        out_f.write("\n" + "=" * 80 + "\n")
-        out_f.write("END OF JOINED FILE\n")
-        out_f.write("=" * 80 + "\n")
+        out_f.write(JOINED_FOOTER.encode('utf-8'))
 
-    print("\n" + "=" * 80)
-    print(f" Successfully joined {len(extracted_files)} files")
-    print(f" Output file: {output_file}")
-    print(f" Size: {output_file.stat().st_size:,} bytes")
-    print("=" * 80)
+
+def find_near_duplicates(
+    files: List[Path],
+    threshold: float,
+    workers: int = 8,
+    kept: Optional[List[Dict[str, Any]]] = None
+) -> Tuple[DedupMap, int]:
+    """
+    Detect near-duplicate questions (first occurrence in natural order is kept)
+
+    Args:
+        files: Sorted extracted files
+        threshold: Estimated Jaccard similarity from which questions are duplicates
+        workers: Reader threads
+        kept: If given, the scan records of the files that are not duplicates
+            are appended to it, so the outputs can be written without reading
+            the files again
+
+    Returns:
+        (dedup map keyed by file name, signature comparisons made)
+    """
+    index = NearDuplicateIndex(threshold)
+    dedup_map = DedupMap(threshold, index.num_perm, index.bands, index.rows)
+    for record in scan_extracted_files(files, workers):
+        if "error" in record:
+            # Unreadable files are reported by the outputs' scan
+            match = None
+        else:
+            # Question body located by layout (works for both extractors' formats)
+            text = parse_extracted_text(record["content"], record["path"].name)["text"]
+            match = index.add(record["path"].name, text)
+        dedup_map.add(record["path"].name, match)
+        if kept is not None and match is None:
+            kept.append(record)
+    return dedup_map, index.comparisons
 
 
 def create_separate_clean_files(
     input_folder: str,
     output_folder: str,
-    pattern: str = "*_extracted.txt"
+    pattern: str = "*_extracted.txt",
+    workers: int = 8
 ):
     """
     Create separate clean files (no metadata) for each question
@@ -172,59 +872,120 @@ def create_separate_clean_files(
         input_folder: Folder containing extracted text files
         output_folder: Folder to save clean files
         pattern: Glob pattern for matching files
+        workers: Threads reading source files
     """
-    input_path = Path(input_folder)
-    output_path = Path(output_folder)
-
-    # Validate input
-    if not input_path.exists():
-        print(f" Error: Input folder not found: {input_folder}")
-        return
-
-    # Get all extracted files
-    extracted_files = list(input_path.glob(pattern))
-
+    extracted_files = list_extracted_files(input_folder, pattern)
     if not extracted_files:
-        print(f"  No extracted files found in {input_folder}")
         return
 
-    # Natural sort
-    extracted_files = sorted(extracted_files, key=natural_sort_key)
-
     print(f"\n Creating {len(extracted_files)} clean files")
     print("=" * 80)
 
-    # Create output folder
-    output_path.mkdir(parents=True, exist_ok=True)
+    run_pipeline(extracted_files, [CleanFilesSink(Path(output_folder))], input_folder, workers)
 
-    # Process each file
-    for idx, file_path in enumerate(extracted_files, 1):
-        print(f"[{idx}/{len(extracted_files)}] Processing: {file_path.name}")
+    print("\n Successfully created clean files")
 
-        try:
-            # Read file
-            with open(file_path, 'r', encoding='utf-8') as in_f:
-                content = in_f.read()
 
-            # Extract question number
-            match = re.search(r'q(\d+)', file_path.name, re.IGNORECASE)
-            question_num = match.group(1) if match else str(idx)
+def export_extracted_files(
+    input_folder: str,
+    output_folder: str,
+    output_filename: Optional[str] = "all_questions_joined.txt",
+    clean_files: bool = False,
+    json_filename: Optional[str] = None,
+    markdown_filename: Optional[str] = None,
+    include_separator: bool = True,
+    include_metadata: bool = False,
+    pattern: str = "*_extracted.txt",
+    incremental: bool = False,
+    workers: int = 8,
+    index_file: Optional[str] = None,
+    dedup_threshold: Optional[float] = None,
+    dedup_filename: str = "dedup_map.json"
+) -> Optional[Dict[str, int]]:
+    """
+    Write several outputs from ONE scan of the folder (each file read and
+    parsed once, whatever the number of outputs). With dedup, the dedup pass
+    is that scan: the records of the kept files are held in memory and fed
+    to the outputs.
+
+    Args:
+        input_folder: Folder containing extracted text files
+        output_folder: Folder to save the outputs
+        output_filename: Joined text file (None = no joined file)
+        clean_files: Also write one Q<n>_clean.txt per question
+        json_filename: JSON export (None = none)
+        markdown_filename: Markdown export (None = none)
+        include_separator: Add separators between questions (joined file)
+        include_metadata: Keep metadata headers (joined file)
+        pattern: Glob pattern for matching files
+        incremental: Record a manifest for later `--incremental` joins
+        workers: Threads reading source files
+        index_file: Question store to update (see question_store.py, None = none)
+        dedup_threshold: Drop near-duplicate questions from every output
+            (similarity threshold, None = keep all); the dedup map is written
+            to `dedup_filename` in the output folder
+        dedup_filename: Dedup map JSON file name
 
-            # Extract clean content (no metadata)
-            clean_content = extract_text_content(content, include_metadata=False)
+    Returns:
+        Scan statistics (files, read, bytes), None when there was nothing to do
+    """
+    extracted_files = list_extracted_files(input_folder, pattern)
+    if not extracted_files:
+        return None
 
-            # Save clean file
-            output_file = output_path / f"Q{question_num}_clean.txt"
-            with open(output_file, 'w', encoding='utf-8') as out_f:
-                out_f.write(clean_content)
+    output_path = Path(output_folder)
+    scanned = len(extracted_files)
+    records = None
+    if dedup_threshold is not None:
+        records = []
+        dedup_map, comparisons = find_near_duplicates(extracted_files, dedup_threshold, workers, kept=records)
+        dedup_map.save(output_path / dedup_filename, source_folder=str(input_folder))
+        print(f"\n Dedup: {format_dedup_stats(dedup_map, comparisons)}")
+        print(f" Dedup map: {output_path / dedup_filename}")
+        # Kept files are numbered as if the duplicates had never been there
+        extracted_files = [record["path"] for record in records]
+        for idx, record in enumerate(records, 1):
+            record["index"], record["label"] = idx, question_label(record["path"], idx)
+
+    sinks = []
+    if output_filename:
+        manifest = None
+        if incremental:
+            manifest = _load_manifest(output_path / output_filename, input_folder, include_separator, include_metadata)
+        sinks.append(JoinedTextSink(output_path / output_filename, include_separator, include_metadata, manifest))
+    if clean_files:
+        sinks.append(CleanFilesSink(output_path))
+    if json_filename:
+        sinks.append(JsonSink(output_path / json_filename))
+    if markdown_filename:
+        sinks.append(MarkdownSink(output_path / markdown_filename))
+    store = None
+    if index_file:
+        store = QuestionStore(index_file)
+        sinks.append(QuestionStoreSink(store))
 
-            print(f"   Created: Q{question_num}_clean.txt")
+    print(f"\n Found {len(extracted_files)} extracted files")
+    print(f" Outputs: {', '.join(type(sink).__name__ for sink in sinks)} -> {output_folder}")
+    print("=" * 80)
 
-        except Exception as e:
-            print(f"    Error: {str(e)}")
-            continue
+    try:
+        stats = run_pipeline(extracted_files, sinks, input_folder, workers, records)
+    finally:
+        if store is not None:
+            store.close()
 
-    print("\n Successfully created clean files")
+    print("\n" + "=" * 80)
+    if records is not None:
+        print(f" Read {scanned} files once (dedup and outputs), wrote {stats['read']}/{stats['files']} "
+              f"kept files ({stats['bytes']:,} bytes) to {len(sinks)} outputs")
+    else:
+        print(f" Read {stats['read']}/{stats['files']} files once ({stats['bytes']:,} bytes) for {len(sinks)} outputs")
+    if store is not None:
+        index_stats = sinks[-1].stats
+        print(f" Index {index_file}: {index_stats['added']} added, {index_stats['updated']} updated, "
+              f"{index_stats['unchanged']} unchanged, {index_stats['removed']} removed")
+    print("=" * 80)
+    return stats
 
 
 def main():
@@ -253,6 +1014,29 @@ Examples:
   python join_questions.py \\
     --input-folder extracted_texts \\
     --mode separate
+
+  # Joined file, clean files, JSON and Markdown from a single scan
+  python join_questions.py \\
+    --input-folder extracted_texts \\
+    --mode both \\
+    --json questions.json \\
+    --markdown questions.md
+
+  # Joined file plus a searchable question index (see question_store.py)
+  python join_questions.py \\
+    --input-folder extracted_texts \\
+    --index extracted_texts/questions.sqlite
+
+  # Drop near-duplicate questions (overlapping exam sets), write dedup_map.json
+  python join_questions.py \\
+    --input-folder extracted_texts \\
+    --mode both \\
+    --dedup
+
+  # Rejoin after re-extracting a few images (only changed files are re-read)
+  python join_questions.py \\
+    --input-folder extracted_texts \\
+    --incremental
         """
     )
 
@@ -278,7 +1062,42 @@ Examples:
         '--mode',
         choices=['join', 'separate', 'both'],
         default='join',
-        help='Processing mode: join, separate, or both (default: join)'
+        help='Processing mode: join, separate, or both (default: join); '
+             'several outputs are written from one scan of the folder'
+    )
+
+    parser.add_argument(
+        '--json',
+        default=None,
+        metavar='FILENAME',
+        help='Also export the questions as JSON into the output folder (same scan)'
+    )
+
+    parser.add_argument(
+        '--markdown',
+        default=None,
+        metavar='FILENAME',
+        help='Also export the questions as Markdown into the output folder (same scan)'
+    )
+
+    parser.add_argument(
+        '--index',
+        default=None,
+        metavar='DB',
+        help='Also update a SQLite/FTS5 question index (question_store.py) from the same scan'
+    )
+
+    parser.add_argument(
+        '--dedup',
+        action='store_true',
+        help='Skip near-duplicate questions in every output and write dedup_map.json (MinHash/LSH)'
+    )
+
+    parser.add_argument(
+        '--dedup-threshold',
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f'Similarity from which two questions are duplicates (default: {DEFAULT_THRESHOLD})'
     )
 
     parser.add_argument(
@@ -299,10 +1118,23 @@ Examples:
         help='Glob pattern for matching files (default: *_extracted.txt)'
     )
 
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Keep a manifest next to the joined file and only re-read changed files on later runs'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=8,
+        help='Threads reading source files (default: 8)'
+    )
+
     args = parser.parse_args()
 
-    # Process based on mode
-    if args.mode in ['join', 'both']:
+    # One output: dedicated path (join supports --incremental reuse)
+    if args.mode == 'join' and not (args.json or args.markdown or args.index or args.dedup):
         print("\n Mode: Join all files")
         join_extracted_files(
             args.input_folder,
@@ -310,15 +1142,37 @@ Examples:
             args.output_filename,
             include_separator=not args.no_separator,
             include_metadata=args.include_metadata,
-            pattern=args.pattern
+            pattern=args.pattern,
+            incremental=args.incremental,
+            workers=args.workers
         )
 
-    if args.mode in ['separate', 'both']:
+    elif args.mode == 'separate' and not (args.json or args.markdown or args.index or args.dedup):
         print("\n Mode: Create separate clean files")
         create_separate_clean_files(
             args.input_folder,
             args.output_folder,
-            pattern=args.pattern
+            pattern=args.pattern,
+            workers=args.workers
+        )
+
+    # Several outputs: one scan feeding every output
+    else:
+        print(f"\n Mode: {args.mode} (single pass)")
+        export_extracted_files(
+            args.input_folder,
+            args.output_folder,
+            output_filename=args.output_filename if args.mode in ['join', 'both'] else None,
+            clean_files=args.mode in ['separate', 'both'],
+            json_filename=args.json,
+            markdown_filename=args.markdown,
+            include_separator=not args.no_separator,
+            include_metadata=args.include_metadata,
+            pattern=args.pattern,
+            incremental=args.incremental,
+            workers=args.workers,
+            index_file=args.index,
+            dedup_threshold=args.dedup_threshold if args.dedup else None
         )
 
     print("\n Processing complete!")
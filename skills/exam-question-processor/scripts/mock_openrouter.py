@@ -0,0 +1,414 @@
+"""
+Local stand-in for the OpenRouter chat-completions endpoint
+
+Accepts the same vision requests the extractors send and answers with a
+fake extraction after a configurable latency, so the whole pipeline can be
+run and benchmarked offline without API credits or network variance.
+
+Features:
+- Latency distributions: fixed, uniform, lognormal, exponential (per model if wanted)
+- Random 429 (with Retry-After) and 5xx injection
+- Optional requests-per-minute limit enforced like a real provider
+- Token usage echo derived from the request (images, prompt, max_tokens)
+- Multi-image requests answered with "===== IMAGE n =====" sections
+- `stream: true` answered as chunked SSE, deltas spread over the latency
+- Optional runaway answers that repeat one line until max_tokens
+- In-process (MockOpenRouter) or standalone (CLI) use
+
+Usage:
+    python mock_openrouter.py --port 8765 --latency lognormal:0.8:0.4 --rate-429 0.05
+    python image_text_extractor.py --api-url http://127.0.0.1:8765/api/v1/chat/completions ...
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+
+# Rough vision-model cost of one image and one prompt character
+TOKENS_PER_IMAGE = 258
+CHARS_PER_TOKEN = 4
+
+# Streamed responses: share of the latency before the first delta, delta size
+STREAM_FIRST_TOKEN_SHARE = 0.25
+STREAM_DELTA_CHARS = 16
+
+RUNAWAY_LINE = "D. four (mock loop)\n"
+
+PATH = "/api/v1/chat/completions"
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a latency distribution spec
+
+    Args:
+        spec: "fixed:S", "uniform:MIN:MAX", "lognormal:MEDIAN:SIGMA" or "exp:MEAN"
+            (seconds)
+
+    Returns:
+        Function drawing one latency in seconds from a Random instance
+
+    Raises:
+        ValueError: Unknown distribution or wrong number of parameters
+    """
+    kind, *raw = spec.split(':')
+    try:
+        params = [float(value) for value in raw]
+    except ValueError:
+        raise ValueError(f"Invalid latency spec: {spec}")
+
+    samplers = {
+        ("fixed", 1): lambda rng: params[0],
+        ("uniform", 2): lambda rng: rng.uniform(params[0], params[1]),
+        ("lognormal", 2): lambda rng: rng.lognormvariate(math.log(params[0]), params[1]),
+        ("exp", 1): lambda rng: rng.expovariate(1 / params[0]),
+    }
+    sampler = samplers.get((kind, len(params)))
+    if sampler is None:
+        raise ValueError(f"Invalid latency spec: {spec} (use fixed:S, uniform:MIN:MAX, lognormal:MEDIAN:SIGMA or exp:MEAN)")
+    return sampler
+
+
+class MockOpenRouter:
+    """
+    Threaded mock chat-completions server
+
+    Usage:
+        with MockOpenRouter(latency="fixed:0.2", rate_429=0.05) as server:
+            extractor = ImageTextExtractor(api_key="sk-or-mock", api_url=server.url)
+            ...
+            print(server.stats())
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: str = 'lognormal:0.8:0.4',
+        rate_429: float = 0.0,
+        rate_5xx: float = 0.0,
+        retry_after: float = 1.0,
+        rpm_limit: Optional[int] = None,
+        completion_tokens: int = 300,
+        seed: Optional[int] = None,
+        model_latency: Optional[Dict[str, str]] = None,
+        rate_runaway: float = 0.0
+    ):
+        """
+        Configure the server (call start() or use as a context manager)
+
+        Args:
+            host: Bind address
+            port: Port (0 = pick a free one)
+            latency: Latency distribution spec (see parse_latency)
+            rate_429: Probability of a random 429 response
+            rate_5xx: Probability of a random 500/502/503 response
+            retry_after: Retry-After seconds sent with 429 responses
+            rpm_limit: Reject requests above this many per rolling minute (None = no limit)
+            completion_tokens: Completion tokens reported per image
+            seed: Random seed for reproducible runs
+            model_latency: Latency spec per model, overriding `latency`
+            rate_runaway: Probability of an answer that loops until max_tokens
+        """
+        self.latency = parse_latency(latency)
+        self.model_latency = {model: parse_latency(spec) for model, spec in (model_latency or {}).items()}
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.retry_after = retry_after
+        self.rpm_limit = rpm_limit
+        self.completion_tokens = completion_tokens
+        self.rate_runaway = rate_runaway
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window: deque = deque()
+        self._stats = {"requests": 0, "ok": 0, "rate_limited": 0, "server_errors": 0, "images": 0, "bytes": 0,
+                       "streamed": 0, "runaway": 0}
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Chat-completions URL of the running server"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{PATH}"
+
+    def start(self) -> 'MockOpenRouter':
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the port"""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'MockOpenRouter':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Request counters since start
+
+        Returns:
+            Dict with requests, ok, rate_limited, server_errors, images, bytes,
+            streamed, runaway
+        """
+        with self._lock:
+            return dict(self._stats)
+
+    def _decide(self, body_size: int, model: Optional[str] = None) -> tuple:
+        """Pick latency and outcome for one request: (seconds, status)"""
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["bytes"] += body_size
+            latency = self.model_latency.get(model, self.latency)(self._rng)
+            roll = self._rng.random()
+
+            if self.rpm_limit is not None:
+                now = time.monotonic()
+                while self._window and now - self._window[0] > 60:
+                    self._window.popleft()
+                if len(self._window) >= self.rpm_limit:
+                    self._stats["rate_limited"] += 1
+                    return 0.0, 429
+                self._window.append(now)
+
+            if roll < self.rate_429:
+                self._stats["rate_limited"] += 1
+                return 0.0, 429
+            if roll < self.rate_429 + self.rate_5xx:
+                self._stats["server_errors"] += 1
+                return latency, self._rng.choice((500, 502, 503))
+            return latency, 200
+
+    def _respond(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a chat-completions response echoing the request's shape"""
+        parts = request["messages"][0]["content"]
+        if isinstance(parts, str):
+            parts = [{"type": "text", "text": parts}]
+        prompt = " ".join(part.get("text", "") for part in parts if part.get("type") == "text")
+        images = sum(1 for part in parts if part.get("type") == "image_url")
+
+        if images > 1:
+            content = "\n\n".join(
+                f"===== IMAGE {index} =====\nQuestion {index}: mock extracted text\nA. one\nB. two"
+                for index in range(1, images + 1)
+            )
+        else:
+            content = "Question 1: mock extracted text\nA. one\nB. two\nC. three\nD. four"
+
+        prompt_tokens = images * TOKENS_PER_IMAGE + len(prompt) // CHARS_PER_TOKEN
+        completion_tokens = min(self.completion_tokens * max(images, 1), request.get("max_tokens") or 10 ** 9)
+        finish_reason = "stop"
+
+        with self._lock:
+            self._stats["ok"] += 1
+            self._stats["images"] += images
+            runaway = self._rng.random() < self.rate_runaway
+            if runaway:
+                self._stats["runaway"] += 1
+
+        if runaway:
+            # Stuck model: the last line repeats until the token budget is gone
+            completion_tokens = request.get("max_tokens") or 4000
+            repeats = completion_tokens * CHARS_PER_TOKEN // len(RUNAWAY_LINE)
+            content = content + "\n" + RUNAWAY_LINE * repeats
+            finish_reason = "length"
+
+        return {
+            "id": f"mock-{time.time_ns()}",
+            "model": request.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": finish_reason}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, payload: Dict[str, Any], seconds: float):
+                """Send a response as chat-completions SSE chunks spread over `seconds`"""
+                choice = payload["choices"][0]
+                content = choice["message"]["content"]
+                deltas = [content[i:i + STREAM_DELTA_CHARS] for i in range(0, len(content), STREAM_DELTA_CHARS)]
+
+                def chunk(delta: Optional[str] = None, finish_reason: Optional[str] = None, **extra) -> bytes:
+                    event = {
+                        "id": payload["id"],
+                        "model": payload["model"],
+                        "choices": [{
+                            "index": 0,
+                            "delta": {"content": delta} if delta is not None else {},
+                            "finish_reason": finish_reason
+                        }],
+                        **extra
+                    }
+                    return f"data: {json.dumps(event)}\n\n".encode('utf-8')
+
+                def write(data: bytes):
+                    self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+                    self.wfile.flush()
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+
+                time.sleep(seconds * STREAM_FIRST_TOKEN_SHARE)
+                pause = seconds * (1 - STREAM_FIRST_TOKEN_SHARE) / max(len(deltas), 1)
+                try:
+                    write(b": OPENROUTER PROCESSING\n\n")
+                    for delta in deltas:
+                        write(chunk(delta))
+                        time.sleep(pause)
+                    write(chunk(finish_reason=choice["finish_reason"], usage=payload["usage"]))
+                    write(b"data: [DONE]\n\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client cancelled the stream
+                    self.close_connection = True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if self.path != PATH:
+                    self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+
+                try:
+                    request = json.loads(body)
+                except ValueError as e:
+                    self._send(400, {"error": {"code": 400, "message": f"Bad request: {e}"}})
+                    return
+
+                latency, status = mock._decide(len(body), request.get("model"))
+                stream = bool(request.get("stream"))
+                if status != 200 or not stream:
+                    time.sleep(latency)
+
+                if status == 429:
+                    self._send(429, {"error": {"code": 429, "message": "Rate limit exceeded"}},
+                               {"Retry-After": f"{mock.retry_after:g}"})
+                    return
+                if status >= 500:
+                    self._send(status, {"error": {"code": status, "message": "Injected server error"}})
+                    return
+
+                try:
+                    payload = mock._respond(request)
+                except (KeyError, IndexError, TypeError) as e:
+                    self._send(400, {"error": {"code": 400, "message": f"Bad request: {e}"}})
+                    return
+                if stream:
+                    with mock._lock:
+                        mock._stats["streamed"] += 1
+                    self._send_stream(payload, latency)
+                else:
+                    self._send(200, payload)
+
+        return Handler
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Local mock of the OpenRouter chat-completions endpoint",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Realistic latency, 5% rate limits, 1% server errors
+  python mock_openrouter.py --port 8765 --latency lognormal:0.8:0.4 --rate-429 0.05 --rate-5xx 0.01
+
+  # One slow model (for routing / hedging experiments)
+  python mock_openrouter.py --port 8765 --model-latency slow/model=lognormal:4:0.5
+
+  # Provider-style 60 requests/minute limit
+  python mock_openrouter.py --port 8765 --rpm-limit 60
+
+  # 10% of answers loop until max_tokens (try with --stream on the client)
+  python mock_openrouter.py --port 8765 --rate-runaway 0.1
+        """
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='Bind address (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='Port (default: 8765)')
+    parser.add_argument('--latency', default='lognormal:0.8:0.4',
+                        help='fixed:S | uniform:MIN:MAX | lognormal:MEDIAN:SIGMA | exp:MEAN (default: lognormal:0.8:0.4)')
+    parser.add_argument('--model-latency', action='append', default=[], metavar='MODEL=SPEC',
+                        help='Latency spec for one model (repeatable)')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='Probability of a random 429 (default: 0)')
+    parser.add_argument('--rate-5xx', type=float, default=0.0, help='Probability of a random 5xx (default: 0)')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After seconds on 429 (default: 1)')
+    parser.add_argument('--rpm-limit', type=int, default=None, help='Requests per rolling minute before 429')
+    parser.add_argument('--completion-tokens', type=int, default=300, help='Completion tokens per image (default: 300)')
+    parser.add_argument('--rate-runaway', type=float, default=0.0,
+                        help='Probability of an answer looping until max_tokens (default: 0)')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed')
+
+    args = parser.parse_args()
+
+    try:
+        model_latency = dict(item.split('=', 1) for item in args.model_latency)
+        server = MockOpenRouter(
+            host=args.host,
+            port=args.port,
+            latency=args.latency,
+            rate_429=args.rate_429,
+            rate_5xx=args.rate_5xx,
+            retry_after=args.retry_after,
+            rpm_limit=args.rpm_limit,
+            completion_tokens=args.completion_tokens,
+            seed=args.seed,
+            model_latency=model_latency,
+            rate_runaway=args.rate_runaway
+        )
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return
+
+    print(f" Mock OpenRouter listening on {server.url}")
+    print(" Press Ctrl+C to stop")
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(f"\n Stats: {server.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Latency-aware routing and hedged requests across vision models
+
+Instead of always trying vision_models in a fixed order, ModelRouter keeps
+a rolling window of latency and errors per model and ranks them: healthy
+models first, fastest median latency first. With hedging enabled, a
+request still running after the model's p95 latency gets a duplicate sent
+to the next-best model, and whichever answers first wins.
+
+Features:
+- Rolling per-model window (latency of successes, error rate of all)
+- Unsampled models are tried early so every model gets measured
+- Models above max_error_rate sink to the end of the ranking
+- Hedge delay = rolling p95 (after min_samples), floored by min_hedge_delay
+- Pick / hedge / hedge-win counters for summary reports
+- Thread-safe
+
+Hedged duplicates cost tokens: the losing request cannot be aborted
+mid-flight and still completes in the background.
+"""
+
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from request_metrics import percentile
+
+
+class ModelRouter:
+    """
+    Rank vision models by recent latency and health
+
+    Usage:
+        router = ModelRouter(hedge=True)
+        models = router.ranked(["model-a", "model-b"])
+        router.record("model-a", 2.4, success=True)
+        delay = router.hedge_delay("model-a")  # None until warmed up
+    """
+
+    def __init__(
+        self,
+        window: int = 50,
+        min_samples: int = 5,
+        max_error_rate: float = 0.5,
+        hedge: bool = False,
+        hedge_quantile: float = 95,
+        min_hedge_delay: float = 1.0
+    ):
+        """
+        Initialize the router
+
+        Args:
+            window: Requests remembered per model
+            min_samples: Samples needed before a model's stats are trusted
+            max_error_rate: Error rate above which a model is unhealthy
+            hedge: Send a duplicate request when the first one is slow
+            hedge_quantile: Latency percentile that triggers the hedge
+            min_hedge_delay: Never hedge sooner than this many seconds
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.min_hedge_delay = min_hedge_delay
+
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[Tuple[float, bool]]] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _model(self, model: str) -> Deque[Tuple[float, bool]]:
+        """Window for a model (caller holds the lock)"""
+        if model not in self._samples:
+            self._samples[model] = deque(maxlen=self.window)
+            self._counters[model] = {"picked": 0, "hedges": 0, "hedge_wins": 0}
+        return self._samples[model]
+
+    def record(self, model: str, seconds: float, success: bool):
+        """
+        Record one finished request
+
+        Args:
+            model: Model identifier
+            seconds: Request latency
+            success: False for HTTP errors, timeouts and bad responses
+        """
+        with self._lock:
+            self._model(model).append((seconds, success))
+
+    def _health(self, model: str) -> Tuple[bool, Optional[float]]:
+        """(healthy, p50 latency) for a model (caller holds the lock)"""
+        samples = self._model(model)
+        if len(samples) < self.min_samples:
+            latencies = [seconds for seconds, ok in samples if ok]
+            return True, percentile(latencies, 50) if latencies else None
+
+        errors = sum(1 for _, ok in samples if not ok)
+        latencies = [seconds for seconds, ok in samples if ok]
+        healthy = errors / len(samples) <= self.max_error_rate
+        return healthy, percentile(latencies, 50) if latencies else None
+
+    def ranked(self, models: Sequence[str]) -> List[str]:
+        """
+        Order models for the next request and count the pick
+
+        Args:
+            models: Candidate models (configured order breaks ties)
+
+        Returns:
+            Models, best first
+        """
+        with self._lock:
+            def key(item):
+                index, model = item
+                healthy, p50 = self._health(model)
+                # Unmeasured models rank as fastest so they get sampled
+                return (not healthy, p50 if p50 is not None else 0.0, index)
+
+            order = [model for _, model in sorted(enumerate(models), key=key)]
+            if order:
+                self._counters[order[0]]["picked"] += 1
+            return order
+
+    def hedge_delay(self, model: str) -> Optional[float]:
+        """
+        Seconds to wait before hedging a request to `model`
+
+        Args:
+            model: Model of the primary request
+
+        Returns:
+            Delay, or None if hedging is off or the model has too few samples
+        """
+        if not self.hedge:
+            return None
+        with self._lock:
+            latencies = [seconds for seconds, ok in self._model(model) if ok]
+        if len(latencies) < self.min_samples:
+            return None
+        return max(self.min_hedge_delay, percentile(latencies, self.hedge_quantile))
+
+    def record_hedge(self, model: str, won: bool = False):
+        """
+        Count a hedged duplicate sent to `model` (and whether it won)
+
+        Args:
+            model: Model the duplicate went to
+            won: The duplicate answered first
+        """
+        with self._lock:
+            self._model(model)
+            self._counters[model]["hedge_wins" if won else "hedges"] += 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-model statistics
+
+        Returns:
+            Dict model -> samples, p50, p95, error_rate, healthy, picked, hedges, hedge_wins
+        """
+        with self._lock:
+            stats = {}
+            for model, samples in self._samples.items():
+                latencies = [seconds for seconds, ok in samples if ok]
+                healthy, p50 = self._health(model)
+                p95 = percentile(latencies, 95)
+                stats[model] = {
+                    "samples": len(samples),
+                    "p50": round(p50, 3) if p50 is not None else None,
+                    "p95": round(p95, 3) if p95 is not None else None,
+                    "error_rate": round(sum(1 for _, ok in samples if not ok) / len(samples), 3) if samples else 0.0,
+                    "healthy": healthy,
+                    **self._counters[model],
+                }
+            return stats
+
+
+def format_router_stats(stats: Dict[str, Dict[str, Any]]) -> List[str]:
+    """
+    Human readable per-model routing lines
+
+    Args:
+        stats: Output of ModelRouter.stats()
+
+    Returns:
+        One line per model
+    """
+    return [
+        f"- {model}: picked {s['picked']}x, p50 {s['p50']}s / p95 {s['p95']}s, "
+        f"{s['error_rate'] * 100:.0f}% errors{'' if s['healthy'] else ' (unhealthy)'}, "
+        f"hedged to {s['hedges']}x ({s['hedge_wins']} won)"
+        for model, s in stats.items()
+    ]
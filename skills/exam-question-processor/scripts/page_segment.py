@@ -0,0 +1,328 @@
+"""
+Split page images into per-question crops (projection-profile layout analysis)
+
+A photo of a whole exam page often holds 5-10 questions; sent as one image
+it produces one long response that is slow, can run into max_tokens and
+fails as a unit. This stage cuts each page at its wide horizontal
+whitespace gaps so every question becomes its own image, which the
+extractors can send in parallel and whose responses are short.
+
+The horizontal projection profile (share of ink per pixel row) separates
+text lines from the blank rows between them. Gaps between the lines of one
+question are about one line spacing; gaps between questions are wider. The
+page is cut in the middle of every gap at least `gap_factor` times the
+typical (median) line gap, and pieces shorter than `min_share` of
+the page are merged back into their neighbour, so a stray line or a small
+figure never becomes a question of its own.
+
+Crops are named `<page>_s01<ext>`, `<page>_s02<ext>`, ... so the natural
+sort of the extractors keeps them in page order, and are cached on disk by
+page content + settings. Pages without a clear split are kept whole.
+join_questions.py numbers the crops of page `q3` as questions 3.1, 3.2, ...
+
+Features:
+- Pure Pillow, no GPU or OCR model
+- Configurable gap factor, minimum piece height and max pieces per page
+- Works on PDF pages (pdf_pages) as well as image files
+- Crop cache: re-runs reuse earlier crops
+- Pages / split pages / crops statistics for summary reports
+
+Requires Pillow (pip install pillow).
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; checked in PageSegmenter.__init__
+    Image = None
+    ImageOps = None
+
+from pdf_pages import DEFAULT_DPI, is_page_path, render_page
+
+DEFAULT_GAP_FACTOR = 2.0
+DEFAULT_MIN_SHARE = 0.04
+DEFAULT_MAX_SEGMENTS = 20
+
+# Width the projection profile is computed at
+PROFILE_WIDTH = 800
+
+# Row mean (0-255) at or below which a row counts as blank; absorbs specks
+BLANK_LEVEL = 2
+
+# Blank runs thinner than this share of the page are inside a text line
+# (between the strokes of "=", accents above letters, ...), not between lines
+NOISE_GAP_SHARE = 0.004
+
+# Whitespace kept around each crop, as a share of the page height
+CROP_MARGIN = 0.005
+
+
+def row_profile(page: 'Image.Image', width: int = PROFILE_WIDTH) -> List[int]:
+    """
+    Ink per pixel row
+
+    Args:
+        page: Grayscale page
+        width: Width the page is reduced to first (rows keep the same ratio)
+
+    Returns:
+        Per row, the mean of the binarized row (0 = blank, 255 = all ink)
+    """
+    scale = min(1.0, width / page.width)
+    reduced = page.resize((max(1, round(page.width * scale)), max(1, round(page.height * scale))), Image.BOX)
+    ink = reduced.point(lambda value: 255 if value < 128 else 0)
+    return list(ink.resize((1, ink.height), Image.BOX).tobytes())
+
+
+def find_cuts(
+    profile: Sequence[int],
+    gap_factor: float = DEFAULT_GAP_FACTOR,
+    min_share: float = DEFAULT_MIN_SHARE,
+    max_segments: int = DEFAULT_MAX_SEGMENTS
+) -> List[Tuple[int, int]]:
+    """
+    Row ranges of the questions on a page
+
+    Args:
+        profile: Output of row_profile()
+        gap_factor: A gap this many times the typical line gap separates questions
+        min_share: Pieces shorter than this share of the page are merged
+        max_segments: At most this many pieces (the widest gaps win)
+
+    Returns:
+        (top, bottom) row ranges in profile rows; one range = do not split
+    """
+    height = len(profile)
+    blank = [value <= BLANK_LEVEL for value in profile]
+
+    # Blank runs strictly between ink: (start, end) row ranges
+    gaps: List[Tuple[int, int]] = []
+    first_ink = next((row for row in range(height) if not blank[row]), None)
+    if first_ink is None:
+        return [(0, height)]
+    last_ink = max(row for row in range(height) if not blank[row])
+    row = first_ink
+    while row <= last_ink:
+        if blank[row]:
+            start = row
+            while blank[row]:
+                row += 1
+            gaps.append((start, row))
+        row += 1
+
+    noise = max(2, round(NOISE_GAP_SHARE * height))
+    gaps = [(start, end) for start, end in gaps if end - start >= noise]
+    if len(gaps) < 2:
+        return [(0, height)]
+
+    widths = sorted(end - start for start, end in gaps)
+    line_gap = widths[len(widths) // 2]
+    wide = [gap for gap in gaps if gap[1] - gap[0] >= gap_factor * line_gap]
+    if len(wide) >= max_segments:
+        wide = sorted(sorted(wide, key=lambda gap: gap[0] - gap[1])[:max_segments - 1])
+
+    cuts = [(start + end) // 2 for start, end in wide]
+    bounds = [0] + cuts + [height]
+    segments = [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+
+    # Short pieces join the next one (the last joins the previous one)
+    min_height = min_share * height
+    merged: List[Tuple[int, int]] = []
+    pending_top = None
+    for top, bottom in segments:
+        top = pending_top if pending_top is not None else top
+        if bottom - top < min_height:
+            pending_top = top
+            continue
+        pending_top = None
+        merged.append((top, bottom))
+    if pending_top is not None:
+        if merged:
+            merged[-1] = (merged[-1][0], height)
+        else:
+            merged.append((0, height))
+    return merged
+
+
+class PageSegmenter:
+    """
+    Replace page images by per-question crops before extraction
+
+    Usage:
+        segmenter = PageSegmenter(cache_dir="extracted_texts/.segments")
+        image_files = segmenter.split_all(image_files)  # pages -> crops, in order
+        print(format_segment_stats(segmenter.stats()))
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path] = ".segments",
+        gap_factor: float = DEFAULT_GAP_FACTOR,
+        min_share: float = DEFAULT_MIN_SHARE,
+        max_segments: int = DEFAULT_MAX_SEGMENTS,
+        pdf_dpi: int = DEFAULT_DPI,
+        workers: int = 4
+    ):
+        """
+        Initialize the segmenter
+
+        Args:
+            cache_dir: Folder the crops are written to
+            gap_factor: A gap this many times the typical line gap separates questions
+            min_share: Pieces shorter than this share of the page are merged
+            max_segments: Max crops per page
+            pdf_dpi: Resolution PDF pages are rendered at
+            workers: Threads decoding and cutting pages
+        """
+        if Image is None:
+            raise ImportError("Pillow is required for page segmentation. Install with: pip install pillow")
+        if gap_factor <= 1:
+            raise ValueError("gap_factor must be > 1")
+
+        self.cache_dir = Path(cache_dir)
+        self.gap_factor = gap_factor
+        self.min_share = min_share
+        self.max_segments = max(1, max_segments)
+        self.pdf_dpi = pdf_dpi
+        self.workers = max(1, workers)
+
+        self._lock = threading.Lock()
+        self._stats = {"pages": 0, "split": 0, "crops": 0, "cached": 0, "errors": 0, "seconds": 0.0}
+
+    def signature(self) -> str:
+        """Settings fingerprint (part of the crop cache key)"""
+        return f"g{self.gap_factor}-m{self.min_share}-x{self.max_segments}"
+
+    def _crop_folder(self, data: bytes, image_path: Path) -> Path:
+        digest = hashlib.sha256(data)
+        digest.update(self.signature().encode('ascii'))
+        return self.cache_dir / f"{image_path.stem}_{digest.hexdigest()[:16]}"
+
+    def split(self, image_path: Union[str, Path]) -> List[Path]:
+        """
+        Crops of one page
+
+        Args:
+            image_path: Image file or PDF page path
+
+        Returns:
+            Crop files in reading order, or [image_path] if the page is not split
+        """
+        image_path = Path(image_path)
+        start = time.perf_counter()
+        cached = False
+        try:
+            if is_page_path(image_path):
+                data, extension = render_page(image_path, self.pdf_dpi), '.jpg'
+            else:
+                data, extension = image_path.read_bytes(), image_path.suffix
+            folder = self._crop_folder(data, image_path)
+
+            # An existing folder is a finished page (written under a temp name first);
+            # an empty one means the page was not split
+            cached = folder.is_dir()
+            if not cached:
+                self._write_crops(data, image_path, extension, folder)
+            crops = sorted(folder.iterdir(), key=lambda path: path.name)
+        except (OSError, ValueError, ImportError, Image.DecompressionBombError):
+            crops = None
+
+        with self._lock:
+            self._stats["pages"] += 1
+            self._stats["seconds"] += time.perf_counter() - start
+            if crops is None:
+                self._stats["errors"] += 1
+            else:
+                self._stats["cached"] += int(cached)
+                self._stats["split"] += int(bool(crops))
+                self._stats["crops"] += len(crops) or 1
+        return crops or [image_path]
+
+    def _write_crops(self, data: bytes, image_path: Path, extension: str, folder: Path):
+        """Cut the page and publish its crop folder atomically"""
+        with Image.open(io.BytesIO(data)) as image:
+            image.load()
+            pil_format = image.format or 'JPEG'
+            image = ImageOps.exif_transpose(image)  # Respect phone camera rotation
+
+        page = ImageOps.autocontrast(image.convert('L'))
+        profile = row_profile(page)
+        segments = find_cuts(profile, self.gap_factor, self.min_share, self.max_segments)
+
+        tmp = folder.with_name(folder.name + f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.mkdir(parents=True, exist_ok=True)
+        try:
+            if len(segments) > 1:
+                scale = image.height / len(profile)
+                margin = round(CROP_MARGIN * image.height)
+                if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                    image = image.convert('RGB')
+                for index, (top, bottom) in enumerate(segments, 1):
+                    box = (
+                        0,
+                        max(0, round(top * scale) - margin),
+                        image.width,
+                        min(image.height, round(bottom * scale) + margin)
+                    )
+                    options = {"quality": 90} if pil_format in ('JPEG', 'WEBP') else {}
+                    image.crop(box).save(tmp / f"{image_path.stem}_s{index:02d}{extension}", format=pil_format, **options)
+            try:
+                os.replace(tmp, folder)
+            except OSError:  # Another worker published the same page first
+                pass
+        finally:
+            if tmp.exists():
+                shutil.rmtree(tmp, ignore_errors=True)
+
+    def split_all(self, image_files: Sequence[Path]) -> List[Path]:
+        """
+        Replace every page by its crops, keeping the order
+
+        Args:
+            image_files: Pages in processing order
+
+        Returns:
+            Crops (and unsplit pages) in processing order
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return [crop for crops in executor.map(self.split, image_files) for crop in crops]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Statistics so far
+
+        Returns:
+            Dict with pages, split, crops, cached, errors, seconds
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["seconds"] = round(stats["seconds"], 2)
+        return stats
+
+
+def format_segment_stats(stats: Dict[str, Any]) -> str:
+    """
+    One-line segmentation summary
+
+    Args:
+        stats: Output of PageSegmenter.stats()
+
+    Returns:
+        Formatted text
+    """
+    text = (
+        f"{stats['split']}/{stats['pages']} pages split into {stats['crops']} images "
+        f"({stats['cached']} from cache, {stats['seconds']}s)"
+    )
+    if stats["errors"]:
+        text += f", {stats['errors']} unreadable"
+    return text
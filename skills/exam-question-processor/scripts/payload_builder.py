@@ -0,0 +1,241 @@
+"""
+Bounded-memory request bodies for vision chat-completion calls
+
+The naive path (read file -> base64 str -> dict -> json.dumps -> bytes) keeps
+3-4 full copies of every image alive at once. The builders here serialize
+the JSON skeleton once with a marker in place of each data URL, then stream
+each image through base64 straight into the body:
+
+- build_vision_payload(): exact-size bytearray, filled in place (one copy)
+- iter_vision_payload(): generator for chunked upload (O(chunk) memory)
+
+Image sources may be file paths (read in chunks) or in-memory bytes.
+"""
+
+import base64
+import json
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import Any, Iterator, List, Sequence, Tuple, Union
+
+# Multiple of 3 so every chunk encodes to base64 without padding
+CHUNK_SIZE = 3 * 256 * 1024
+
+ImageSource = Union[str, Path, bytes, bytearray, memoryview]
+
+
+def base64_length(size: int) -> int:
+    """
+    Length of the padded base64 encoding of `size` bytes
+
+    Args:
+        size: Raw byte count
+
+    Returns:
+        Encoded byte count
+    """
+    return 4 * ((size + 2) // 3)
+
+
+def _source_size(source: ImageSource) -> int:
+    if isinstance(source, (str, Path)):
+        return os.path.getsize(source)
+    return len(source)
+
+
+def _iter_base64(source: ImageSource, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield the base64 encoding of `source` chunk by chunk"""
+    if isinstance(source, (str, Path)):
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        with open(source, 'rb') as f:
+            while True:
+                # Fill the whole buffer so only the final chunk carries padding
+                filled = 0
+                while filled < chunk_size:
+                    n = f.readinto(view[filled:])
+                    if not n:
+                        break
+                    filled += n
+                if not filled:
+                    break
+                yield base64.b64encode(view[:filled])
+                if filled < chunk_size:
+                    break
+    else:
+        view = memoryview(source)
+        for start in range(0, len(view), chunk_size):
+            yield base64.b64encode(view[start:start + chunk_size])
+
+
+def _plan(
+    model: str,
+    prompt: str,
+    images: Sequence[Tuple[ImageSource, str]],
+    params: dict
+) -> Tuple[List[bytes], List[bytes]]:
+    """
+    Serialize the JSON skeleton and split it around each image data URL
+
+    Returns:
+        (json_pieces, url_prefixes): len(json_pieces) == len(images) + 1
+    """
+    markers = [f"@@image-{i}-{uuid.uuid4().hex}@@" for i in range(len(images))]
+    content: List[dict] = [{"type": "text", "text": prompt}]
+    for marker in markers:
+        content.append({"type": "image_url", "image_url": {"url": marker}})
+
+    payload = {
+        "model": model,
+        "messages": [{"role": "user", "content": content}],
+        **{key: value for key, value in params.items() if value is not None},
+    }
+    skeleton = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+
+    pieces = re.split('|'.join(re.escape(m) for m in markers), skeleton) if markers else [skeleton]
+    json_pieces = [piece.encode('utf-8') for piece in pieces]
+    url_prefixes = [f"data:{mime_type};base64,".encode('ascii') for _, mime_type in images]
+    return json_pieces, url_prefixes
+
+
+def payload_size(
+    model: str,
+    prompt: str,
+    images: Sequence[Tuple[ImageSource, str]],
+    **params: Any
+) -> int:
+    """
+    Exact byte size of the body build_vision_payload() would produce
+
+    Args:
+        model: Model identifier
+        prompt: Prompt text
+        images: List of (source, mime_type)
+        **params: Extra top-level fields (temperature, max_tokens, ...)
+
+    Returns:
+        Body size in bytes
+    """
+    json_pieces, url_prefixes = _plan(model, prompt, images, params)
+    return (
+        sum(len(piece) for piece in json_pieces)
+        + sum(len(prefix) for prefix in url_prefixes)
+        + sum(base64_length(_source_size(source)) for source, _ in images)
+    )
+
+
+def build_vision_payload(
+    model: str,
+    prompt: str,
+    images: Sequence[Tuple[ImageSource, str]],
+    **params: Any
+) -> bytearray:
+    """
+    Build a chat-completions JSON body holding one copy of each image
+
+    The buffer is allocated once at its exact final size and filled in
+    place, so peak memory is the body itself plus one encoding chunk.
+
+    Args:
+        model: Model identifier
+        prompt: Prompt text
+        images: List of (source, mime_type); source is a path or bytes
+        **params: Extra top-level fields (temperature, max_tokens, ...)
+
+    Returns:
+        UTF-8 JSON body, ready for requests' `data=`
+    """
+    json_pieces, url_prefixes = _plan(model, prompt, images, params)
+    sizes = [_source_size(source) for source, _ in images]
+    total = (
+        sum(len(piece) for piece in json_pieces)
+        + sum(len(prefix) for prefix in url_prefixes)
+        + sum(base64_length(size) for size in sizes)
+    )
+
+    body = bytearray(total)
+    view = memoryview(body)
+    offset = 0
+
+    def write(data: bytes):
+        nonlocal offset
+        view[offset:offset + len(data)] = data
+        offset += len(data)
+
+    for index, (source, _) in enumerate(images):
+        write(json_pieces[index])
+        write(url_prefixes[index])
+        start = offset
+        for chunk in _iter_base64(source):
+            write(chunk)
+        if offset - start != base64_length(sizes[index]):
+            raise ValueError(f"Image changed while encoding: {source!r}")
+    write(json_pieces[-1])
+
+    view.release()
+    return body
+
+
+def iter_vision_payload(
+    model: str,
+    prompt: str,
+    images: Sequence[Tuple[ImageSource, str]],
+    chunk_size: int = CHUNK_SIZE,
+    **params: Any
+) -> Iterator[bytes]:
+    """
+    Stream a chat-completions JSON body for chunked transfer encoding
+
+    Only one encoded chunk is held in memory at a time. A generator can be
+    consumed once, so call this again for every retry.
+
+    Args:
+        model: Model identifier
+        prompt: Prompt text
+        images: List of (source, mime_type); source is a path or bytes
+        chunk_size: Raw bytes per chunk (multiple of 3)
+        **params: Extra top-level fields (temperature, max_tokens, ...)
+
+    Yields:
+        Body fragments
+    """
+    if chunk_size % 3:
+        raise ValueError("chunk_size must be a multiple of 3")
+
+    json_pieces, url_prefixes = _plan(model, prompt, images, params)
+    for index, (source, _) in enumerate(images):
+        yield json_pieces[index]
+        yield url_prefixes[index]
+        yield from _iter_base64(source, chunk_size)
+    yield json_pieces[-1]
+
+
+def legacy_vision_payload(
+    model: str,
+    prompt: str,
+    images: Sequence[Tuple[Union[str, Path], str]],
+    **params: Any
+) -> bytes:
+    """
+    Reference implementation of the old dict + json path (for benchmarks)
+
+    Args:
+        model: Model identifier
+        prompt: Prompt text
+        images: List of (path, mime_type)
+        **params: Extra top-level fields
+
+    Returns:
+        JSON body bytes
+    """
+    content: List[dict] = [{"type": "text", "text": prompt}]
+    for path, mime_type in images:
+        with open(path, 'rb') as f:
+            encoded = base64.b64encode(f.read()).decode('utf-8')
+        content.append({"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{encoded}"}})
+
+    payload = {"model": model, "messages": [{"role": "user", "content": content}], **params}
+    return json.dumps(payload).encode('utf-8')
+
@@ -0,0 +1,196 @@
+"""
+PDF pages as extraction inputs, rasterized on demand
+
+Scanned exams often arrive as PDFs. Instead of exploding them into image
+files first, every page is given a virtual path next to its PDF
+(`exam.pdf` -> `exam_p001.pdf-page`, `exam_p002.pdf-page`, ...) that flows
+through the extractors like an image path: output files, journal entries,
+metrics and cache keys are all named after it. A page is only rendered when
+the worker preparing it for a request asks for it (prepare_image_file), and
+the rendered bytes go straight into the request body; nothing is written
+to disk, so memory and disk use do not grow with the length of the PDF.
+
+Features:
+- Virtual page paths (natural sort keeps pages in order)
+- Lazy rendering at a configurable DPI (JPEG, in memory)
+- Open documents cached per process (thread-safe)
+
+Requires PyMuPDF (pip install pymupdf).
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple, Union
+
+try:
+    import pymupdf as fitz
+except ImportError:
+    try:
+        import fitz  # PyMuPDF < 1.24
+    except ImportError:  # PyMuPDF is optional; checked when a PDF is opened
+        fitz = None
+
+DEFAULT_DPI = 200
+
+# Pages are sent as JPEG: a fraction of the PNG size for scans, text stays sharp
+PAGE_QUALITY = 90
+
+PAGE_SUFFIX = "-page"
+
+# Open documents kept per process
+_MAX_OPEN_DOCUMENTS = 4
+
+_PAGE_NAME = re.compile(r'^(.*)_p(\d+)$')
+
+_documents: 'OrderedDict[str, object]' = OrderedDict()
+_documents_lock = threading.Lock()
+
+
+def is_pdf(path: Union[str, Path]) -> bool:
+    """Whether a path is a PDF file (by extension)"""
+    return Path(path).suffix.lower() == '.pdf'
+
+
+def page_path(pdf_path: Union[str, Path], page_number: int) -> Path:
+    """
+    Virtual path of one page
+
+    Args:
+        pdf_path: PDF file
+        page_number: 1-based page number
+
+    Returns:
+        `<folder>/<stem>_p<NNN><suffix>-page`
+    """
+    pdf_path = Path(pdf_path)
+    return pdf_path.with_name(f"{pdf_path.stem}_p{page_number:03d}{pdf_path.suffix}{PAGE_SUFFIX}")
+
+
+def is_page_path(path: Union[str, Path]) -> bool:
+    """Whether a path is a virtual PDF page path"""
+    suffix = Path(path).suffix
+    return suffix.lower() == '.pdf' + PAGE_SUFFIX and bool(_PAGE_NAME.match(Path(path).stem))
+
+
+def parse_page_path(path: Union[str, Path]) -> Tuple[Path, int]:
+    """
+    PDF file and page number behind a virtual page path
+
+    Args:
+        path: Output of page_path()
+
+    Returns:
+        (pdf_path, 1-based page number)
+    """
+    path = Path(path)
+    match = _PAGE_NAME.match(path.stem)
+    if not match or not is_page_path(path):
+        raise ValueError(f"Not a PDF page path: {path}")
+    return path.with_name(match.group(1) + path.suffix[:-len(PAGE_SUFFIX)]), int(match.group(2))
+
+
+def _require_fitz():
+    if fitz is None:
+        raise ImportError("PyMuPDF is required for PDF input. Install with: pip install pymupdf")
+
+
+def _document(pdf_path: Path):
+    """Open document from the per-process cache (caller holds the lock)"""
+    key = str(pdf_path.resolve())
+    document = _documents.get(key)
+    if document is None:
+        document = fitz.open(str(pdf_path))
+        _documents[key] = document
+        while len(_documents) > _MAX_OPEN_DOCUMENTS:
+            _documents.popitem(last=False)[1].close()
+    else:
+        _documents.move_to_end(key)
+    return document
+
+
+def count_pages(pdf_path: Union[str, Path]) -> int:
+    """
+    Number of pages of a PDF
+
+    Args:
+        pdf_path: PDF file
+
+    Returns:
+        Page count
+
+    Raises:
+        ImportError: PyMuPDF is not installed
+    """
+    _require_fitz()
+    with _documents_lock:
+        return _document(Path(pdf_path)).page_count
+
+
+def iter_pdf_pages(pdf_path: Union[str, Path]) -> Iterator[Path]:
+    """
+    Virtual paths of every page of a PDF (nothing is rendered)
+
+    Args:
+        pdf_path: PDF file
+
+    Yields:
+        Page paths in page order
+    """
+    for page_number in range(1, count_pages(pdf_path) + 1):
+        yield page_path(pdf_path, page_number)
+
+
+def expand_pdfs(paths: Iterable[Path]) -> List[Path]:
+    """
+    Replace every PDF in a list of inputs by its page paths
+
+    PDFs that cannot be opened (or all of them, without PyMuPDF) are
+    reported and left out.
+
+    Args:
+        paths: Image and PDF files
+
+    Returns:
+        Images unchanged, PDFs expanded in place
+    """
+    expanded: List[Path] = []
+    for path in paths:
+        if not is_pdf(path):
+            expanded.append(path)
+            continue
+        try:
+            expanded.extend(iter_pdf_pages(path))
+        except ImportError as e:
+            print(f"⚠️  Skipping {Path(path).name}: {e}")
+        except Exception as e:  # fitz raises its own error types for damaged files
+            print(f"⚠️  Skipping {Path(path).name}: cannot open PDF ({e})")
+    return expanded
+
+
+def render_page(path: Union[str, Path], dpi: int = DEFAULT_DPI) -> bytes:
+    """
+    Rasterize one page to JPEG bytes
+
+    Args:
+        path: Virtual page path (see page_path)
+        dpi: Render resolution
+
+    Returns:
+        JPEG bytes
+
+    Raises:
+        ImportError: PyMuPDF is not installed
+        ValueError: Not a page path, or the page does not exist
+    """
+    _require_fitz()
+    pdf_path, page_number = parse_page_path(path)
+
+    # PyMuPDF objects are not thread-safe
+    with _documents_lock:
+        document = _document(pdf_path)
+        if not 1 <= page_number <= document.page_count:
+            raise ValueError(f"{pdf_path.name} has no page {page_number}")
+        pixmap = document.load_page(page_number - 1).get_pixmap(dpi=dpi, alpha=False)
+        return pixmap.tobytes("jpeg", jpg_quality=PAGE_QUALITY)
@@ -0,0 +1,294 @@
+"""
+Near-duplicate question detection with MinHash + LSH
+
+Overlapping exam sets put the same question into the bank many times
+(re-scanned pages, the same question in two exams, small OCR differences).
+Each question's text is normalized, cut into character shingles and
+summarized by a MinHash signature; LSH banding puts signatures that agree
+on a whole band into the same bucket, so a new question is only compared
+with the few earlier questions sharing a bucket instead of with all of
+them. Matches are confirmed by the estimated Jaccard similarity.
+
+Features:
+- Normalization: Unicode folding, accents and "Câu N" numbering removed,
+  punctuation and whitespace collapsed
+- One-permutation MinHash (one hash per shingle, densified), pure Python
+- Bands/rows chosen from the similarity threshold
+- Exact duplicates short-circuited by hash
+- Keeps the first occurrence; later near-duplicates map to it
+"""
+
+import hashlib
+import json
+import os
+import re
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_NUM_PERM = 128
+SHINGLE_SIZE = 5
+
+_MAX_HASH = 1 << 64
+_NUMBERING = re.compile(r'^\s*(?:(?:câu|cau|question|bài|bai|q)\s*\d+|\d+)\s*[\.\):]?\s*')
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def normalize_question_text(text: str) -> str:
+    """
+    Text reduced to what identifies a question
+
+    Args:
+        text: Extracted question text
+
+    Returns:
+        Lowercase, accent-free words separated by single spaces, without the
+        leading question number
+    """
+    text = unicodedata.normalize('NFKD', text.lower().replace('đ', 'd'))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = _NUMBERING.sub('', text, count=1)
+    return _NON_WORD.sub(' ', text).strip()
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> List[str]:
+    """
+    Overlapping character n-grams of normalized text
+
+    Args:
+        text: Normalized text
+        size: Characters per shingle
+
+    Returns:
+        Shingles (the whole text when it is shorter than one shingle)
+    """
+    if len(text) <= size:
+        return [text] if text else []
+    return [text[i:i + size] for i in range(len(text) - size + 1)]
+
+
+def minhash_signature(text: str, num_perm: int = DEFAULT_NUM_PERM) -> Optional[Tuple[int, ...]]:
+    """
+    One-permutation MinHash signature of normalized text
+
+    Each shingle is hashed once; the hash picks a bin and the smallest value
+    per bin is kept. Empty bins borrow the next non-empty bin (rotation
+    densification), so every slot is filled and two signatures agree on a
+    slot with probability ~ the Jaccard similarity of the shingle sets.
+
+    Args:
+        text: Normalized text
+        num_perm: Signature length
+
+    Returns:
+        Signature, or None for empty text
+    """
+    grams = set(shingles(text))
+    if not grams:
+        return None
+
+    bins: List[Optional[int]] = [None] * num_perm
+    for gram in grams:
+        value = int.from_bytes(hashlib.blake2b(gram.encode('utf-8'), digest_size=8).digest(), 'little')
+        slot, rank = divmod(value, _MAX_HASH // num_perm + 1)
+        slot %= num_perm
+        if bins[slot] is None or rank < bins[slot]:
+            bins[slot] = rank
+
+    # Rotation densification: offset by the distance so borrowed values differ
+    # from the bin they came from
+    offset = _MAX_HASH // num_perm + 1
+    signature = []
+    for slot in range(num_perm):
+        distance = 0
+        while bins[(slot + distance) % num_perm] is None:
+            distance += 1
+        signature.append(bins[(slot + distance) % num_perm] + distance * offset)
+    return tuple(signature)
+
+
+def signature_similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity (fraction of equal slots)"""
+    return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+
+def lsh_bands(threshold: float, num_perm: int = DEFAULT_NUM_PERM) -> Tuple[int, int]:
+    """
+    Bands and rows per band for a similarity threshold
+
+    Picks the split whose S-curve 1 - (1 - s^rows)^bands best separates pairs
+    below and above the threshold (false positive + false negative area).
+
+    Args:
+        threshold: Jaccard similarity considered a duplicate
+        num_perm: Signature length
+
+    Returns:
+        (bands, rows)
+    """
+    steps = 200
+
+    def area(start: float, end: float, bands: int, rows: int, below: bool) -> float:
+        total = 0.0
+        for i in range(steps):
+            s = start + (end - start) * (i + 0.5) / steps
+            hit = 1 - (1 - s ** rows) ** bands
+            total += (hit if below else 1 - hit) * (end - start) / steps
+        return total
+
+    best = None
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            error = area(0.0, threshold, bands, rows, True) + area(threshold, 1.0, bands, rows, False)
+            if best is None or error < best[0]:
+                best = (error, bands, rows)
+    return best[1], best[2]
+
+
+class NearDuplicateIndex:
+    """
+    Streaming near-duplicate detector (first occurrence wins)
+
+    Usage:
+        index = NearDuplicateIndex(threshold=0.8)
+        for name, text in questions:
+            match = index.add(name, text)
+            if match:
+                canonical, similarity = match
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM):
+        """
+        Initialize the index
+
+        Args:
+            threshold: Estimated Jaccard similarity from which two questions are duplicates
+            num_perm: Signature length (more = more precise, slower)
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        self._buckets: List[Dict[Tuple[int, ...], List[str]]] = [{} for _ in range(self.bands)]
+        self._signatures: Dict[str, Tuple[int, ...]] = {}
+        self._exact: Dict[str, str] = {}
+        self.comparisons = 0
+
+    def add(self, key: str, text: str) -> Optional[Tuple[str, float]]:
+        """
+        Check a question against the kept ones and keep it if it is new
+
+        Args:
+            key: Question identifier (file name)
+            text: Question text
+
+        Returns:
+            (canonical key, similarity) if it duplicates a kept question, else None
+        """
+        normalized = normalize_question_text(text)
+        if not normalized:
+            return None
+
+        digest = hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).hexdigest()
+        if digest in self._exact:
+            return self._exact[digest], 1.0
+
+        signature = minhash_signature(normalized, self.num_perm)
+        bands = [signature[band * self.rows:(band + 1) * self.rows] for band in range(self.bands)]
+
+        candidates = set()
+        for band, values in enumerate(bands):
+            candidates.update(self._buckets[band].get(values, ()))
+
+        best = None
+        for candidate in candidates:
+            self.comparisons += 1
+            similarity = signature_similarity(signature, self._signatures[candidate])
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (candidate, similarity)
+        if best is not None:
+            return best
+
+        self._exact[digest] = key
+        self._signatures[key] = signature
+        for band, values in enumerate(bands):
+            self._buckets[band].setdefault(values, []).append(key)
+        return None
+
+
+class DedupMap:
+    """
+    Result of a dedup run: which questions are kept and what each dropped
+    one duplicates
+    """
+
+    def __init__(self, threshold: float, num_perm: int, bands: int, rows: int):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = rows
+        self.unique: List[str] = []
+        self.duplicates: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, key: str, match: Optional[Tuple[str, float]]):
+        """Record one question and the result of NearDuplicateIndex.add()"""
+        if match is None:
+            self.unique.append(key)
+        else:
+            self.duplicates[key] = {"canonical": match[0], "similarity": round(match[1], 3)}
+
+    def groups(self) -> Dict[str, List[str]]:
+        """Kept question -> its duplicates (only questions that have some)"""
+        groups: Dict[str, List[str]] = {}
+        for key, entry in self.duplicates.items():
+            groups.setdefault(entry["canonical"], []).append(key)
+        return groups
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready dedup map"""
+        return {
+            "threshold": self.threshold,
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "rows": self.rows,
+            "files": len(self.unique) + len(self.duplicates),
+            "unique": len(self.unique),
+            "duplicates": self.duplicates,
+            "groups": self.groups(),
+        }
+
+    def save(self, path: Union[str, Path], **extra: Any):
+        """
+        Write the map atomically
+
+        Args:
+            path: JSON file path
+            **extra: Additional top-level fields (e.g. source_folder)
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = dict(extra)
+        data.update(self.to_dict())
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+
+def format_dedup_stats(dedup_map: DedupMap, comparisons: int) -> str:
+    """
+    One-line dedup summary
+
+    Args:
+        dedup_map: Finished map
+        comparisons: Signature comparisons made (NearDuplicateIndex.comparisons)
+
+    Returns:
+        Formatted text
+    """
+    total = len(dedup_map.unique) + len(dedup_map.duplicates)
+    return (
+        f"{len(dedup_map.unique)}/{total} unique, {len(dedup_map.duplicates)} near-duplicates "
+        f"in {len(dedup_map.groups())} groups (threshold {dedup_map.threshold}, "
+        f"{dedup_map.bands}x{dedup_map.rows} LSH bands, {comparisons:,} comparisons)"
+    )
@@ -0,0 +1,532 @@
+"""
+Structured question store with full-text search
+
+Every `_extracted.txt` file is parsed once into a record (question number,
+stem, options A-D, source image, model, tokens) and kept in one SQLite
+file with an FTS5 index, so lookups like "all questions mentioning
+normalization" are a query instead of a folder scan plus regexes. The
+store is updated incrementally: files whose size/mtime did not change are
+not re-read, touched-but-identical files are detected by hash, and deleted
+files are dropped.
+
+Features:
+- Parses both output layouts (image_text_extractor.py and extract_images.py)
+- Options A-D split from "A. ...", "B) ..." lines (also several on one line)
+- FTS5 index (bm25 ranking, snippets, accent-insensitive for Vietnamese);
+  LIKE fallback when SQLite is built without FTS5
+- Incremental sync by size/mtime + sha256
+- Thread-safe (one connection guarded by a lock, WAL journal)
+- Can be filled by join_questions.py --index during its single scan
+
+Usage:
+    python question_store.py build --input-folder extracted_texts
+    python question_store.py search "normalization" --input-folder extracted_texts
+    python question_store.py show 12 --input-folder extracted_texts
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+DEFAULT_DB_NAME = "questions.sqlite"
+
+OPTION_LETTERS = "ABCD"
+
+_SEPARATOR_LINE = re.compile(r'^.*={40}.*$', re.MULTILINE)
+_METADATA_LINE = re.compile(r'^(Image|Model|Retry Round|Timestamp|Duplicate Of|Tokens used):\s*(.*)$')
+_METADATA_TITLE = "EXTRACTED TEXT METADATA"
+# "A. text", "B) text", "(C) text", "D: text" at the start of a line or after whitespace
+_OPTION = re.compile(r'(?:^|(?<=\s))\(?([A-D])[\.\):]\s+', re.MULTILINE)
+_NUMBER = re.compile(r'^\s*(?:\*\*)?(?:Câu|Cau|Question|Bài|Q)\s*(\d+)|^\s*(\d+)[\.\)]\s', re.IGNORECASE)
+_FILE_NUMBER = re.compile(r'q(\d+)', re.IGNORECASE)
+
+
+def parse_extracted_text(content: str, file_name: str = "") -> Dict[str, Any]:
+    """
+    Parse an extracted text file into a structured question record
+
+    Args:
+        content: File content
+        file_name: File name (question number fallback: qN in the name)
+
+    Returns:
+        Dict with number, stem, options (letter -> text), text, image,
+        model, tokens
+    """
+    # Segments between separator lines; the body is the longest segment that
+    # is not only "Key: value" metadata
+    segments = _SEPARATOR_LINE.split(content)
+    metadata: Dict[str, str] = {}
+    body = ""
+    for segment in segments:
+        lines = [line.strip() for line in segment.strip().splitlines() if line.strip()]
+        fields = [_METADATA_LINE.match(line) for line in lines]
+        if lines and all(match or line == _METADATA_TITLE for match, line in zip(fields, lines)):
+            for match in fields:
+                if match:
+                    metadata.setdefault(match.group(1), match.group(2).strip())
+        elif len(segment.strip()) > len(body):
+            body = segment.strip()
+
+    record = {
+        "number": None,
+        "stem": body,
+        "options": {},
+        "text": body,
+        "image": metadata.get("Image"),
+        "model": metadata.get("Model"),
+        "tokens": int(metadata["Tokens used"]) if metadata.get("Tokens used", "").isdigit() else None,
+    }
+
+    number = _NUMBER.search(body)
+    if number:
+        record["number"] = int(number.group(1) or number.group(2))
+    else:
+        match = _FILE_NUMBER.search(file_name)
+        if match:
+            record["number"] = int(match.group(1))
+
+    # Options: A-D in order, each running until the next one
+    starts = []
+    expected = 0
+    for match in _OPTION.finditer(body):
+        if expected < len(OPTION_LETTERS) and match.group(1) == OPTION_LETTERS[expected]:
+            starts.append(match)
+            expected += 1
+    if len(starts) >= 2:
+        record["stem"] = body[:starts[0].start()].strip()
+        for index, match in enumerate(starts):
+            end = starts[index + 1].start() if index + 1 < len(starts) else len(body)
+            record["options"][match.group(1)] = " ".join(body[match.end():end].split())
+
+    return record
+
+
+def fts_query(text: str) -> str:
+    """
+    Turn free text into an FTS5 query (every word must match)
+
+    Args:
+        text: Words typed by the user
+
+    Returns:
+        FTS5 MATCH expression with each word quoted
+    """
+    return " ".join('"' + word.replace('"', '""') + '"' for word in text.split())
+
+
+class QuestionStore:
+    """
+    SQLite store of parsed questions with full-text search
+
+    Usage:
+        store = QuestionStore("extracted_texts/questions.sqlite")
+        store.sync_folder("extracted_texts")
+        for row in store.search("normalization"):
+            print(row["number"], row["snippet"])
+        store.close()
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Open (or create) the store
+
+        Args:
+            path: SQLite file path
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS questions ("
+            " id INTEGER PRIMARY KEY,"
+            " source TEXT UNIQUE NOT NULL,"
+            " number INTEGER,"
+            " stem TEXT NOT NULL,"
+            " options TEXT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " image TEXT,"
+            " model TEXT,"
+            " tokens INTEGER,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " hash TEXT NOT NULL,"
+            " updated REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS questions_number ON questions(number)")
+        self.fts = self._create_fts()
+        self._conn.commit()
+
+    def _create_fts(self) -> bool:
+        """Create the FTS5 index + sync triggers; False if SQLite lacks FTS5"""
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'questions_fts'"
+        ).fetchone()
+        if exists:
+            return True
+
+        # Accent-insensitive tokenizer when available (SQLite >= 3.27)
+        for tokenize in ("unicode61 remove_diacritics 2", "unicode61"):
+            try:
+                self._conn.execute(
+                    "CREATE VIRTUAL TABLE questions_fts USING fts5("
+                    f"stem, options, text, content='questions', content_rowid='id', tokenize='{tokenize}')"
+                )
+                break
+            except sqlite3.OperationalError as e:
+                if "no such module" in str(e):
+                    return False
+        else:
+            return False
+
+        self._conn.executescript(
+            "CREATE TRIGGER questions_ai AFTER INSERT ON questions BEGIN"
+            " INSERT INTO questions_fts(rowid, stem, options, text)"
+            " VALUES (new.id, new.stem, new.options, new.text); END;"
+            "CREATE TRIGGER questions_ad AFTER DELETE ON questions BEGIN"
+            " INSERT INTO questions_fts(questions_fts, rowid, stem, options, text)"
+            " VALUES ('delete', old.id, old.stem, old.options, old.text); END;"
+            "CREATE TRIGGER questions_au AFTER UPDATE ON questions BEGIN"
+            " INSERT INTO questions_fts(questions_fts, rowid, stem, options, text)"
+            " VALUES ('delete', old.id, old.stem, old.options, old.text);"
+            " INSERT INTO questions_fts(rowid, stem, options, text)"
+            " VALUES (new.id, new.stem, new.options, new.text); END;"
+        )
+        # Index rows stored before FTS existed
+        self._conn.execute("INSERT INTO questions_fts(questions_fts) VALUES ('rebuild')")
+        return True
+
+    def is_current(self, source: Union[str, Path], stat: os.stat_result) -> bool:
+        """
+        Whether a source is stored with this size and mtime
+
+        Args:
+            source: Extracted file path
+            stat: Its os.stat() result
+
+        Returns:
+            True if it does not need re-reading
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns FROM questions WHERE source = ?", (self._key(source),)
+            ).fetchone()
+        return row is not None and row["size"] == stat.st_size and row["mtime_ns"] == stat.st_mtime_ns
+
+    def upsert(
+        self,
+        source: Union[str, Path],
+        data: bytes,
+        stat: os.stat_result,
+        digest: Optional[str] = None,
+        content: Optional[str] = None
+    ) -> str:
+        """
+        Store (or refresh) one extracted file
+
+        Args:
+            source: Extracted file path
+            data: Raw file bytes
+            stat: os.stat() of the file
+            digest: sha256 of data (computed when None)
+            content: data already decoded (decoded here when None)
+
+        Returns:
+            "added", "updated" or "unchanged" (same hash, only size/mtime refreshed)
+        """
+        key = self._key(source)
+        digest = digest or hashlib.sha256(data).hexdigest()
+
+        with self._lock:
+            row = self._conn.execute("SELECT hash FROM questions WHERE source = ?", (key,)).fetchone()
+            if row is not None and row["hash"] == digest:
+                self._conn.execute(
+                    "UPDATE questions SET size = ?, mtime_ns = ? WHERE source = ?",
+                    (stat.st_size, stat.st_mtime_ns, key)
+                )
+                self._conn.commit()
+                return "unchanged"
+
+        if content is None:
+            content = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+        record = parse_extracted_text(content, Path(source).name)
+        values = (
+            record["number"], record["stem"], json.dumps(record["options"], ensure_ascii=False),
+            record["text"], record["image"], record["model"], record["tokens"],
+            stat.st_size, stat.st_mtime_ns, digest, time.time()
+        )
+
+        with self._lock:
+            if row is None:
+                self._conn.execute(
+                    "INSERT INTO questions (number, stem, options, text, image, model, tokens,"
+                    " size, mtime_ns, hash, updated, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    values + (key,)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE questions SET number = ?, stem = ?, options = ?, text = ?, image = ?, model = ?,"
+                    " tokens = ?, size = ?, mtime_ns = ?, hash = ?, updated = ? WHERE source = ?",
+                    values + (key,)
+                )
+            self._conn.commit()
+        return "added" if row is None else "updated"
+
+    def remove_missing(self, folder: Union[str, Path], present: List[Union[str, Path]]) -> int:
+        """
+        Drop stored sources of a folder that are no longer on disk
+
+        Args:
+            folder: Folder that was scanned
+            present: Sources found in it
+
+        Returns:
+            Number of removed questions
+        """
+        prefix = self._key(folder).rstrip(os.sep) + os.sep
+        keep = {self._key(source) for source in present}
+        with self._lock:
+            stored = [
+                row["source"] for row in self._conn.execute(
+                    "SELECT source FROM questions WHERE substr(source, 1, ?) = ?", (len(prefix), prefix)
+                )
+            ]
+            gone = [source for source in stored if source not in keep]
+            self._conn.executemany("DELETE FROM questions WHERE source = ?", [(source,) for source in gone])
+            self._conn.commit()
+        return len(gone)
+
+    def sync_folder(self, folder: Union[str, Path], pattern: str = "*_extracted.txt") -> Dict[str, int]:
+        """
+        Bring the store up to date with a folder of extracted files
+
+        Args:
+            folder: Folder containing extracted text files
+            pattern: Glob pattern for matching files
+
+        Returns:
+            Dict with added, updated, unchanged, skipped (size/mtime
+            unchanged, not read), removed, errors
+        """
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "skipped": 0, "removed": 0, "errors": 0}
+        files = sorted(Path(folder).glob(pattern))
+
+        for file_path in files:
+            try:
+                with open(file_path, 'rb') as f:
+                    stat = os.fstat(f.fileno())
+                    if self.is_current(file_path, stat):
+                        stats["skipped"] += 1
+                        continue
+                    data = f.read()
+                stats[self.upsert(file_path, data, stat)] += 1
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"    Error reading {file_path.name}: {e}")
+                stats["errors"] += 1
+
+        stats["removed"] = self.remove_missing(folder, files)
+        return stats
+
+    def search(self, text: str, limit: int = 20, raw: bool = False) -> List[Dict[str, Any]]:
+        """
+        Full-text search
+
+        Args:
+            text: Words that must all appear (or an FTS5 expression when raw)
+            limit: Max results
+            raw: Pass `text` to FTS5 MATCH unchanged (column filters, OR, NEAR, prefix*)
+
+        Returns:
+            Question dicts (best match first) with a "snippet" field
+        """
+        with self._lock:
+            if self.fts:
+                rows = self._conn.execute(
+                    "SELECT q.*, snippet(questions_fts, -1, '[', ']', '…', 12) AS snippet"
+                    " FROM questions_fts JOIN questions q ON q.id = questions_fts.rowid"
+                    " WHERE questions_fts MATCH ? ORDER BY bm25(questions_fts) LIMIT ?",
+                    (text if raw else fts_query(text), limit)
+                ).fetchall()
+            else:
+                words = text.split()
+                where = " AND ".join("text LIKE ?" for _ in words) or "1"
+                rows = self._conn.execute(
+                    f"SELECT *, substr(stem, 1, 120) AS snippet FROM questions WHERE {where}"
+                    " ORDER BY number LIMIT ?",
+                    [f"%{word}%" for word in words] + [limit]
+                ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def get(self, number: int) -> List[Dict[str, Any]]:
+        """
+        Questions with a given number (one per source folder, usually)
+
+        Args:
+            number: Question number
+
+        Returns:
+            Question dicts
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM questions WHERE number = ? ORDER BY source", (number,)
+            ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def count(self) -> int:
+        """Number of stored questions"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+
+    def close(self):
+        """Close the database"""
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _key(source: Union[str, Path]) -> str:
+        return str(Path(source).resolve())
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> Dict[str, Any]:
+        record = dict(row)
+        record["options"] = json.loads(record["options"])
+        return record
+
+
+class QuestionStoreSink:
+    """
+    join_questions.py output that updates a QuestionStore from the same
+    scan as the other outputs (no second read of the folder)
+    """
+
+    def __init__(self, store: QuestionStore):
+        self.store = store
+        self.stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+        self._files: List[Path] = []
+        self._folder = "."
+
+    def start(self, files: List[Path], source_folder: str):
+        """Remember the scanned files (called once, before the first record)"""
+        self._files = files
+        self._folder = source_folder
+
+    def add(self, record: Dict[str, Any]):
+        """Store one question"""
+        if self.store.is_current(record["path"], record["stat"]):
+            self.stats["unchanged"] += 1
+            return
+        status = self.store.upsert(record["path"], record["data"], record["stat"], record["hash"], record["content"])
+        self.stats[status] += 1
+
+    def close(self):
+        """Drop questions whose files are gone"""
+        self.stats["removed"] = self.store.remove_missing(self._folder, self._files)
+
+    def abort(self):
+        """Keep every stored question (the scan did not finish)"""
+
+
+def format_question(record: Dict[str, Any]) -> str:
+    """
+    Human readable question (number, source, stem, options)
+
+    Args:
+        record: Question dict from QuestionStore
+
+    Returns:
+        Formatted text
+    """
+    lines = [f"Q{record['number'] if record['number'] is not None else '?'} - {Path(record['source']).name}"
+             f" ({record.get('model') or 'unknown model'})"]
+    lines.append(record["stem"])
+    for letter, option in record["options"].items():
+        lines.append(f"  {letter}. {option}")
+    return "\n".join(lines)
+
+
+def main():
+    """Main entry point"""
+    parser = argparse.ArgumentParser(
+        description="Build and query the structured question index",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Index (or update the index of) an extraction folder
+  python question_store.py build --input-folder extracted_texts
+
+  # Questions mentioning normalization (accents are optional)
+  python question_store.py search "normalization" --input-folder extracted_texts
+
+  # FTS5 syntax: column filter, prefix, OR
+  python question_store.py search "stem:chuan* OR options:BCNF" --raw
+
+  # Show question 12
+  python question_store.py show 12
+        """
+    )
+    parser.add_argument('command', choices=['build', 'search', 'show'], help='What to do')
+    parser.add_argument('query', nargs='?', help='Search words (search) or question number (show)')
+    parser.add_argument('--input-folder', default='extracted_texts',
+                        help='Folder containing extracted text files (default: extracted_texts)')
+    parser.add_argument('--db', default=None,
+                        help=f'SQLite store (default: <input-folder>/{DEFAULT_DB_NAME})')
+    parser.add_argument('--pattern', default='*_extracted.txt',
+                        help='Glob pattern for matching files (default: *_extracted.txt)')
+    parser.add_argument('--limit', type=int, default=20, help='Max search results (default: 20)')
+    parser.add_argument('--raw', action='store_true', help='Pass the query to FTS5 unchanged')
+
+    args = parser.parse_args()
+
+    if args.command != 'build' and not args.query:
+        parser.error(f"{args.command} needs a query")
+
+    store = QuestionStore(args.db or Path(args.input_folder) / DEFAULT_DB_NAME)
+    try:
+        if args.command == 'build':
+            start = time.perf_counter()
+            stats = store.sync_folder(args.input_folder, args.pattern)
+            print(f" Indexed {args.input_folder} in {time.perf_counter() - start:.2f}s: "
+                  f"{stats['added']} added, {stats['updated']} updated, "
+                  f"{stats['skipped'] + stats['unchanged']} unchanged, {stats['removed']} removed"
+                  f"{', %d errors' % stats['errors'] if stats['errors'] else ''}")
+            print(f" Store: {store.path} ({store.count()} questions"
+                  f"{'' if store.fts else ', no FTS5: LIKE search'})")
+
+        elif args.command == 'search':
+            start = time.perf_counter()
+            try:
+                results = store.search(args.query, limit=args.limit, raw=args.raw)
+            except sqlite3.OperationalError as e:
+                print(f" Error: invalid query ({e})")
+                sys.exit(1)
+            print(f" {len(results)} results in {(time.perf_counter() - start) * 1000:.1f} ms\n")
+            for record in results:
+                print(f"Q{record['number']} - {Path(record['source']).name}: {' '.join(record['snippet'].split())}")
+
+        else:
+            if not args.query.isdigit():
+                parser.error("show needs a question number")
+            records = store.get(int(args.query))
+            if not records:
+                print(f" Question {args.query} not found")
+            for record in records:
+                print(format_question(record) + "\n")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
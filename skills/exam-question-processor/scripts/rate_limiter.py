@@ -0,0 +1,387 @@
+"""
+Adaptive rate limiter shared by the vision extractors
+
+Keeps one token bucket per model and adjusts its refill rate AIMD-style:
+every 429 cuts the rate by a constant factor, and every successful request
+raises it again. Like TCP slow start, a model that has not been rate limited
+yet grows its rate multiplicatively, so a client that is never throttled by
+the provider is not throttled by the limiter either; after the first 429 (or
+once the rate reaches an X-RateLimit ceiling) it switches to additive
+increase. Retry-After and X-RateLimit-* response headers are used to pause a
+model exactly until the provider allows more traffic.
+
+Features:
+- Per-model request buckets (optional per-model token buckets)
+- Slow start, then additive increase / multiplicative decrease of the send rate
+- Retry-After (seconds or HTTP date) and X-RateLimit-Remaining/Reset parsing
+- Thread-safe, so it can be shared by concurrent workers
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header value
+
+    Args:
+        value: Header value (delta seconds or HTTP date)
+
+    Returns:
+        Seconds to wait, or None if the value is missing/invalid
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def parse_reset_seconds(value: Optional[str]) -> Optional[float]:
+    """
+    Parse an X-RateLimit-Reset header value into seconds from now
+
+    Providers disagree on the unit: OpenRouter sends an epoch timestamp in
+    milliseconds, others send epoch seconds or a plain delta in seconds.
+
+    Args:
+        value: Header value
+
+    Returns:
+        Seconds until the window resets, or None if invalid
+    """
+    if not value:
+        return None
+
+    try:
+        number = float(value.strip())
+    except ValueError:
+        return None
+
+    if number > 1e12:  # Epoch milliseconds
+        return max(0.0, number / 1000 - time.time())
+    if number > 1e9:  # Epoch seconds
+        return max(0.0, number - time.time())
+    return max(0.0, number)
+
+
+def _header(headers: Optional[Mapping[str, str]], name: str) -> Optional[str]:
+    """Case-insensitive header lookup that also works on plain dicts"""
+    if not headers:
+        return None
+    value = headers.get(name)
+    if value is None:
+        lowered = name.lower()
+        for key, candidate in headers.items():
+            if key.lower() == lowered:
+                return candidate
+    return value
+
+
+class _TokenBucket:
+    """Token bucket with a mutable refill rate (units per second)"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.level = burst
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.burst, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until `amount` units are available (0 if available now)"""
+        missing = min(amount, self.burst) - self.level
+        if missing <= 0:
+            return 0.0
+        return missing / self.rate if self.rate > 0 else float('inf')
+
+
+class _ModelState:
+    """Rate limiting state for a single model"""
+
+    def __init__(self, limiter: 'AdaptiveRateLimiter'):
+        rps = limiter.initial_rpm / 60
+        self.requests = _TokenBucket(rps, max(1.0, limiter.min_burst, rps * limiter.burst_seconds))
+        self.tokens = None
+        if limiter.tokens_per_minute:
+            tps = limiter.tokens_per_minute / 60
+            self.tokens = _TokenBucket(tps, tps * limiter.burst_seconds)
+        self.blocked_until = 0.0
+        self.last_decrease = float('-inf')
+        self.rate_ceiling = limiter.max_rpm / 60
+        # Multiplicative growth until the first sign of a provider limit
+        self.slow_start = True
+        self.successes = 0
+        self.rate_limited = 0
+        self.waited_seconds = 0.0
+
+
+class AdaptiveRateLimiter:
+    """
+    AIMD token-bucket rate limiter with slow start, keyed by model name
+
+    Usage:
+        limiter = AdaptiveRateLimiter(initial_rpm=30)
+        limiter.acquire(model)
+        response = session.post(...)
+        if response.status_code == 429:
+            limiter.on_rate_limited(model, response.headers)
+        else:
+            limiter.on_success(model, response.headers, tokens_used=...)
+    """
+
+    def __init__(
+        self,
+        initial_rpm: float = 120.0,
+        min_rpm: float = 1.0,
+        max_rpm: float = 1200.0,
+        increase_rpm: float = 5.0,
+        slow_start_factor: float = 1.5,
+        decrease_factor: float = 0.5,
+        burst_seconds: float = 2.0,
+        tokens_per_minute: Optional[float] = None
+    ):
+        """
+        Initialize the limiter
+
+        Args:
+            initial_rpm: Starting send rate per model (requests/minute)
+            min_rpm: Lower bound for the adaptive rate
+            max_rpm: Upper bound for the adaptive rate
+            increase_rpm: Additive increase applied after each success
+                (after slow start)
+            slow_start_factor: Rate multiplier applied after each success until
+                the first 429 or X-RateLimit ceiling (1 = no slow start)
+            decrease_factor: Multiplicative decrease applied after a 429
+            burst_seconds: Bucket capacity expressed in seconds of traffic
+            tokens_per_minute: Optional token budget per model (None = unlimited)
+        """
+        if not 0 < decrease_factor < 1:
+            raise ValueError("decrease_factor must be between 0 and 1")
+        if slow_start_factor < 1:
+            raise ValueError("slow_start_factor must be >= 1")
+        if not 0 < min_rpm <= initial_rpm <= max_rpm:
+            raise ValueError("Expected 0 < min_rpm <= initial_rpm <= max_rpm")
+
+        self.initial_rpm = initial_rpm
+        self.min_rpm = min_rpm
+        self.max_rpm = max_rpm
+        self.increase_rpm = increase_rpm
+        self.slow_start_factor = slow_start_factor
+        self.decrease_factor = decrease_factor
+        self.burst_seconds = burst_seconds
+        self.tokens_per_minute = tokens_per_minute
+        self.min_burst = 1.0
+
+        self._lock = threading.Lock()
+        self._models: Dict[str, _ModelState] = {}
+
+    def _set_rate(self, state: _ModelState, rps: float):
+        """Change the send rate; the burst follows it (caller holds the lock)"""
+        bucket = state.requests
+        bucket.rate = rps
+        floor = self.min_burst if state.slow_start else 1.0
+        bucket.burst = max(floor, rps * self.burst_seconds)
+        bucket.level = min(bucket.level, bucket.burst)
+
+    def set_concurrency(self, workers: int):
+        """
+        Let the first requests of all workers go out without waiting
+
+        Until a model leaves slow start its bucket holds at least one request
+        per worker, so the starting rate does not queue the first wave.
+
+        Args:
+            workers: Requests that may be in flight at once
+        """
+        with self._lock:
+            self.min_burst = max(1.0, float(workers))
+            for state in self._models.values():
+                if state.slow_start:
+                    self._set_rate(state, state.requests.rate)
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._models.get(model)
+        if state is None:
+            state = self._models[model] = _ModelState(self)
+        return state
+
+    def acquire(self, model: str, tokens: int = 0) -> float:
+        """
+        Block until a request to `model` may be sent
+
+        Args:
+            model: Model identifier
+            tokens: Estimated tokens for the request (only used with a token budget)
+
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                state = self._state(model)
+                now = time.monotonic()
+                state.requests.refill(now)
+                wait = max(state.blocked_until - now, state.requests.time_until(1))
+                if state.tokens is not None and tokens:
+                    state.tokens.refill(now)
+                    wait = max(wait, state.tokens.time_until(tokens))
+
+                if wait <= 0:
+                    state.requests.level -= 1
+                    if state.tokens is not None and tokens:
+                        state.tokens.level -= min(tokens, state.tokens.burst)
+                    state.waited_seconds += waited
+                    return waited
+
+            time.sleep(wait)
+            waited += wait
+
+    def on_success(
+        self,
+        model: str,
+        headers: Optional[Mapping[str, str]] = None,
+        tokens_used: int = 0,
+        tokens_reserved: int = 0
+    ):
+        """
+        Record a successful request and increase the rate
+
+        Multiplicative during slow start, additive afterwards.
+
+        Args:
+            model: Model identifier
+            headers: Response headers (X-RateLimit-* are honored)
+            tokens_used: Actual tokens consumed (from the usage block)
+            tokens_reserved: Tokens passed to acquire() for this request
+        """
+        with self._lock:
+            state = self._state(model)
+            state.successes += 1
+
+            bucket = state.requests
+            now = time.monotonic()
+            bucket.refill(now)
+            if state.slow_start:
+                new_rpm = bucket.rate * 60 * self.slow_start_factor
+            else:
+                new_rpm = bucket.rate * 60 + self.increase_rpm
+            new_rps = min(new_rpm, self.max_rpm) / 60
+            if new_rps >= state.rate_ceiling:
+                new_rps = state.rate_ceiling
+                state.slow_start = False
+            self._set_rate(state, new_rps)
+
+            if state.tokens is not None and tokens_used and tokens_reserved:
+                # Settle the difference between the estimate and real usage
+                state.tokens.level -= tokens_used - tokens_reserved
+
+            self._apply_headers(state, headers)
+
+    def on_rate_limited(self, model: str, headers: Optional[Mapping[str, str]] = None) -> float:
+        """
+        Record a 429 response and multiplicatively decrease the rate
+
+        Args:
+            model: Model identifier
+            headers: Response headers (Retry-After, X-RateLimit-*)
+
+        Returns:
+            Seconds until the next request to `model` will be allowed
+        """
+        with self._lock:
+            state = self._state(model)
+            state.rate_limited += 1
+            now = time.monotonic()
+
+            bucket = state.requests
+            bucket.refill(now)
+            state.slow_start = False
+            # Concurrent 429s from one congestion event only count once
+            if now - state.last_decrease >= self.burst_seconds:
+                new_rpm = max(bucket.rate * 60 * self.decrease_factor, self.min_rpm)
+                self._set_rate(state, new_rpm / 60)
+                state.last_decrease = now
+            bucket.level = 0.0
+
+            retry_after = parse_retry_after(_header(headers, 'Retry-After'))
+            if retry_after is None:
+                retry_after = 1 / bucket.rate
+            state.blocked_until = max(state.blocked_until, now + retry_after)
+
+            self._apply_headers(state, headers)
+            return max(0.0, state.blocked_until - now)
+
+    def _apply_headers(self, state: _ModelState, headers: Optional[Mapping[str, str]]):
+        """Use X-RateLimit-* headers to bound the rate (caller holds the lock)"""
+        remaining = _header(headers, 'X-RateLimit-Remaining')
+        reset = parse_reset_seconds(_header(headers, 'X-RateLimit-Reset'))
+        if remaining is None or reset is None:
+            return
+
+        try:
+            remaining = float(remaining)
+        except ValueError:
+            return
+
+        now = time.monotonic()
+        if remaining <= 0:
+            # Window exhausted: pause until it resets
+            state.blocked_until = max(state.blocked_until, now + reset)
+        elif reset > 0:
+            # Never send faster than the remaining budget can sustain
+            sustainable = remaining / reset
+            state.rate_ceiling = max(sustainable, self.min_rpm / 60)
+            if state.requests.rate >= state.rate_ceiling:
+                state.slow_start = False
+                self._set_rate(state, state.rate_ceiling)
+
+    def current_rpm(self, model: str) -> float:
+        """
+        Current send rate for a model
+
+        Args:
+            model: Model identifier
+
+        Returns:
+            Requests per minute
+        """
+        with self._lock:
+            return self._state(model).requests.rate * 60
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Snapshot of per-model limiter statistics
+
+        Returns:
+            Dict of model -> {rpm, slow_start, successes, rate_limited, waited_seconds}
+        """
+        with self._lock:
+            return {
+                model: {
+                    "rpm": round(state.requests.rate * 60, 2),
+                    "slow_start": state.slow_start,
+                    "successes": state.successes,
+                    "rate_limited": state.rate_limited,
+                    "waited_seconds": round(state.waited_seconds, 2),
+                }
+                for model, state in self._models.items()
+            }
@@ -0,0 +1,222 @@
+"""
+Per-image request metrics with JSONL export and latency percentiles
+
+One record is written per extracted image: where its time went (prepare,
+encode, rate-limit wait, time-to-first-byte, total latency), how many bytes
+were uploaded, token usage, model, attempts and why earlier attempts were
+retried. The summary gives p50/p95/p99 latency and throughput overall and
+per model, so slow batches and models can be compared objectively.
+
+Features:
+- JSONL export (one line per image, flushed as it happens)
+- p50/p95/p99 latency and TTFB, images/minute throughput
+- Time-to-first-token and truncated outputs for streamed requests
+- Per-model breakdown (count, success rate, latency percentiles, tokens)
+- Thread-safe
+"""
+
+import json
+import math
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """
+    Linear-interpolated percentile
+
+    Args:
+        values: Samples (any order)
+        q: Percentile in [0, 100]
+
+    Returns:
+        Percentile value, or None for no samples
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _distribution(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "p50": _round(percentile(values, 50)),
+        "p95": _round(percentile(values, 95)),
+        "p99": _round(percentile(values, 99)),
+        "max": _round(max(values)) if values else None,
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 3)
+
+
+class MetricsRecorder:
+    """
+    Collect per-image metrics and optionally stream them to a JSONL file
+
+    Usage:
+        metrics = MetricsRecorder("out/metrics.jsonl")
+        metrics.record(image="q1.jpeg", model="...", latency_seconds=1.2, ...)
+        print(format_metrics_summary(metrics.summary()))
+        metrics.close()
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        """
+        Initialize the recorder
+
+        Args:
+            path: JSONL file to append records to (None = memory only)
+        """
+        self.path = Path(path) if path else None
+        self._lock = threading.Lock()
+        self._records: List[Dict[str, Any]] = []
+        self._file = None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+    def record(self, **fields: Any):
+        """
+        Add one image's metrics
+
+        Args:
+            **fields: image, model, success, cached, attempts, retry_reasons,
+                prepare_seconds, encode_seconds, upload_bytes, rate_wait_seconds,
+                ttfb_seconds, ttft_seconds, request_seconds, latency_seconds,
+                prompt_tokens, completion_tokens, total_tokens, batch_size,
+                finish_reason, error_type
+        """
+        entry = {"t": round(time.time(), 3)}
+        entry.update({
+            key: round(value, 4) if isinstance(value, float) else value
+            for key, value in fields.items()
+        })
+
+        with self._lock:
+            self._records.append(entry)
+            if self._file is not None:
+                self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                self._file.flush()
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Copy of all records so far"""
+        with self._lock:
+            return list(self._records)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Latency percentiles and throughput
+
+        Cached images are counted but excluded from latency/TTFB percentiles.
+
+        Returns:
+            Dict with images, success, cached, throughput_per_minute, latency,
+            ttfb, ttft (streamed requests), rate_wait (time spent waiting for
+            the rate limiter), truncated (finish_reason counts other than
+            "stop"), upload_bytes, tokens and a per-model breakdown
+        """
+        records = self.records()
+        if not records:
+            return {"images": 0}
+
+        live = [r for r in records if not r.get("cached")]
+
+        # Wall time from the first request start to the last completion
+        starts = [r["t"] - r.get("latency_seconds", 0) for r in records]
+        wall = max(r["t"] for r in records) - min(starts)
+
+        truncated: Dict[str, int] = {}
+        for r in live:
+            if r.get("finish_reason") not in (None, "stop"):
+                truncated[r["finish_reason"]] = truncated.get(r["finish_reason"], 0) + 1
+
+        per_model: Dict[str, Dict[str, Any]] = {}
+        for model in sorted({r.get("model") or "unknown" for r in live}):
+            rows = [r for r in live if (r.get("model") or "unknown") == model]
+            per_model[model] = {
+                "images": len(rows),
+                "success_rate": round(sum(1 for r in rows if r.get("success")) / len(rows), 3),
+                "latency": _distribution([r["latency_seconds"] for r in rows if "latency_seconds" in r]),
+                "ttfb": _distribution([r["ttfb_seconds"] for r in rows if r.get("ttfb_seconds") is not None]),
+                "completion_tokens": sum(r.get("completion_tokens") or 0 for r in rows),
+            }
+
+        return {
+            "images": len(records),
+            "success": sum(1 for r in records if r.get("success")),
+            "cached": len(records) - len(live),
+            "wall_seconds": round(wall, 2),
+            "throughput_per_minute": round(len(records) / wall * 60, 1) if wall > 0 else None,
+            "latency": _distribution([r["latency_seconds"] for r in live if "latency_seconds" in r]),
+            "ttfb": _distribution([r["ttfb_seconds"] for r in live if r.get("ttfb_seconds") is not None]),
+            "ttft": _distribution([r["ttft_seconds"] for r in live if r.get("ttft_seconds") is not None]),
+            "rate_wait": _distribution([r["rate_wait_seconds"] for r in live if r.get("rate_wait_seconds") is not None]),
+            "truncated": truncated,
+            "upload_bytes": sum(r.get("upload_bytes") or 0 for r in live),
+            "tokens": sum(r.get("total_tokens") or 0 for r in live),
+            "retries": sum(len(r.get("retry_reasons") or []) for r in live),
+            "models": per_model,
+        }
+
+    def close(self):
+        """Close the JSONL file"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _format_distribution(distribution: Dict[str, Optional[float]]) -> str:
+    if distribution.get("p50") is None:
+        return "n/a"
+    return (
+        f"p50 {distribution['p50']}s / p95 {distribution['p95']}s / "
+        f"p99 {distribution['p99']}s / max {distribution['max']}s"
+    )
+
+
+def format_metrics_summary(summary: Dict[str, Any]) -> str:
+    """
+    Multi-line human readable metrics summary
+
+    Args:
+        summary: Output of MetricsRecorder.summary()
+
+    Returns:
+        Formatted text (no trailing newline)
+    """
+    if not summary.get("images"):
+        return "No requests recorded"
+
+    lines = [
+        f"Images: {summary['images']} ({summary['success']} ok, {summary['cached']} cached), "
+        f"{summary['retries']} retries",
+        f"Throughput: {summary['throughput_per_minute']} images/min over {summary['wall_seconds']}s",
+        f"Latency: {_format_distribution(summary['latency'])}",
+        f"TTFB: {_format_distribution(summary['ttfb'])}",
+    ]
+    if summary["ttft"].get("p50") is not None:
+        lines.append(f"TTFT: {_format_distribution(summary['ttft'])}")
+    if summary["rate_wait"].get("max"):
+        lines.append(f"Rate limiter wait: {_format_distribution(summary['rate_wait'])}")
+    if summary["truncated"]:
+        lines.append("Truncated: " + ", ".join(
+            f"{count} {reason}" for reason, count in sorted(summary["truncated"].items())
+        ))
+    lines += [
+        f"Uploaded: {summary['upload_bytes'] / 1024 / 1024:.1f} MB, tokens: {summary['tokens']:,}",
+    ]
+    for model, stats in summary["models"].items():
+        lines.append(
+            f"- {model}: {stats['images']} images, {stats['success_rate'] * 100:.0f}% ok, "
+            f"latency {_format_distribution(stats['latency'])}, "
+            f"{stats['completion_tokens']:,} completion tokens"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,205 @@
+"""
+Content-addressed cache for vision extraction results
+
+Results are stored in a single SQLite file keyed by a hash of the image
+bytes, prompt, model and sampling settings, so renamed files, duplicate
+page scans and identical images in other exam folders are never sent to
+the API twice. The file is size-bounded with least-recently-used eviction.
+
+Features:
+- Key = sha256(image bytes + prompt + model + temperature + max_tokens)
+- Size-based LRU eviction (max_bytes)
+- Hit/miss statistics for summary reports
+- Thread-safe (one connection guarded by a lock, WAL journal)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+DEFAULT_CACHE_FILE = Path.home() / ".cache" / "exam-question-processor" / "results.sqlite"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_image_file(image_path: Union[str, Path]) -> str:
+    """
+    Hash the bytes of an image file
+
+    Args:
+        image_path: Path to image file
+
+    Returns:
+        Hex sha256 digest
+    """
+    digest = hashlib.sha256()
+    with open(image_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_cache_key(
+    image_hash: str,
+    prompt: str,
+    model: str,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    variant: str = ''
+) -> str:
+    """
+    Build the cache key for one extraction request
+
+    Args:
+        image_hash: sha256 of the image bytes (see hash_image_file)
+        prompt: Prompt text
+        model: Model identifier (or model list description)
+        temperature: Sampling temperature
+        max_tokens: Completion token limit
+        variant: Preprocessing settings applied before upload (if any)
+
+    Returns:
+        Hex sha256 digest
+    """
+    parts = [image_hash, prompt, model, repr(temperature), repr(max_tokens)]
+    if variant:
+        parts.append(variant)
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    SQLite-backed LRU cache of extraction results
+
+    Usage:
+        cache = ResultCache()
+        key = make_cache_key(hash_image_file(path), prompt, model, 0.3, 4000)
+        result = cache.get(key)
+        if result is None:
+            result = call_api(...)
+            cache.put(key, result)
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_CACHE_FILE,
+        max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        """
+        Open (or create) the cache file
+
+        Args:
+            path: SQLite file path
+            max_bytes: Max total size of cached results before eviction
+        """
+        self.path = Path(os.path.expanduser(str(path)))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_lru ON results(last_access)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result
+
+        Args:
+            key: Cache key from make_cache_key
+
+        Returns:
+            Cached result dict, or None on a miss
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return json.loads(row[0])
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """
+        Store a result and evict least-recently-used entries if over budget
+
+        Args:
+            key: Cache key from make_cache_key
+            result: JSON-serializable result dict
+        """
+        value = json.dumps(result, ensure_ascii=False)
+        size = len(value.encode('utf-8'))
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop oldest-accessed entries until under max_bytes (caller holds the lock)"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM results ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Cache statistics for this session plus current on-disk size
+
+        Returns:
+            Dict with hits, misses, hit_rate, evictions, entries, bytes
+        """
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": total,
+        }
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,136 @@
+"""
+Incremental, atomically published text files for streamed extractions
+
+While a streamed response arrives, its text is appended to a hidden
+`.part` file next to the destination and flushed chunk by chunk, so a long
+page can be watched with `tail -f` instead of appearing all at once. Only a
+finished extraction is renamed onto the real `_extracted.txt` name, which
+keeps "the output file exists" meaning "this image is done" for
+skip_existing and the journal.
+
+Features:
+- Header written per attempt (a retry restarts the part file)
+- Append + flush per delta, fsync before publishing
+- os.replace on finish: readers never see half a file under the final name
+- abort() removes the part file of a failed image
+- Thread-safe per file
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+
+class StreamingTextFile:
+    """
+    Text file written incrementally and published atomically
+
+    Usage:
+        sink = StreamingTextFile("out/q1_extracted.txt", header=lambda model: f"Model: {model}\\n\\n")
+        sink.begin("google/gemini-2.0-flash-001")
+        sink.write("Question 1 ...")
+        sink.finish("\\n\\nTokens used: 812\\n")
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        header: Optional[Callable[[str], str]] = None,
+        fsync: bool = True
+    ):
+        """
+        Initialize the sink (nothing is created until begin())
+
+        Args:
+            path: Final file path
+            header: Function model -> text written before the content
+            fsync: fsync the part file before renaming it
+        """
+        self.path = Path(path)
+        self.part_path = self.path.with_name(f".{self.path.name}.part")
+        self.header = header
+        self.fsync = fsync
+        self.chars = 0
+
+        self._lock = threading.Lock()
+        self._file = None
+
+    @property
+    def started(self) -> bool:
+        """True once begin() has been called and not finished/aborted"""
+        return self._file is not None
+
+    def begin(self, model: str):
+        """
+        Start (or restart, on retry) the part file
+
+        Args:
+            model: Model answering this attempt (passed to the header function)
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            self.part_path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.part_path, 'w', encoding='utf-8')
+            self.chars = 0
+            if self.header is not None:
+                self._file.write(self.header(model))
+                self._file.flush()
+
+    def write(self, text: str):
+        """
+        Append a streamed delta and flush it
+
+        Args:
+            text: New content
+        """
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(text)
+            self._file.flush()
+            self.chars += len(text)
+
+    def replace_content(self, model: str, text: str):
+        """
+        Rewrite the part file with the final content
+
+        Used when the streamed text was edited afterwards (runaway output
+        trimmed, multi-image response split).
+
+        Args:
+            model: Model that answered
+            text: Content that should end up in the file
+        """
+        self.begin(model)
+        self.write(text)
+
+    def finish(self, footer: str = ""):
+        """
+        Write the footer and publish the file under its final name
+
+        Args:
+            footer: Text appended after the content
+        """
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(footer)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+            os.replace(self.part_path, self.path)
+
+    def abort(self):
+        """Drop the part file (failed image)"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            try:
+                self.part_path.unlink()
+            except FileNotFoundError:
+                pass